@@ -0,0 +1,73 @@
+"""Aho-Corasick multi-keyword matcher.
+
+Finds every occurrence of any of a set of keywords in one pass over the
+text, so matching cost depends on the text length and number of hits, not
+on how many keywords are registered.
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+class AhoCorasick:
+    def __init__(self, keywords: Iterable[str] = ()):
+        # State 0 is the root; goto[state] maps a character to the next state
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+        self.keywords: List[str] = []
+        for keyword in dict.fromkeys(keywords):
+            if keyword:
+                self._add(keyword)
+        self._build()
+
+    def _add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(keyword)
+        self.keywords.append(keyword)
+
+    def _build(self):
+        # Breadth-first so every state's failure link is set before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # Inherit matches that end here through the failure chain
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start index, keyword) for every occurrence, overlapping ones included"""
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                yield index - len(keyword) + 1, keyword
+
+    def find_all(self, text: str, whole_words: bool = False) -> List[Tuple[int, str]]:
+        """All occurrences; with ``whole_words`` only those not inside a longer word"""
+        matches = list(self.iter(text))
+        if not whole_words:
+            return matches
+        return [
+            (start, keyword) for start, keyword in matches
+            if (start == 0 or not text[start - 1].isalnum())
+            and (start + len(keyword) == len(text) or not text[start + len(keyword)].isalnum())
+        ]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
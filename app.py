@@ -1,14 +1,24 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, request, jsonify, render_template_string, Response, stream_with_context
 from flask_cors import CORS
 from eliza_patterns import match_crypto_pattern
-from market_handler import MarketDataHandler
-from eliza_crypto_advisor import get_market_aware_response
+from intent_engine import intent_engine
+from coin_resolver import coin_resolver
+from market_handler import MarketDataHandler, BULK_ANALYSIS_VIEWS
+from market_poller import MarketPoller, SnapshotStore
+from market_feed import MarketFeed
+from orderbook import ExchangeFeed
+from eliza_crypto_advisor import get_market_aware_response, stream_market_aware_response
+from model_registry import model_registry
+from async_runtime import BackgroundEventLoop
+from generation_scheduler import generation_scheduler
+from upstream import upstream_scheduler
 import os
 from dotenv import load_dotenv
-import asyncio
+import atexit
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import json
 from datetime import datetime
-import re
+from typing import Dict, Optional
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +29,76 @@ CORS(app)
 # Initialize handlers
 market_handler = MarketDataHandler()
 
+# One long-lived event loop owns the pooled HTTP session; routes submit to it
+event_loop = BackgroundEventLoop()
+
+# Background poller keeps snapshots of watched coins fresh, so request
+# handlers read the latest analysis instead of calling CoinGecko. Views the
+# batched endpoints serve are polled every cycle (one request per 250 coins);
+# social views need a per-coin fetch and are refreshed at a slower cadence
+SNAPSHOT_VIEWS = BULK_ANALYSIS_VIEWS
+SLOW_VIEWS = ['social_metrics', 'social_impact']
+SNAPSHOT_MAX_AGE = 300  # seconds
+# Only coins without any snapshot are fetched on the request path, and never for longer than this
+LIVE_FETCH_TIMEOUT = float(os.getenv("MARKET_LIVE_FETCH_TIMEOUT", "5"))
+snapshot_store = SnapshotStore()
+market_poller = MarketPoller(
+    market_handler,
+    snapshot_store,
+    event_loop,
+    watchlist=[coin.strip() for coin in os.getenv("MARKET_WATCHLIST", "bitcoin").split(",") if coin.strip()],
+    views=SNAPSHOT_VIEWS,
+    interval=float(os.getenv("MARKET_POLL_INTERVAL", "60")),
+    rate_budget=float(os.getenv("MARKET_RATE_BUDGET", "30")),
+    max_watched=int(os.getenv("MARKET_WATCH_MAX", "50")),
+    idle_ttl=float(os.getenv("MARKET_WATCH_IDLE", "900")),
+    slow_views=SLOW_VIEWS,
+    slow_interval=float(os.getenv("MARKET_SLOW_POLL_INTERVAL", "900"))
+)
+
+# Optional exchange order-book/trade feed, e.g. EXCHANGE_ID=binance
+exchange_feed = None
+if os.getenv("EXCHANGE_ID"):
+    exchange_feed = ExchangeFeed(
+        os.getenv("EXCHANGE_ID"),
+        [market_handler.exchange_symbols[coin] for coin in market_poller.watchlist if coin in market_handler.exchange_symbols],
+        poll_interval=float(os.getenv("EXCHANGE_POLL_INTERVAL", "1")),
+        record_path=os.getenv("EXCHANGE_RECORD_PATH")
+    )
+    market_handler.attach_microstructure(exchange_feed)
+    atexit.register(exchange_feed.stop)
+
+# Live deltas of every published snapshot, pushed to browsers over /ws/market
+market_feed = MarketFeed(snapshot_store, heartbeat=float(os.getenv("MARKET_FEED_HEARTBEAT", "15")))
+
+# Stop polling before the shared session is closed
+event_loop.add_shutdown_hook(market_poller.shutdown)
+event_loop.add_shutdown_hook(market_handler.close)
+atexit.register(event_loop.shutdown)
+atexit.register(market_feed.close)
+
+def empty_analysis() -> Dict:
+    return {view: market_handler.stages[view].empty() for view in SNAPSHOT_VIEWS + SLOW_VIEWS}
+
+def get_latest_analysis(coin_id: str) -> Dict:
+    """Latest snapshot for a coin; coins seen for the first time are fetched once and then watched"""
+    snapshot = snapshot_store.latest(coin_id, max_age=SNAPSHOT_MAX_AGE)
+    if snapshot is not None:
+        market_poller.watch(coin_id)
+        # Social views land with the poller's slower per-coin pass; until then they are empty
+        return dict(empty_analysis(), **snapshot.to_dict())
+
+    try:
+        analysis = event_loop.run(market_handler.analyze(coin_id, SNAPSHOT_VIEWS + SLOW_VIEWS), timeout=LIVE_FETCH_TIMEOUT)
+    except FutureTimeoutError:
+        print(f"Error fetching market analysis for {coin_id}: timed out after {LIVE_FETCH_TIMEOUT}s")
+        market_poller.watch(coin_id)
+        return dict(empty_analysis(), timestamp=datetime.now().isoformat())
+    if analysis['price_data'].get('current_price') is not None:
+        snapshot_store.publish(coin_id, analysis)
+        market_poller.watch(coin_id)
+    return analysis
+
 # HTML Template (keeping your existing template)
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -81,6 +161,53 @@ HTML_TEMPLATE = """
             chatContainer.scrollTop = chatContainer.scrollHeight;
         }
         
+        // Latest views per coin, kept current by the shared /ws/market feed
+        const marketState = {};
+        let selectedCoin = 'bitcoin';
+
+        function renderSelectedCoin() {
+            const views = marketState[selectedCoin];
+            if (!views) return;
+            updateUI({
+                market_data: Object.assign({
+                    coin: selectedCoin.toUpperCase(),
+                    price_data: {},
+                    market_metrics: {},
+                    social_metrics: {},
+                    trading_signals: [],
+                    risk_analysis: {}
+                }, views)
+            });
+        }
+
+        function applyChanges(coinId, changes) {
+            const views = marketState[coinId] || (marketState[coinId] = {});
+            for (const [view, value] of Object.entries(changes)) {
+                if (value && typeof value === 'object' && !Array.isArray(value) && views[view]) {
+                    for (const [key, item] of Object.entries(value)) {
+                        if (item === null) delete views[view][key];
+                        else views[view][key] = item;
+                    }
+                } else {
+                    views[view] = value;
+                }
+            }
+        }
+
+        const marketFeed = new EventSource('/ws/market');
+        marketFeed.addEventListener('snapshot', (e) => {
+            const state = JSON.parse(e.data);
+            for (const [coinId, views] of Object.entries(state)) {
+                marketState[coinId] = views;
+            }
+            renderSelectedCoin();
+        });
+        marketFeed.addEventListener('delta', (e) => {
+            const delta = JSON.parse(e.data);
+            applyChanges(delta.coin, delta.changes);
+            if (delta.coin === selectedCoin) renderSelectedCoin();
+        });
+
         function updateUI(data) {
             if (data.market_data) {
                 // Update Market Monitor
@@ -163,8 +290,11 @@ HTML_TEMPLATE = """
                 
                 if (data.success) {
                     addMessage(data.response);
-                    // Update the market data panels
-                    updateUI(data);
+                    // Follow the coin just asked about; the feed keeps its panels live
+                    const { coin, ...views } = data.market_data;
+                    selectedCoin = coin.toLowerCase();
+                    marketState[selectedCoin] = views;
+                    renderSelectedCoin();
                 } else {
                     addMessage('Sorry, I encountered an error processing your request.');
                 }
@@ -178,6 +308,15 @@ HTML_TEMPLATE = """
 </html>
 """
 
+@app.before_request
+def start_background_services():
+    # Started lazily so only the serving process (not the reloader) polls
+    market_poller.start()
+    # The full coin list loads off the request path; the built-in list serves meanwhile
+    coin_resolver.load_in_background()
+    if exchange_feed is not None:
+        exchange_feed.start()
+
 @app.route('/')
 def home():
     return render_template_string(HTML_TEMPLATE)
@@ -188,15 +327,17 @@ def chat():
         data = request.json
         user_input = data.get('message', '')
         
-        # Extract coin name from input (e.g., "DOGE" from "analyze DOGE coin")
-        coin_match = re.search(r'(?i)(?:analyze|check|about)\s+(\w+)', user_input)
-        coin_id = coin_match.group(1).lower() if coin_match else 'bitcoin'
+        # One pass over the message finds the intent; the resolver maps the
+        # coin mention to a CoinGecko id (e.g., "DOGE" -> "dogecoin")
+        matches = intent_engine.match(user_input)
+        coin_mention = matches.get('coin_mention')
+        coin_id = coin_resolver.resolve_message(user_input, coin_mention.coin if coin_mention else None) or 'bitcoin'
         
         # Get comprehensive analysis
-        analysis = asyncio.run(market_handler.get_market_analysis(coin_id))
+        analysis = get_latest_analysis(coin_id)
         
         # Generate ELIZA-style response
-        pattern_match = match_crypto_pattern(user_input)
+        pattern_match = match_crypto_pattern(user_input, matches, coin_id)
         if pattern_match:
             template, variables = pattern_match
             response = template.format(**variables)
@@ -225,21 +366,90 @@ def chat():
             'error': str(e)
         }), 500
 
+def format_sse(payload: Dict, event: Optional[str] = None) -> str:
+    message = f"data: {json.dumps(payload)}\n\n"
+    return f"event: {event}\n{message}" if event else message
+
+@app.route('/api/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """Server-Sent-Events variant of /api/chat that streams the reply as it is generated"""
+    data = request.get_json(silent=True) or {}
+    user_input = data.get('message') or request.args.get('message', '')
+
+    def generate():
+        try:
+            pattern_match = match_crypto_pattern(user_input)
+            if pattern_match:
+                template, variables = pattern_match
+                yield format_sse({'token': template.format(**variables)})
+            else:
+                for token in stream_market_aware_response(user_input):
+                    yield format_sse({'token': token})
+            yield format_sse({'success': True}, event='done')
+        except Exception as e:
+            print(f"Error in chat stream endpoint: {str(e)}")
+            yield format_sse({'success': False, 'error': str(e)}, event='error')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/ws/market')
+def market_stream():
+    """Server-Sent-Events feed of market snapshots and deltas shared by all clients"""
+    coins_param = request.args.get('coins')
+    coins = [coin.strip().lower() for coin in coins_param.split(',') if coin.strip()] if coins_param else None
+
+    def generate():
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+        for event, data in market_feed.listen(coins):
+            if data is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event}\ndata: {data}\n\n"
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/market-data')
 def get_market_data():
     try:
+        # Watchlist variant: /api/market-data?coins=bitcoin,ethereum,...
+        coins_param = request.args.get('coins')
+        if coins_param:
+            coin_ids = [coin.strip().lower() for coin in coins_param.split(',') if coin.strip()]
+            analyses = event_loop.run(market_handler.get_market_analysis_many(coin_ids))
+            return jsonify({
+                'success': True,
+                'coins': {
+                    coin_id: {
+                        'market_data': analysis.get('price_data'),
+                        'market_metrics': analysis.get('market_metrics'),
+                        'analysis': {
+                            'risk_analysis': analysis.get('risk_analysis'),
+                            'trading_signals': analysis.get('trading_signals')
+                        }
+                    }
+                    for coin_id, analysis in analyses.items()
+                }
+            })
+
         # Default to Bitcoin if no specific coin is being analyzed
         coin_id = 'bitcoin'
         
-        # Get market analysis
-        analysis = asyncio.run(market_handler.get_market_analysis(coin_id))
-        
-        # Get social impact data
-        social_impact = asyncio.run(market_handler.get_social_impact(coin_id))
+        analysis = get_latest_analysis(coin_id)
+        social_impact = analysis['social_impact']
         
         return jsonify({
             'success': True,
             'market_data': analysis.get('price_data'),
+            'microstructure': market_handler.stages['microstructure'].derive({'id': coin_id}),
             'social_metrics': social_impact.get('social_metrics'),
             'analysis': {
                 'risk_analysis': analysis.get('risk_analysis'),
@@ -253,7 +463,25 @@ def get_market_data():
             'error': str(e)
         }), 500
 
+@app.route('/api/metrics')
+def get_metrics():
+    return jsonify({
+        'success': True,
+        'generation': generation_scheduler.get_metrics(),
+        'market_cache': market_handler.cache.get_stats(),
+        'market_poller': market_poller.get_metrics(),
+        'market_feed': market_feed.get_metrics(),
+        'upstream': upstream_scheduler.get_metrics(),
+        'exchange_feed': {
+            'events': exchange_feed.events,
+            'symbols': exchange_feed.symbols,
+            'last_error': exchange_feed.last_error
+        } if exchange_feed is not None else None
+    })
+
 if __name__ == '__main__':
     print("Starting Advanced Crypto Market Advisor...")
+    print("Loading advisor model...")
+    model_registry.warm_up()
     print("Access the web interface at: http://localhost:5000")
     app.run(debug=True, port=5000)
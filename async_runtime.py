@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, List, Optional
+
+class BackgroundEventLoop:
+    """A single long-lived asyncio loop running on a daemon thread.
+
+    Synchronous code (Flask routes, Streamlit reruns) submits coroutines with
+    ``run`` instead of calling ``asyncio.run`` per request, so connection
+    pools and other loop-bound resources survive between requests.
+    """
+
+    def __init__(self, name: str = "background-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks: List[Callable[[], Awaitable]] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def run_loop():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def submit(self, coro: Awaitable):
+        """Schedule a coroutine and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the background loop and block for its result; cancelled if ``timeout`` expires"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable]) -> None:
+        """Register a coroutine factory (e.g. ``session.close``) to await on shutdown"""
+        self._shutdown_hooks.append(hook)
+
+    def shutdown(self, timeout: float = 5) -> None:
+        if self._loop is None or self._thread is None or not self._thread.is_alive():
+            return
+        for hook in self._shutdown_hooks:
+            try:
+                self.run(hook(), timeout=timeout)
+            except Exception as e:
+                print(f"Error during event loop shutdown: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=timeout)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
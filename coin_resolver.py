@@ -0,0 +1,404 @@
+"""Resolve coin mentions ("BTC", "$pepe", "shiba inu", "etherium") to CoinGecko ids.
+
+CoinGecko's ``/coins/list`` is loaded once through the upstream scheduler and
+cached on disk; if neither is available a built-in list of major coins is
+used. ``load_in_background`` indexes the built-in list at once and fetches
+the full list off the request path. Exact lookups go through hash indexes on id, symbol and name; a
+character trie over ids and names serves prefix completion and fuzzy
+(edit distance 1) matching.
+
+In free text, lowercase words only resolve to major coins (FALLBACK_COINS)
+since thousands of listed tokens are named after ordinary words; cashtags
+and all-caps symbols can resolve to any listed coin.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from upstream import upstream_scheduler
+
+COINGECKO_API = "https://api.coingecko.com/api/v3"
+
+# Used when /coins/list cannot be fetched; order doubles as popularity rank
+FALLBACK_COINS = [
+    ('bitcoin', 'btc', 'Bitcoin'),
+    ('ethereum', 'eth', 'Ethereum'),
+    ('tether', 'usdt', 'Tether'),
+    ('binancecoin', 'bnb', 'BNB'),
+    ('solana', 'sol', 'Solana'),
+    ('usd-coin', 'usdc', 'USDC'),
+    ('ripple', 'xrp', 'XRP'),
+    ('dogecoin', 'doge', 'Dogecoin'),
+    ('cardano', 'ada', 'Cardano'),
+    ('tron', 'trx', 'TRON'),
+    ('the-open-network', 'ton', 'Toncoin'),
+    ('avalanche-2', 'avax', 'Avalanche'),
+    ('shiba-inu', 'shib', 'Shiba Inu'),
+    ('polkadot', 'dot', 'Polkadot'),
+    ('chainlink', 'link', 'Chainlink'),
+    ('bitcoin-cash', 'bch', 'Bitcoin Cash'),
+    ('near', 'near', 'NEAR Protocol'),
+    ('litecoin', 'ltc', 'Litecoin'),
+    ('matic-network', 'matic', 'Polygon'),
+    ('uniswap', 'uni', 'Uniswap'),
+    ('pepe', 'pepe', 'Pepe'),
+    ('stellar', 'xlm', 'Stellar'),
+    ('cosmos', 'atom', 'Cosmos Hub'),
+    ('aptos', 'apt', 'Aptos'),
+    ('arbitrum', 'arb', 'Arbitrum'),
+    ('optimism', 'op', 'Optimism'),
+    ('filecoin', 'fil', 'Filecoin'),
+    ('monero', 'xmr', 'Monero'),
+    ('sui', 'sui', 'Sui'),
+    ('bonk', 'bonk', 'Bonk')
+]
+
+# Many tokens share a symbol (wrapped/bridged copies, scams); these win ties
+PREFERRED_SYMBOLS = {symbol: coin_id for coin_id, symbol, _ in FALLBACK_COINS}
+
+# Common words that are also coin ids, names or symbols. They only count as
+# mentions when written as a cashtag ($near), or in capitals for the
+# preferred symbols above (NEAR, LINK).
+STOPWORDS = {
+    'a', 'about', 'all', 'an', 'and', 'any', 'apt', 'are', 'as', 'at', 'atom', 'be', 'best',
+    'buy', 'by', 'can', 'coin', 'coins', 'crypto', 'do', 'dot', 'down', 'for', 'from', 'get',
+    'go', 'good', 'has', 'have', 'hello', 'hi', 'how', 'i', 'if', 'in', 'is', 'it', 'just',
+    'link', 'me', 'more', 'my', 'near', 'new', 'now', 'of', 'on', 'one', 'op', 'or', 'out',
+    'price', 'sell', 'so', 'the', 'this', 'to', 'token', 'ton', 'up', 'us', 'we', 'what',
+    'when', 'why', 'will', 'with', 'you', 'your'
+}
+
+# Ordinary English words that are also major coins' names. Lowercase, they
+# are read as words ("full of optimism"); a cashtag or capital letter makes
+# them a mention, and even then an unambiguous mention in the same message wins.
+COMMON_WORD_COINS = {
+    'optimism': 'optimism',
+    'stellar': 'stellar',
+    'ripple': 'ripple',
+    'cosmos': 'cosmos',
+    'polygon': 'matic-network',
+    'avalanche': 'avalanche-2',
+    'tether': 'tether',
+    'bonk': 'bonk'
+}
+
+TOKEN_PATTERN = re.compile(r"\$?[A-Za-z0-9][A-Za-z0-9.\-]*")
+
+class CoinMention(NamedTuple):
+    coin_id: str
+    text: str
+    start: int
+    end: int
+    method: str  # 'id', 'symbol', 'name' or 'fuzzy'
+    ambiguous: bool = False  # a capitalised common word (see COMMON_WORD_COINS)
+
+class Trie:
+    """Character trie mapping keys to coin ids"""
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def insert(self, key: str, value: str):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(value)
+
+    def _walk(self, node: Dict, prefix: str, limit: int, results: List[Tuple[str, str]]):
+        if len(results) >= limit:
+            return
+        for value in node.get(None, ()):
+            results.append((prefix, value))
+        for char, child in node.items():
+            if char is not None:
+                self._walk(child, prefix + char, limit, results)
+
+    def with_prefix(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """Up to ``limit`` (key, value) pairs whose key starts with ``prefix``"""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        results: List[Tuple[str, str]] = []
+        self._walk(node, prefix, limit, results)
+        return results[:limit]
+
+    def fuzzy(self, word: str, max_distance: int = 1) -> List[Tuple[int, str, str]]:
+        """(distance, key, value) for keys within ``max_distance`` edits of ``word``"""
+        results: List[Tuple[int, str, str]] = []
+        first_row = list(range(len(word) + 1))
+
+        def search(node: Dict, char: str, previous_row: List[int], key: str):
+            # One Levenshtein row per trie edge; prune once the whole row exceeds the budget
+            row = [previous_row[0] + 1]
+            for column in range(1, len(word) + 1):
+                row.append(min(
+                    row[column - 1] + 1,
+                    previous_row[column] + 1,
+                    previous_row[column - 1] + (word[column - 1] != char)
+                ))
+            if row[-1] <= max_distance:
+                for value in node.get(None, ()):
+                    results.append((row[-1], key, value))
+            if min(row) <= max_distance:
+                for next_char, child in node.items():
+                    if next_char is not None:
+                        search(child, next_char, row, key + next_char)
+
+        for char, child in self.root.items():
+            if char is not None:
+                search(child, char, first_row, char)
+        return sorted(results)
+
+class CoinResolver:
+    def __init__(self, cache_path: str = "data/coins_list.json", max_age: float = 86400,
+                 min_fuzzy_length: int = 5, max_name_words: int = 3, retry_interval: float = 600):
+        self.cache_path = cache_path
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self.min_fuzzy_length = min_fuzzy_length
+        self.max_name_words = max_name_words
+
+        self.by_id: Dict[str, Tuple[str, str]] = {}
+        self.by_symbol: Dict[str, List[str]] = {}
+        self.by_name: Dict[str, List[str]] = {}
+        self.rank: Dict[str, int] = {}
+        self._trie: Optional[Trie] = None
+        self._major_trie: Optional[Trie] = None
+        self._loaded = False
+        self._retry_at: Optional[float] = None  # set while serving the built-in list
+        self._lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+
+    def _read_cache(self, max_age: Optional[float]) -> Optional[List[Dict]]:
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(self.cache_path) > max_age:
+                return None
+            with open(self.cache_path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, coins: List[Dict]):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            temp_path = self.cache_path + '.tmp'
+            with open(temp_path, 'w') as handle:
+                json.dump(coins, handle)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error caching coin list: {str(e)}")
+
+    def _fetch_coins(self) -> List[Dict]:
+        self._retry_at = None
+        coins = self._read_cache(self.max_age)
+        if coins:
+            return coins
+        coins = upstream_scheduler.get_json(f"{COINGECKO_API}/coins/list")
+        if coins:
+            self._write_cache(coins)
+            return coins
+        # Upstream unavailable: an outdated copy beats the short built-in list
+        coins = self._read_cache(None)
+        if coins:
+            return coins
+        self._retry_at = time.monotonic() + self.retry_interval
+        return [{'id': coin_id, 'symbol': symbol, 'name': name} for coin_id, symbol, name in FALLBACK_COINS]
+
+    def load(self, coins: Optional[Iterable[Dict]] = None):
+        """Build the indexes from ``coins``; without them, start (or retry) the background load and return at once.
+
+        Lookups call this on the request path, so it never fetches inline;
+        join ``load_in_background()`` to wait for the full list.
+        """
+        if coins is not None:
+            with self._lock:
+                self._index(coins)
+            return
+        if not self._loaded or self._retry_due():
+            self.load_in_background()
+
+    def _retry_due(self) -> bool:
+        retry_at = self._retry_at
+        return retry_at is not None and time.monotonic() >= retry_at
+
+    def _index(self, coins: Iterable[Dict]):
+        # Caller must hold self._lock
+        by_id, by_symbol, by_name = {}, {}, {}
+        for coin in coins:
+            coin_id = (coin.get('id') or '').lower()
+            if not coin_id:
+                continue
+            symbol = (coin.get('symbol') or '').lower()
+            name = (coin.get('name') or '').lower()
+            by_id[coin_id] = (symbol, name)
+            by_symbol.setdefault(symbol, []).append(coin_id)
+            by_name.setdefault(name, []).append(coin_id)
+
+        self.rank = {coin_id: index for index, (coin_id, _, _) in enumerate(FALLBACK_COINS)}
+        for ids in list(by_symbol.values()) + list(by_name.values()):
+            ids.sort(key=self._sort_key)
+        self.by_id, self.by_symbol, self.by_name = by_id, by_symbol, by_name
+        self._trie = None
+        self._major_trie = None
+        self._loaded = True
+
+    def load_in_background(self) -> threading.Thread:
+        """Serve the built-in list now and fetch the full one on a daemon thread.
+
+        Idempotent: a new loader only starts on first use or once a failed load's retry is due.
+        """
+        with self._lock:
+            if self._loader is not None and (self._loader.is_alive() or not self._retry_due()):
+                return self._loader
+            if not self._loaded:
+                self._index({'id': coin_id, 'symbol': symbol, 'name': name} for coin_id, symbol, name in FALLBACK_COINS)
+            # Cleared while the loader runs; a failed fetch schedules the next retry
+            self._retry_at = None
+            self._loader = threading.Thread(target=self._background_load, name="coin-list-loader", daemon=True)
+            self._loader.start()
+            return self._loader
+
+    def _background_load(self):
+        try:
+            # Fetched outside the lock so lookups keep using the current indexes meanwhile
+            self.load(self._fetch_coins())
+        except Exception as e:
+            self._retry_at = time.monotonic() + self.retry_interval
+            print(f"Error loading coin list: {str(e)}")
+
+    def _sort_key(self, coin_id: str) -> Tuple[int, int]:
+        return self.rank.get(coin_id, len(self.rank)), len(coin_id)
+
+    def _build_trie(self, coin_ids: Iterable[str]) -> Trie:
+        trie = Trie()
+        for coin_id in coin_ids:
+            trie.insert(coin_id, coin_id)
+            name = self.by_id.get(coin_id, ('', ''))[1]
+            if name and name != coin_id:
+                trie.insert(name, coin_id)
+        return trie
+
+    @property
+    def trie(self) -> Trie:
+        """Trie over ids and names, built on first prefix/fuzzy lookup"""
+        self.load()
+        if self._trie is None:
+            self._trie = self._build_trie(self.by_id)
+        return self._trie
+
+    @property
+    def major_trie(self) -> Trie:
+        self.load()
+        if self._major_trie is None:
+            self._major_trie = self._build_trie(coin_id for coin_id in self.rank if coin_id in self.by_id)
+        return self._major_trie
+
+    def _lookup(self, term: str) -> Optional[Tuple[str, str]]:
+        """(coin id, method) for an exact id, symbol or name"""
+        if term in self.by_id:
+            return term, 'id'
+        if term in PREFERRED_SYMBOLS:
+            return PREFERRED_SYMBOLS[term], 'symbol'
+        if term in self.by_symbol:
+            return self.by_symbol[term][0], 'symbol'
+        if term in self.by_name:
+            return self.by_name[term][0], 'name'
+        return None
+
+    def _fuzzy(self, term: str, major_only: bool = False) -> Optional[str]:
+        trie = self.major_trie if major_only else self.trie
+        matches = trie.fuzzy(term, max_distance=1)
+        if not matches:
+            return None
+        best = matches[0][0]
+        return min((coin_id for distance, _, coin_id in matches if distance == best), key=self._sort_key)
+
+    def resolve(self, term: str, fuzzy: bool = True) -> Optional[str]:
+        """CoinGecko id for a single id, symbol or name (e.g. 'BTC' -> 'bitcoin')"""
+        self.load()
+        term = term.strip().lstrip('$').lower()
+        if not term:
+            return None
+        found = self._lookup(term)
+        if found:
+            return found[0]
+        if fuzzy and len(term) >= self.min_fuzzy_length:
+            return self._fuzzy(term)
+        return None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Coin ids whose id or name starts with ``prefix``, most popular first"""
+        ids = dict.fromkeys(coin_id for _, coin_id in self.trie.with_prefix(prefix.lower(), limit * 5))
+        return sorted(ids, key=self._sort_key)[:limit]
+
+    def resolve_all(self, message: str, fuzzy: bool = True) -> List[CoinMention]:
+        """Every coin mentioned in ``message``, in order, from one left-to-right scan.
+
+        Multi-word names ("shiba inu") are matched greedily, longest first.
+        """
+        self.load()
+        tokens = [(match.group(), match.start(), match.end()) for match in TOKEN_PATTERN.finditer(message)]
+        mentions: List[CoinMention] = []
+        seen = set()
+        index = 0
+        while index < len(tokens):
+            found = None
+            for width in range(min(self.max_name_words, len(tokens) - index), 0, -1):
+                window = tokens[index:index + width]
+                raw = " ".join(token for token, _, _ in window)
+                cashtag = raw.startswith('$')
+                term = raw.lstrip('$').rstrip('.').lower()
+                explicit = cashtag or (raw.isupper() and len(term) > 1)
+                if term in STOPWORDS and not (cashtag or (explicit and term in PREFERRED_SYMBOLS)):
+                    continue
+                capitalised = raw.lstrip('$')[:1].isupper()
+                if term in COMMON_WORD_COINS and not (cashtag or capitalised):
+                    continue
+                found = self._lookup(term)
+                if found and not explicit and found[0] not in self.rank:
+                    found = None
+                if found is None and width == 1 and fuzzy and len(term) >= self.min_fuzzy_length:
+                    coin_id = self._fuzzy(term, major_only=not explicit)
+                    # "ripples" is the word, not a typo of the coin
+                    if coin_id in COMMON_WORD_COINS.values() and not (cashtag or capitalised):
+                        coin_id = None
+                    found = (coin_id, 'fuzzy') if coin_id else None
+                if found:
+                    start, end = window[0][1], window[-1][2]
+                    if found[0] not in seen:
+                        seen.add(found[0])
+                        common = term in COMMON_WORD_COINS or (found[1] == 'fuzzy' and found[0] in COMMON_WORD_COINS.values())
+                        ambiguous = common and not cashtag and not raw.isupper()
+                        mentions.append(CoinMention(found[0], message[start:end], start, end, found[1], ambiguous))
+                    index += width
+                    break
+            if not found:
+                index += 1
+        return mentions
+
+    def resolve_message(self, message: str, hint: Optional[str] = None) -> Optional[str]:
+        """The coin a message is about: its first unambiguous mention, else its first mention, else ``hint``.
+
+        Hints only resolve by exact id, symbol or name; fuzzy matching a loose
+        capture against every listed coin picks up arbitrary tokens.
+        """
+        mentions = self.resolve_all(message)
+        if mentions:
+            return next((mention for mention in mentions if not mention.ambiguous), mentions[0]).coin_id
+        if hint and hint.lower() not in STOPWORDS:
+            return self.resolve(hint, fuzzy=False)
+        return None
+
+    def aliases(self, coin_id: str) -> List[str]:
+        """Id, symbol and name of a coin, lowercased"""
+        self.load()
+        symbol, name = self.by_id.get(coin_id, ('', ''))
+        return [alias for alias in dict.fromkeys([coin_id, symbol, name]) if alias]
+
+# Shared resolver; the coin list cache can be moved with COIN_LIST_PATH
+coin_resolver = CoinResolver(os.getenv("COIN_LIST_PATH", "data/coins_list.json"))
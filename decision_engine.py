@@ -1,7 +1,17 @@
 from market_data import MarketDataAdapter, MarketAnalyzer
 from social_monitor import InfluencerTracker, WebContentAnalyzer, TextFileAnalyzer
-from typing import Dict, List, Optional
+from async_runtime import BackgroundEventLoop
+from technical_analysis import latest_indicators, market_chart_to_ohlcv
+from upstream import BACKGROUND
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import repeat
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
 import json
+import math
+import multiprocessing
+import os
 import time
 from datetime import datetime
 import logging
@@ -9,163 +19,354 @@ import logging
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def summarize_market_data(market_data: Dict) -> Dict:
+    return {
+        'price': market_data.get('market_data', {}).get('current_price', {}).get('usd'),
+        'volume': market_data.get('market_data', {}).get('total_volume', {}).get('usd'),
+        'market_cap': market_data.get('market_data', {}).get('market_cap', {}).get('usd')
+    }
+
+def assess_risk(market_data: Optional[Dict], social_signals: Dict) -> Dict:
+    """Market, volatility and social risk scores for one coin"""
+    logging.debug("Assessing risk factors")
+    risk_assessment = {
+        'market_risk': 0,
+        'social_risk': 0,
+        'volatility_risk': 0,
+        'overall_risk': 0,
+        'risk_factors': []
+    }
+    
+    # Market risk factors
+    if market_data:
+        # Batched payloads carry explicit nulls for unknown values
+        price_change = market_data.get('market_data', {}).get('price_change_percentage_24h') or 0
+        volume = market_data.get('market_data', {}).get('total_volume', {}).get('usd') or 0
+        market_cap = market_data.get('market_data', {}).get('market_cap', {}).get('usd') or 0
+        
+        if abs(price_change) > 20:
+            risk_assessment['volatility_risk'] += 2
+            risk_assessment['risk_factors'].append('High price volatility')
+            
+        if volume > 0 and market_cap > 0:
+            volume_to_mcap = volume / market_cap
+            if volume_to_mcap > 0.5:
+                risk_assessment['market_risk'] += 1
+                risk_assessment['risk_factors'].append('High volume relative to market cap')
+                
+    # Social risk factors
+    for influencer, impact in social_signals.items():
+        if impact['impact_score'] > 5:
+            risk_assessment['social_risk'] += 1
+            risk_assessment['risk_factors'].append(f'High social impact from {influencer}')
+            
+    # Calculate overall risk
+    risk_assessment['overall_risk'] = (
+        risk_assessment['market_risk'] + 
+        risk_assessment['social_risk'] + 
+        risk_assessment['volatility_risk']
+    ) / 3
+    
+    logging.debug(f"Risk assessment completed: {risk_assessment}")
+    return risk_assessment
+
+def generate_decision_report(analysis: Dict) -> str:
+    logging.debug("Generating decision report")
+    report = []
+    
+    report.append("=== Market Analysis Report ===")
+    report.append(f"Generated at: {analysis['timestamp']}")
+    report.append("\n=== Market Data ===")
+    for key, value in analysis['market_data'].items():
+        report.append(f"{key}: {value}")
+        
+    report.append("\n=== Technical Indicators ===")
+    for key, value in analysis.get('technical_indicators', {}).items():
+        report.append(f"{key}: {value}")
+        
+    report.append("\n=== Social Signals ===")
+    for influencer, signals in analysis['social_signals'].items():
+        report.append(f"\nInfluencer: {influencer}")
+        report.append(f"Impact Score: {signals['impact_score']}")
+        report.append(f"Relevant Posts: {len(signals['relevant_posts'])}")
+        
+    report.append("\n=== Risk Assessment ===")
+    risk = analysis['risk_assessment']
+    report.append(f"Overall Risk: {risk['overall_risk']:.2f}")
+    report.append("Risk Factors:")
+    for factor in risk['risk_factors']:
+        report.append(f"- {factor}")
+        
+    logging.debug("Decision report generated")
+    return "\n".join(report)
+
+def analyze_coin_shard(shard: List[Tuple[str, Optional[Dict], Optional[Dict], Dict]], freq: str = "1h") -> List[Dict]:
+    """CPU-bound part of a portfolio run, executed in a worker process.
+
+    Each item is (coin id, market payload, market_chart payload, social
+    signals), all fetched by the parent so workers never touch the network.
+    """
+    results = []
+    for coin_id, market_data, chart, social_signals in shard:
+        analysis = {
+            'coin_id': coin_id,
+            'timestamp': datetime.now().isoformat(),
+            'market_data': summarize_market_data(market_data) if market_data else {},
+            'social_signals': social_signals,
+            'technical_indicators': {},
+            'risk_assessment': {},
+            'decision_factors': []
+        }
+        try:
+            if chart:
+                analysis['technical_indicators'] = latest_indicators(market_chart_to_ohlcv(chart, freq))
+            analysis['risk_assessment'] = assess_risk(market_data, social_signals)
+            analysis['report'] = generate_decision_report(analysis)
+        except Exception as e:
+            analysis['error'] = str(e)
+        results.append(analysis)
+    return results
+
+def analyze_shards(items: Iterable[Tuple[str, Optional[Dict], Optional[Dict], Dict]], max_workers: int,
+                   shard_size: int, freq: str = "1h") -> Iterator[Dict]:
+    """Run analyze_coin_shard over ``items`` on a process pool, yielding analyses as shards finish.
+
+    ``items`` may be lazy: shards are submitted as soon as they fill, so
+    workers start while the parent is still fetching later coins.
+    """
+    # Spawned workers: the parent has live threads (fetchers, upstream scheduler) that fork would copy mid-lock
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        pending = {}
+
+        def results_of(future) -> List[Dict]:
+            shard = pending.pop(future)
+            try:
+                return future.result()
+            except Exception as e:
+                logging.error(f"Error analyzing portfolio shard: {str(e)}")
+                return [{'coin_id': item[0], 'error': str(e)} for item in shard]
+
+        shard = []
+        for item in items:
+            shard.append(item)
+            if len(shard) >= shard_size:
+                pending[pool.submit(analyze_coin_shard, shard, freq)] = shard
+                shard = []
+                # Stream shards that already finished while later items are still being fetched
+                for future in [future for future in pending if future.done()]:
+                    yield from results_of(future)
+        if shard:
+            pending[pool.submit(analyze_coin_shard, shard, freq)] = shard
+        for future in as_completed(list(pending)):
+            yield from results_of(future)
+
+def summarize_portfolio(coin_ids: List[str], analyses: Dict[str, Dict], top: int = 10) -> Dict:
+    missing = [coin_id for coin_id, analysis in analyses.items()
+               if not analysis.get('market_data') and 'error' not in analysis]
+    # A risk score computed without market data would skew the averages and rankings
+    missing_ids = set(missing)
+    scored = {coin_id: analysis for coin_id, analysis in analyses.items() if coin_id not in missing_ids}
+    risks = {
+        coin_id: analysis['risk_assessment']['overall_risk']
+        for coin_id, analysis in scored.items() if analysis.get('risk_assessment')
+    }
+    factors = Counter(
+        factor for analysis in scored.values()
+        for factor in analysis.get('risk_assessment', {}).get('risk_factors', [])
+    )
+    return {
+        'requested': len(coin_ids),
+        'analyzed': len(risks),
+        'missing_market_data': missing,
+        'failed': [coin_id for coin_id in coin_ids if coin_id not in analyses or 'error' in analyses[coin_id]],
+        'average_risk': sum(risks.values()) / len(risks) if risks else 0.0,
+        'highest_risk': sorted(risks.items(), key=lambda item: item[1], reverse=True)[:top],
+        'risk_factor_counts': dict(factors.most_common())
+    }
+
+def generate_portfolio_report(portfolio: Dict) -> str:
+    summary = portfolio['summary']
+    report = ["=== Portfolio Analysis Report ===", f"Generated at: {portfolio['timestamp']}"]
+    report.append(f"Coins analyzed: {summary['analyzed']} of {summary['requested']}")
+    if summary['missing_market_data']:
+        report.append(f"Missing market data: {', '.join(summary['missing_market_data'])}")
+    if summary['failed']:
+        report.append(f"Failed: {', '.join(summary['failed'])}")
+    report.append(f"Average Risk: {summary['average_risk']:.2f}")
+    report.append("\n=== Highest Risk ===")
+    for coin_id, risk in summary['highest_risk']:
+        report.append(f"{coin_id}: {risk:.2f}")
+    report.append("\n=== Risk Factors ===")
+    for factor, count in summary['risk_factor_counts'].items():
+        report.append(f"- {factor}: {count}")
+    return "\n".join(report)
+
 class DecisionEngine:
     """Advanced decision engine for crypto market analysis"""
     
-    def __init__(self):
+    def __init__(self, event_loop: Optional[BackgroundEventLoop] = None):
         logging.debug("Initializing DecisionEngine")
+        # Per-source timeouts (seconds); a slow source is dropped instead of delaying the analysis
+        self.market_timeout = float(os.getenv("DECISION_MARKET_TIMEOUT", "10"))
+        self.technical_timeout = float(os.getenv("DECISION_TECHNICAL_TIMEOUT", "15"))
+        self.social_timeout = float(os.getenv("DECISION_SOCIAL_TIMEOUT", "5"))
+        self.event_loop = event_loop
+        # Portfolio runs: worker processes for the CPU-bound stages, threads for chart downloads
+        self.portfolio_workers = int(os.getenv("DECISION_PORTFOLIO_WORKERS", str(os.cpu_count() or 1)))
+        self.portfolio_fetchers = int(os.getenv("DECISION_PORTFOLIO_FETCHERS", "8"))
         self.market_data = MarketDataAdapter()
         self.market_analyzer = MarketAnalyzer()
         self.influencer_tracker = InfluencerTracker()
+        # Offline post archives (JSONL files or directories), comma separated
+        archives = [path for path in os.getenv("SOCIAL_POST_ARCHIVES", "").split(",") if path.strip()]
+        if archives:
+            stats = self.influencer_tracker.ingest_posts(archives)
+            logging.debug(f"Ingested social posts: {stats}")
         self.web_analyzer = WebContentAnalyzer()
         self.text_analyzer = TextFileAnalyzer()
         self.analysis_cache = {}
         
+    async def _gather_source(self, name: str, timeout: float, func: Callable, *args) -> Tuple[str, Any, str]:
+        """Run one blocking source in a worker thread; (name, result or None, status)"""
+        try:
+            return name, await asyncio.wait_for(asyncio.to_thread(func, *args), timeout), 'ok'
+        except asyncio.TimeoutError:
+            # The worker thread cannot be cancelled; its result is simply dropped
+            logging.warning(f"Source {name} timed out after {timeout}s")
+            return name, None, 'timeout'
+        except Exception as e:
+            logging.warning(f"Source {name} failed: {str(e)}")
+            return name, None, 'error'
+
+    def _influencer_impact(self, influencer: str, coin_id: str) -> Dict:
+        return self.influencer_tracker.influencer_impact(influencer, coin_id)
+
     async def analyze_market_conditions(self, coin_id: str) -> Dict:
-        logging.debug(f"Analyzing market conditions asynchronously for: {coin_id}")
+        """Fetch market data, technical indicators and every influencer's impact concurrently.
+
+        Each source has its own timeout; sources that time out or fail are
+        reported in ``source_status`` and the analysis is built from the rest.
+        """
+        logging.debug(f"Analyzing market conditions for: {coin_id}")
         analysis = {
             'timestamp': datetime.now().isoformat(),
             'market_data': {},
             'social_signals': {},
             'technical_indicators': {},
             'risk_assessment': {},
-            'decision_factors': []
+            'decision_factors': [],
+            'source_status': {}
         }
-        
-        # Get market data
-        market_data = self.market_data.get_market_data(coin_id)
+
+        sources = [
+            self._gather_source('market_data', self.market_timeout, self.market_data.get_market_data, coin_id),
+            self._gather_source(
+                'technical_indicators', self.technical_timeout, self.market_analyzer.get_technical_indicators, coin_id
+            )
+        ]
+        sources += [
+            self._gather_source(f"influencer:{influencer}", self.social_timeout, self._influencer_impact, influencer, coin_id)
+            for influencer in list(self.influencer_tracker.INFLUENCERS)
+        ]
+        results = {}
+        for name, result, status in await asyncio.gather(*sources):
+            results[name] = result
+            analysis['source_status'][name] = status
+
+        # Market data
+        market_data = results.pop('market_data')
         if market_data:
             logging.debug(f"Market data retrieved for {coin_id}: {market_data}")
-            analysis['market_data'] = {
-                'price': market_data.get('market_data', {}).get('current_price', {}).get('usd'),
-                'volume': market_data.get('market_data', {}).get('total_volume', {}).get('usd'),
-                'market_cap': market_data.get('market_data', {}).get('market_cap', {}).get('usd')
-            }
-            
-        # Track influencer activity
-        for influencer in self.influencer_tracker.INFLUENCERS:
-            posts = self.influencer_tracker.get_recent_posts(influencer)
-            impact = self.influencer_tracker.analyze_impact(posts, coin_id)
-            if impact['impact_score'] > 0:
+            analysis['market_data'] = summarize_market_data(market_data)
+
+        # Technical indicators
+        analysis['technical_indicators'] = results.pop('technical_indicators') or {}
+
+        # Influencer activity
+        for name, impact in results.items():
+            if impact and impact['impact_score'] > 0:
                 logging.debug(f"Influencer impact detected: {impact}")
-                analysis['social_signals'][influencer] = impact
-                
+                analysis['social_signals'][name.split(':', 1)[1]] = impact
+
         # Risk assessment
-        analysis['risk_assessment'] = self.assess_risk(market_data, analysis['social_signals'])
+        analysis['risk_assessment'] = assess_risk(market_data, analysis['social_signals'])
         logging.debug(f"Risk assessment completed: {analysis['risk_assessment']}")
-        
+
         return analysis
-        
+
     def analyze_market_conditions_sync(self, coin_id: str) -> Dict:
-        logging.debug(f"Analyzing market conditions synchronously for: {coin_id}")
-        analysis = {
+        """Blocking wrapper that runs analyze_market_conditions on the engine's background loop"""
+        if self.event_loop is None:
+            self.event_loop = BackgroundEventLoop("decision-engine")
+        return self.event_loop.run(self.analyze_market_conditions(coin_id))
+
+    def get_social_signals(self, coin_id: str) -> Dict:
+        """Influencers with a non-zero impact on ``coin_id``"""
+        signals = {}
+        for influencer in list(self.influencer_tracker.INFLUENCERS):
+            impact = self._influencer_impact(influencer, coin_id)
+            if impact['impact_score'] > 0:
+                signals[influencer] = impact
+        return signals
+
+    def iter_portfolio(self, coin_ids: List[str], max_workers: Optional[int] = None,
+                       shard_size: Optional[int] = None, include_technical: bool = True,
+                       priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Analyse many coins across a process pool, yielding each coin's analysis as it finishes.
+
+        Network and in-memory lookups stay in this process: market payloads
+        come from one batched request per page of ids and charts are fetched
+        by a small thread pool. Workers only receive the payloads and run the
+        CPU-bound indicator, risk and report code.
+        """
+        coin_ids = list(dict.fromkeys(coin_ids))
+        max_workers = max_workers or self.portfolio_workers
+        # Several shards per worker keep the pool balanced and results streaming
+        shard_size = shard_size or max(1, math.ceil(len(coin_ids) / (max_workers * 4)))
+        market = self.market_data.get_market_data_many(coin_ids, priority)
+
+        with ThreadPoolExecutor(max_workers=self.portfolio_fetchers) as fetchers:
+            if include_technical:
+                charts = fetchers.map(lambda coin_id: self.market_analyzer.get_market_chart(coin_id, priority), coin_ids)
+            else:
+                charts = repeat(None)
+            items = (
+                (coin_id, market.get(coin_id), chart, self.get_social_signals(coin_id))
+                for coin_id, chart in zip(coin_ids, charts)
+            )
+            yield from analyze_shards(items, max_workers, shard_size, self.market_analyzer.freq)
+
+    def analyze_portfolio(self, coin_ids: List[str], **kwargs) -> Dict:
+        """Per-coin analyses (see iter_portfolio) merged with an aggregate summary and report"""
+        coin_ids = list(dict.fromkeys(coin_ids))
+        started = time.time()
+        analyses = {analysis['coin_id']: analysis for analysis in self.iter_portfolio(coin_ids, **kwargs)}
+        portfolio = {
             'timestamp': datetime.now().isoformat(),
-            'market_data': {},
-            'social_signals': {},
-            'technical_indicators': {},
-            'risk_assessment': {},
-            'decision_factors': []
+            'coins': {coin_id: analyses[coin_id] for coin_id in coin_ids if coin_id in analyses},
+            'summary': summarize_portfolio(coin_ids, analyses),
+            'seconds': time.time() - started
         }
-        
-        # Get market data
-        market_data = self.market_data.get_market_data(coin_id)
-        if market_data:
-            logging.debug(f"Market data retrieved for {coin_id}: {market_data}")
-            analysis['market_data'] = {
-                'price': market_data.get('market_data', {}).get('current_price', {}).get('usd'),
-                'volume': market_data.get('market_data', {}).get('total_volume', {}).get('usd'),
-                'market_cap': market_data.get('market_data', {}).get('market_cap', {}).get('usd')
-            }
-            
-        # Track influencer activity
-        for influencer in self.influencer_tracker.INFLUENCERS:
-            posts = self.influencer_tracker.get_recent_posts(influencer)
-            impact = self.influencer_tracker.analyze_impact(posts, coin_id)
-            if impact['impact_score'] > 0:
-                logging.debug(f"Influencer impact detected: {impact}")
-                analysis['social_signals'][influencer] = impact
-                
-        # Risk assessment
-        analysis['risk_assessment'] = self.assess_risk(market_data, analysis['social_signals'])
-        logging.debug(f"Risk assessment completed: {analysis['risk_assessment']}")
-        
-        return analysis
-        
+        portfolio['report'] = generate_portfolio_report(portfolio)
+        return portfolio
+
     def assess_risk(self, market_data: Dict, social_signals: Dict) -> Dict:
-        logging.debug("Assessing risk factors")
-        risk_assessment = {
-            'market_risk': 0,
-            'social_risk': 0,
-            'volatility_risk': 0,
-            'overall_risk': 0,
-            'risk_factors': []
-        }
-        
-        # Market risk factors
-        if market_data:
-            price_change = market_data.get('market_data', {}).get('price_change_percentage_24h', 0)
-            volume = market_data.get('market_data', {}).get('total_volume', {}).get('usd', 0)
-            market_cap = market_data.get('market_data', {}).get('market_cap', {}).get('usd', 0)
-            
-            if abs(price_change) > 20:
-                risk_assessment['volatility_risk'] += 2
-                risk_assessment['risk_factors'].append('High price volatility')
-                
-            if volume > 0 and market_cap > 0:
-                volume_to_mcap = volume / market_cap
-                if volume_to_mcap > 0.5:
-                    risk_assessment['market_risk'] += 1
-                    risk_assessment['risk_factors'].append('High volume relative to market cap')
-                    
-        # Social risk factors
-        for influencer, impact in social_signals.items():
-            if impact['impact_score'] > 5:
-                risk_assessment['social_risk'] += 1
-                risk_assessment['risk_factors'].append(f'High social impact from {influencer}')
-                
-        # Calculate overall risk
-        risk_assessment['overall_risk'] = (
-            risk_assessment['market_risk'] + 
-            risk_assessment['social_risk'] + 
-            risk_assessment['volatility_risk']
-        ) / 3
-        
-        logging.debug(f"Risk assessment completed: {risk_assessment}")
-        return risk_assessment
-        
+        return assess_risk(market_data, social_signals)
+
     def generate_decision_report(self, analysis: Dict) -> str:
-        logging.debug("Generating decision report")
-        report = []
-        
-        report.append("=== Market Analysis Report ===")
-        report.append(f"Generated at: {analysis['timestamp']}")
-        report.append("\n=== Market Data ===")
-        for key, value in analysis['market_data'].items():
-            report.append(f"{key}: {value}")
-            
-        report.append("\n=== Social Signals ===")
-        for influencer, signals in analysis['social_signals'].items():
-            report.append(f"\nInfluencer: {influencer}")
-            report.append(f"Impact Score: {signals['impact_score']}")
-            report.append(f"Relevant Posts: {len(signals['relevant_posts'])}")
-            
-        report.append("\n=== Risk Assessment ===")
-        risk = analysis['risk_assessment']
-        report.append(f"Overall Risk: {risk['overall_risk']:.2f}")
-        report.append("Risk Factors:")
-        for factor in risk['risk_factors']:
-            report.append(f"- {factor}")
-            
-        logging.debug("Decision report generated")
-        return "\n".join(report)
-        
+        return generate_decision_report(analysis)
+
     def process_text_file(self, file_path: str, keywords: List[str]) -> Dict:
         logging.debug(f"Processing text file: {file_path}")
-        content = self.text_analyzer.read_file(file_path)
-        if content:
-            return self.text_analyzer.analyze_content(content, keywords)
-        logging.debug(f"Text file processing failed: {file_path}")
-        return {}
+        try:
+            # Memory-mapped scan; the file is never loaded whole
+            if os.path.isdir(file_path):
+                return self.text_analyzer.analyze_directory(file_path, keywords)
+            return self.text_analyzer.scan_file(file_path, keywords)
+        except Exception as e:
+            logging.debug(f"Text file processing failed: {file_path}: {str(e)}")
+            return {}
         
     def analyze_webpage(self, url: str, keywords: List[str]) -> Dict:
         logging.debug(f"Analyzing webpage: {url}")
@@ -173,4 +374,38 @@ class DecisionEngine:
         if content:
             return self.web_analyzer.analyze_webpage(content, keywords)
         logging.debug(f"Webpage analysis failed: {url}")
-        return {}
\ No newline at end of file
+        return {}
+
+    def analyze_webpages(self, urls: List[str], keywords: List[str]) -> Dict[str, Dict]:
+        """Crawl many pages concurrently; unchanged pages are revalidated, not re-downloaded"""
+        logging.debug(f"Analyzing {len(urls)} webpages")
+        return self.web_analyzer.crawl_sync(urls, keywords)
+
+if __name__ == "__main__":
+    import random
+    import sys
+
+    # Synthetic 30-day hourly charts, analysed with one worker and then with every core
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    random.seed(0)
+    now_ms = int(time.time() * 1000)
+    items = []
+    for index in range(count):
+        price, prices, volumes = 100.0, [], []
+        for step in range(30 * 24 * 12):
+            price *= 1 + random.gauss(0, 0.002)
+            timestamp = now_ms - (30 * 24 * 12 - step) * 300000
+            prices.append([timestamp, price])
+            volumes.append([timestamp, random.uniform(1e6, 1e7)])
+        market = {'market_data': {
+            'current_price': {'usd': price}, 'total_volume': {'usd': volumes[-1][1]},
+            'market_cap': {'usd': price * 1e7}, 'price_change_percentage_24h': random.uniform(-30, 30)
+        }}
+        items.append((f"coin-{index}", market, {'prices': prices, 'total_volumes': volumes}, {}))
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, cores}):
+        started = time.time()
+        analyses = list(analyze_shards(items, workers, max(1, math.ceil(count / (workers * 4)))))
+        elapsed = time.time() - started
+        print(f"{workers} worker(s): {len(analyses)} coins in {elapsed:.2f}s ({len(analyses) / elapsed:.1f} coins/s)")
@@ -1,19 +1,26 @@
-import re
 import random
-from typing import Dict, List, Tuple, Optional
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+from typing import Dict, Iterator, List, Tuple, Optional
+from intent_engine import IntentMatch, intent_engine
+from model_registry import model_registry, DEFAULT_MODEL_NAME
+from generation_scheduler import generation_scheduler
 
 class CryptoAdvisor:
-    def __init__(self):
-        # Initialize the model and tokenizer
-        self.model_name = "facebook/opt-350m"  # Using a smaller model for faster responses
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        # The model and tokenizer live in the shared registry and are only
+        # loaded the first time generation actually needs them
+        self.model_name = model_name
         
         # Initialize patterns
         self.init_patterns()
 
+    @property
+    def tokenizer(self):
+        return model_registry.get(self.model_name)[0]
+
+    @property
+    def model(self):
+        return model_registry.get(self.model_name)[1]
+
     def init_patterns(self):
         """Initialize ELIZA-style patterns for crypto analysis"""
         self.CRYPTO_PATTERNS = {
@@ -44,40 +51,34 @@ class CryptoAdvisor:
             ]
         }
 
-def match_pattern(user_input: str) -> Optional[Tuple[str, str]]:
+# Shared advisor instance; building it is cheap since weights come from the registry
+advisor = CryptoAdvisor()
+
+intent_engine.register('advisor', [(pattern, pattern) for pattern in advisor.CRYPTO_PATTERNS])
+
+def match_pattern(user_input: str, matches: Optional[Dict[str, IntentMatch]] = None) -> Optional[Tuple[str, str]]:
     """Match user input against crypto-specific patterns"""
-    advisor = CryptoAdvisor()
-    for pattern, responses in advisor.CRYPTO_PATTERNS.items():
-        match = re.search(pattern, user_input.lower())
-        if match:
-            # Get the captured coin name or use the whole match
-            captured = match.group(2) if len(match.groups()) > 1 else match.group(1)
-            response_template = random.choice(responses)
-            return response_template, captured
+    if matches is None:
+        matches = intent_engine.match(user_input)
+    match = matches.get('advisor')
+    if match:
+        # The intent is the pattern itself, so its responses are one lookup away
+        response_template = random.choice(advisor.CRYPTO_PATTERNS[match.intent])
+        return response_template, match.coin
     return None
 
+def build_prompt(user_input: str) -> str:
+    return f"You are a crypto market analyst. Respond to: {user_input}"
+
 def get_market_aware_response(user_input: str) -> str:
     """Generate a response using the language model"""
-    advisor = CryptoAdvisor()
     try:
         # Prepare the prompt
-        prompt = f"You are a crypto market analyst. Respond to: {user_input}"
-        
-        # Encode and generate response
-        inputs = advisor.tokenizer.encode(prompt, return_tensors="pt", max_length=512, truncation=True)
-        outputs = advisor.model.generate(
-            inputs,
-            max_length=150,
-            num_return_sequences=1,
-            pad_token_id=advisor.tokenizer.eos_token_id,
-            temperature=0.7
-        )
+        prompt = build_prompt(user_input)
         
-        # Decode and clean up response
-        response = advisor.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract the actual response (remove the prompt)
-        response = response.replace(prompt, "").strip()
+        # Concurrent callers are batched into a single generate call; the
+        # scheduler returns only the newly generated text
+        response = generation_scheduler.generate(prompt).strip()
         
         return response if response else "Could you clarify what you'd like to know about the crypto market?"
     
@@ -85,6 +86,28 @@ def get_market_aware_response(user_input: str) -> str:
         print(f"Error generating response: {str(e)}")
         return "I'm having trouble analyzing that. Could you rephrase your question?"
 
+def stream_market_aware_response(user_input: str) -> Iterator[str]:
+    """Streaming variant of get_market_aware_response yielding text as it is decoded"""
+    produced = False
+    try:
+        prompt = build_prompt(user_input)
+        for text in generation_scheduler.stream(prompt):
+            # Drop leading whitespace so the streamed answer matches the blocking one
+            if not produced:
+                text = text.lstrip()
+                if not text:
+                    continue
+            produced = True
+            yield text
+    except Exception as e:
+        print(f"Error generating response: {str(e)}")
+        if not produced:
+            yield "I'm having trouble analyzing that. Could you rephrase your question?"
+        return
+
+    if not produced:
+        yield "Could you clarify what you'd like to know about the crypto market?"
+
 if __name__ == "__main__":
     # Test the pattern matching
     test_input = "analyze BTC price trends"
@@ -1,6 +1,7 @@
 from typing import Dict, List, Tuple, Optional
-import re
 import random
+from intent_engine import IntentMatch, intent_engine
+from coin_resolver import coin_resolver
 
 # Market-specific decomposition rules
 MARKET_PATTERNS = {
@@ -21,6 +22,11 @@ MARKET_PATTERNS = {
     ]
 }
 
+# First matching rule across all groups wins, in declaration order
+intent_engine.register('market', [
+    rule for patterns in MARKET_PATTERNS.values() for rule in patterns
+])
+
 # Response templates
 RESPONSE_TEMPLATES = {
     'price_inquiry': [
@@ -40,16 +46,21 @@ RESPONSE_TEMPLATES = {
     ]
 }
 
-def match_crypto_pattern(user_input: str) -> Optional[Tuple[str, Dict]]:
-    """Enhanced pattern matching for crypto-specific queries"""
-    for pattern_type, patterns in MARKET_PATTERNS.items():
-        for pattern, response_type in patterns:
-            match = re.search(pattern, user_input.lower())
-            if match:
-                groups = match.groups()
-                coin = groups[-1] if groups else ""
-                return (
-                    random.choice(RESPONSE_TEMPLATES.get(response_type, ["Tell me more about that."])),
-                    {'coin': coin}
-                )
-    return None
\ No newline at end of file
+def match_crypto_pattern(user_input: str, matches: Optional[Dict[str, IntentMatch]] = None,
+                         coin_id: Optional[str] = None) -> Optional[Tuple[str, Dict]]:
+    """Enhanced pattern matching for crypto-specific queries
+
+    ``matches`` and ``coin_id`` may be passed in when the caller already ran
+    the intent engine and the coin resolver on this message.
+    """
+    if matches is None:
+        matches = intent_engine.match(user_input)
+    match = matches.get('market')
+    if match:
+        if coin_id is None:
+            coin_id = coin_resolver.resolve_message(user_input, match.coin)
+        return (
+            random.choice(RESPONSE_TEMPLATES.get(match.intent, ["Tell me more about that."])),
+            {'coin': match.coin, 'coin_id': coin_id}
+        )
+    return None
@@ -0,0 +1,186 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+# Payload sections a profile can provide:
+#   spot      - current price, 24h change, market cap, 24h volume
+#   market    - full market_data block (7d/30d changes, ATH, supply, rank)
+#   community - community_data block
+#   developer, tickers, sparkline - the heavy optional blocks of /coins/{id}
+
+class FetchProfile:
+    """A named CoinGecko request shape and the payload sections it provides"""
+
+    def __init__(self, name: str, path: str, params: Dict[str, str], sections: Set[str]):
+        self.name = name
+        self.path = path
+        self.params = params
+        self.sections = sections
+
+    def url(self, base_url: str, coin_id: str) -> str:
+        return base_url + self.path.format(coin_id=coin_id)
+
+    def params_for(self, coin_id: str) -> Dict[str, str]:
+        return {key: value.format(coin_id=coin_id) for key, value in self.params.items()}
+
+    def normalize(self, coin_id: str, payload: Optional[Dict]) -> Optional[Dict]:
+        """Reshape the response into the /coins/{id} layout the stages expect"""
+        return payload
+
+class SimplePriceProfile(FetchProfile):
+    """Price-only profile backed by the tiny /simple/price endpoint"""
+
+    def normalize(self, coin_id: str, payload: Optional[Dict]) -> Optional[Dict]:
+        if not payload or coin_id not in payload:
+            return None
+        return simple_price_to_coin_data(coin_id, payload[coin_id])
+
+def simple_price_to_coin_data(coin_id: str, quote: Dict) -> Dict:
+    last_updated = quote.get('last_updated_at')
+    return {
+        'id': coin_id,
+        'market_data': {
+            'current_price': {'usd': quote.get('usd')},
+            'market_cap': {'usd': quote.get('usd_market_cap')},
+            'total_volume': {'usd': quote.get('usd_24h_vol')},
+            'price_change_percentage_24h': quote.get('usd_24h_change'),
+            'last_updated': datetime.fromtimestamp(last_updated, tz=timezone.utc).isoformat() if last_updated else None
+        }
+    }
+
+def _coin_params(market: bool = False, community: bool = False, developer: bool = False,
+                 tickers: bool = False, sparkline: bool = False) -> Dict[str, str]:
+    def flag(value: bool) -> str:
+        return "true" if value else "false"
+    return {
+        "localization": "false",
+        "tickers": flag(tickers),
+        "market_data": flag(market),
+        "community_data": flag(community),
+        "developer_data": flag(developer),
+        "sparkline": flag(sparkline)
+    }
+
+# Ordered from cheapest to most expensive; selection picks the first that fits
+FETCH_PROFILES: Dict[str, FetchProfile] = {
+    'price': SimplePriceProfile(
+        'price', '/simple/price',
+        {
+            "ids": "{coin_id}",
+            "vs_currencies": "usd",
+            "include_market_cap": "true",
+            "include_24hr_vol": "true",
+            "include_24hr_change": "true",
+            "include_last_updated_at": "true"
+        },
+        {'spot'}
+    ),
+    'community': FetchProfile('community', '/coins/{coin_id}', _coin_params(community=True), {'community'}),
+    'market': FetchProfile('market', '/coins/{coin_id}', _coin_params(market=True), {'spot', 'market'}),
+    'market_community': FetchProfile(
+        'market_community', '/coins/{coin_id}', _coin_params(market=True, community=True),
+        {'spot', 'market', 'community'}
+    ),
+    'full': FetchProfile(
+        'full', '/coins/{coin_id}',
+        _coin_params(market=True, community=True, developer=True, tickers=True, sparkline=True),
+        {'spot', 'market', 'community', 'developer', 'tickers', 'sparkline'}
+    )
+}
+
+def select_profile(sections: Iterable[str]) -> Optional[FetchProfile]:
+    """Return the cheapest profile covering ``sections`` (None when nothing is needed)"""
+    required = set(sections)
+    if not required:
+        return None
+    for profile in FETCH_PROFILES.values():
+        if required <= profile.sections:
+            return profile
+    raise ValueError(f"No fetch profile provides sections: {sorted(required)}")
+
+# CoinGecko accepts at most this many ids per batched request
+BULK_PAGE_SIZE = 250
+
+class BulkFetchProfile:
+    """A batched request shape returning many coins per call"""
+
+    def __init__(self, name: str, path: str, params: Dict[str, str], sections: Set[str]):
+        self.name = name
+        self.path = path
+        self.params = params
+        self.sections = sections
+
+    def url(self, base_url: str) -> str:
+        return base_url + self.path
+
+    def params_for(self, coin_ids: List[str]) -> Dict[str, str]:
+        params = dict(self.params)
+        params['ids'] = ",".join(coin_ids)
+        return params
+
+    def normalize(self, payload) -> Dict[str, Dict]:
+        """Map each returned coin id to a payload in the /coins/{id} layout"""
+        if not payload:
+            return {}
+        return {coin_id: simple_price_to_coin_data(coin_id, quote) for coin_id, quote in payload.items()}
+
+class CoinMarketsProfile(BulkFetchProfile):
+    """Batched market data from /coins/markets"""
+
+    def normalize(self, payload) -> Dict[str, Dict]:
+        if not payload:
+            return {}
+        return {row['id']: markets_row_to_coin_data(row) for row in payload if row.get('id')}
+
+def markets_row_to_coin_data(row: Dict) -> Dict:
+    return {
+        'id': row.get('id'),
+        'symbol': row.get('symbol'),
+        'name': row.get('name'),
+        'market_cap_rank': row.get('market_cap_rank'),
+        'market_data': {
+            'current_price': {'usd': row.get('current_price')},
+            'market_cap': {'usd': row.get('market_cap')},
+            'total_volume': {'usd': row.get('total_volume')},
+            'price_change_percentage_24h': row.get('price_change_percentage_24h'),
+            'price_change_percentage_7d': row.get('price_change_percentage_7d_in_currency'),
+            'price_change_percentage_30d': row.get('price_change_percentage_30d_in_currency'),
+            'ath': {'usd': row.get('ath')},
+            'ath_change_percentage': {'usd': row.get('ath_change_percentage')},
+            'circulating_supply': row.get('circulating_supply'),
+            'total_supply': row.get('total_supply'),
+            'last_updated': row.get('last_updated')
+        }
+    }
+
+BULK_FETCH_PROFILES: Dict[str, BulkFetchProfile] = {
+    'price': BulkFetchProfile(
+        'price', '/simple/price',
+        {
+            "vs_currencies": "usd",
+            "include_market_cap": "true",
+            "include_24hr_vol": "true",
+            "include_24hr_change": "true",
+            "include_last_updated_at": "true"
+        },
+        {'spot'}
+    ),
+    'markets': CoinMarketsProfile(
+        'markets', '/coins/markets',
+        {
+            "vs_currency": "usd",
+            "per_page": str(BULK_PAGE_SIZE),
+            "page": "1",
+            "sparkline": "false",
+            "price_change_percentage": "24h,7d,30d"
+        },
+        {'spot', 'market'}
+    )
+}
+
+def select_bulk_profile(sections: Iterable[str]) -> Optional[BulkFetchProfile]:
+    """Return the cheapest batched profile covering ``sections``, or None if none can"""
+    required = set(sections)
+    for profile in BULK_FETCH_PROFILES.values():
+        if required <= profile.sections:
+            return profile
+    return None
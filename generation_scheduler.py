@@ -0,0 +1,227 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional
+
+from model_registry import inference_context, model_registry, DEFAULT_MODEL_NAME
+
+class StreamJob(NamedTuple):
+    prompt: str
+    streamer: object  # transformers.TextIteratorStreamer
+    stop: threading.Event  # set when the consumer goes away
+    done: Future  # resolves when generation ends; carries its exception
+
+class GenerationScheduler:
+    """Collects concurrent prompts into micro-batches for a single generate call.
+
+    Requests wait at most ``max_wait_ms`` for company; as soon as
+    ``max_batch_size`` prompts are queued the batch is dispatched immediately.
+    One background worker owns the model, so forward passes never overlap;
+    streaming requests are queued to the same worker and run on their own.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, max_batch_size: int = 8,
+                 max_wait_ms: float = 20, max_new_tokens: int = 100, temperature: float = 0.7):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # Counted after the prompt, so a reply's length never depends on what it was batched with
+        self.max_new_tokens = max_new_tokens
+        # 0 means greedy decoding
+        self.temperature = temperature
+
+        self._queue: "queue.Queue" = queue.Queue()
+        # Stream jobs met while collecting a batch; they run right after it
+        self._deferred: Deque[StreamJob] = deque()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_batch_seen = 0
+        self._total_generate_seconds = 0.0
+        self._streams = 0
+        self._total_stream_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+                self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt and return a Future resolving to the generated text"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Blocking helper: submit a prompt and wait for its completion"""
+        return self.submit(prompt).result(timeout=timeout)
+
+    def _collect_batch(self) -> List:
+        # Block for the first request, then gather more until full or the window closes
+        if self._deferred:
+            return [self._deferred.popleft()]
+        first = self._queue.get()
+        if isinstance(first, StreamJob):
+            return [first]
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if isinstance(item, StreamJob):
+                self._deferred.append(item)
+            else:
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+            if isinstance(batch[0], StreamJob):
+                self._run_stream(batch[0])
+                with self._metrics_lock:
+                    self._streams += 1
+                    self._total_stream_seconds += time.monotonic() - started
+                continue
+
+            prompts = [prompt for prompt, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self._generate_batch(prompts)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            finally:
+                with self._metrics_lock:
+                    self._batches += 1
+                    self._requests += len(batch)
+                    self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                    self._total_generate_seconds += time.monotonic() - started
+
+    def _sampling_options(self) -> Dict:
+        # generate() ignores temperature unless sampling is switched on
+        if self.temperature > 0:
+            return {'do_sample': True, 'temperature': self.temperature}
+        return {'do_sample': False}
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        # The registry loads tokenizers left padded, so every prompt ends at the same position
+        tokenizer, model = model_registry.get(self.model_name)
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, max_length=512, truncation=True)
+        with inference_context():
+            outputs = model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_new_tokens=self.max_new_tokens,
+                num_return_sequences=1,
+                pad_token_id=tokenizer.eos_token_id,
+                **self._sampling_options()
+            )
+
+        prompt_length = inputs["input_ids"].shape[1]
+        return [
+            tokenizer.decode(output[prompt_length:], skip_special_tokens=True)
+            for output in outputs
+        ]
+
+    def _run_stream(self, job: StreamJob):
+        """Generate one streaming request on the worker thread"""
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        class StopWhenSet(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                import torch
+                return torch.full((input_ids.shape[0],), job.stop.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        if job.stop.is_set():
+            # The consumer left while the job was queued
+            job.done.set_result(None)
+            job.streamer.end()
+            return
+        try:
+            tokenizer, model = model_registry.get(self.model_name)
+            inputs = tokenizer(job.prompt, return_tensors="pt", max_length=512, truncation=True)
+            with inference_context():
+                model.generate(
+                    input_ids=inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    max_new_tokens=self.max_new_tokens,
+                    num_return_sequences=1,
+                    pad_token_id=tokenizer.eos_token_id,
+                    streamer=job.streamer,
+                    stopping_criteria=StoppingCriteriaList([StopWhenSet()]),
+                    **self._sampling_options()
+                )
+        except Exception as e:
+            # Resolve before ending the streamer so the consumer sees the error once its loop stops
+            job.done.set_exception(e)
+            job.streamer.end()
+        else:
+            job.done.set_result(None)
+
+    def stream(self, prompt: str, timeout: Optional[float] = 60) -> Iterator[str]:
+        """Yield decoded text pieces as soon as the model produces them.
+
+        Streaming requests bypass batching but still run on the worker
+        thread, one at a time. Closing the iterator (e.g. the SSE client
+        disconnected) stops generation at the next token.
+        """
+        from transformers import TextIteratorStreamer
+
+        tokenizer, _ = model_registry.get(self.model_name)
+        self._ensure_started()
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+        job = StreamJob(prompt, streamer, threading.Event(), Future())
+        self._queue.put(job)
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+            error = job.done.exception(timeout=timeout)
+            if error is not None:
+                raise error
+        finally:
+            job.stop.set()
+
+    def get_metrics(self) -> Dict:
+        """Return queue depth and batching statistics"""
+        with self._metrics_lock:
+            batches = self._batches
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': batches,
+                'requests': self._requests,
+                'avg_batch_size': self._requests / batches if batches else 0,
+                'max_batch_seen': self._max_batch_seen,
+                'avg_generate_seconds': self._total_generate_seconds / batches if batches else 0,
+                'streams': self._streams,
+                'avg_stream_seconds': self._total_stream_seconds / self._streams if self._streams else 0
+            }
+
+# Shared scheduler; batch size and wait window are tunable per deployment
+generation_scheduler = GenerationScheduler(
+    max_batch_size=int(os.getenv("LLM_MAX_BATCH_SIZE", "8")),
+    max_wait_ms=float(os.getenv("LLM_MAX_WAIT_MS", "20")),
+    max_new_tokens=int(os.getenv("LLM_MAX_NEW_TOKENS", "100"))
+)
@@ -0,0 +1,198 @@
+"""Single-pass intent matching over every registered pattern set.
+
+Each pattern set is an ordered list of ``(pattern, intent)`` rules where the
+first rule that ``re.search``-matches wins. All sets are merged into one
+compiled regex anchored at the start of the (lowercased) message::
+
+    ^(?:(?=(?s:.*?)(P1))|(?=(?s:.*?)(P2))|...)?(?:...next set...)?
+
+Inside a set the alternation tries the rules in order and stops at the first
+lookahead that succeeds; the lazy ``.*?`` prefix finds the leftmost start
+just like ``re.search``, so the captures are identical. Every set is optional,
+so one ``match`` call reports the winning rule of each set.
+
+A keyword prefilter first drops rules whose required literals do not occur
+in the message; merged regexes are compiled per candidate set and cached.
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+# Coin mentioned after a command word, e.g. "analyze DOGE"
+COIN_MENTION_PATTERN = r'(?:analyze|check|about)\s+(\w+)'
+
+class IntentMatch(NamedTuple):
+    intent: str
+    index: int  # position of the winning rule within its set
+    groups: Tuple[Optional[str], ...]
+
+    @property
+    def coin(self) -> str:
+        """The rule's last capture, which every pattern set uses for the coin"""
+        return (self.groups[-1] or "") if self.groups else ""
+
+LITERAL_ALTERNATION = re.compile(r"[a-z0-9' ]+(?:\|[a-z0-9' ]+)*")
+
+def required_literals(pattern: str) -> List[Tuple[str, ...]]:
+    """Conservative keyword requirements of a pattern, used as a prefilter.
+
+    Returns a list of alternatives tuples: a text can only match if, for each
+    tuple, it contains at least one of its strings. Only top-level literal
+    runs and unquantified groups of plain-literal alternatives count, so an
+    empty list (no prefilter) is always a safe answer.
+    """
+    requirements: List[Tuple[str, ...]] = []
+    run = ""
+
+    def flush():
+        nonlocal run
+        if run.strip():
+            requirements.append((run,))
+        run = ""
+
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            flush()
+            i += 2
+        elif char == '(':
+            flush()
+            depth, j = 1, i + 1
+            while j < len(pattern) and depth:
+                if pattern[j] == '\\':
+                    j += 1
+                elif pattern[j] == '(':
+                    depth += 1
+                elif pattern[j] == ')':
+                    depth -= 1
+                j += 1
+            inner = pattern[i + 1:j - 1]
+            if inner.startswith('?:'):
+                inner = inner[2:]
+            quantified = j < len(pattern) and pattern[j] in '*?+{'
+            if not quantified and LITERAL_ALTERNATION.fullmatch(inner):
+                requirements.append(tuple(inner.split('|')))
+            i = j
+        elif char == '[':
+            flush()
+            i = pattern.index(']', i + 2) + 1 if ']' in pattern[i + 2:] else len(pattern)
+        elif char == '|':
+            # Top-level alternation: nothing is required by every branch
+            return []
+        elif char in '*?+{':
+            # The quantified character is optional (or repeated), drop it from the run
+            run = run[:-1]
+            flush()
+            i = pattern.index('}', i) + 1 if char == '{' and '}' in pattern[i:] else i + 1
+        elif char in '.^$':
+            flush()
+            i += 1
+        else:
+            run += char
+            i += 1
+    flush()
+    return requirements
+
+class IntentEngine:
+    def __init__(self, max_cached_regexes: int = 256):
+        self._sets: Dict[str, List[Tuple[str, str]]] = {}
+        self._rules: List[Tuple[str, int, str, str, List[Tuple[str, ...]]]] = []
+        self._regexes: Dict[Tuple[int, ...], Tuple[Pattern, List]] = {}
+        self.max_cached_regexes = max_cached_regexes
+        self._lock = threading.Lock()
+
+    def register(self, name: str, patterns: Iterable[Tuple[str, str]]) -> None:
+        """Add or replace an ordered pattern set; patterns are matched against lowercased text"""
+        with self._lock:
+            self._sets[name] = list(patterns)
+            self._rules = [
+                (set_name, index, pattern, intent, required_literals(pattern))
+                for set_name, rules in self._sets.items()
+                for index, (pattern, intent) in enumerate(rules)
+            ]
+            self._regexes = {}
+
+    def _compile(self, candidates: Tuple[int, ...]) -> Tuple[Pattern, List]:
+        """Merged regex over the candidate rules, grouped by set in declaration order"""
+        sets: Dict[str, List] = {}
+        for rule in candidates:
+            set_name, index, pattern, intent, _ = self._rules[rule]
+            sets.setdefault(set_name, []).append((index, pattern, intent))
+
+        parts = []
+        layout = []  # (set name, [(intent, index, wrapper group, capture count)])
+        group = 0
+        for set_name, rules in sets.items():
+            alternatives = []
+            entries = []
+            for index, pattern, intent in rules:
+                captures = re.compile(pattern).groups
+                group += 1
+                entries.append((intent, index, group, captures))
+                alternatives.append(f"(?=(?s:.*?)({pattern}))")
+                group += captures
+            parts.append(f"(?:{'|'.join(alternatives)})?")
+            layout.append((set_name, entries))
+        return re.compile('^' + ''.join(parts)), layout
+
+    def _get_compiled(self, candidates: Tuple[int, ...]) -> Tuple[Pattern, List]:
+        compiled = self._regexes.get(candidates)
+        if compiled is None:
+            compiled = self._compile(candidates)
+            with self._lock:
+                if len(self._regexes) >= self.max_cached_regexes:
+                    self._regexes = {}
+                self._regexes[candidates] = compiled
+        return compiled
+
+    def match(self, text: str) -> Dict[str, IntentMatch]:
+        """Winning rule of every pattern set that matches ``text``"""
+        text = text.lower()
+        # Keyword prefilter: rules whose required literals are absent cannot match
+        candidates = tuple(
+            rule for rule, (_, _, _, _, requirements) in enumerate(self._rules)
+            if all(any(literal in text for literal in alternatives) for alternatives in requirements)
+        )
+        if not candidates:
+            return {}
+
+        regex, layout = self._get_compiled(candidates)
+        match = regex.match(text)
+        groups = match.groups()
+        results = {}
+        for set_name, entries in layout:
+            for intent, index, group, captures in entries:
+                if match.start(group) != -1:
+                    results[set_name] = IntentMatch(intent, index, groups[group:group + captures])
+                    break
+        return results
+
+# Shared engine; pattern modules register their sets on import
+intent_engine = IntentEngine()
+intent_engine.register('coin_mention', [(COIN_MENTION_PATTERN, 'coin_mention')])
+
+if __name__ == "__main__":
+    # Benchmark against the legacy matchers; equivalence is checked in tests/test_intent_engine.py
+    import timeit
+
+    from eliza_patterns import MARKET_PATTERNS
+    from eliza_crypto_advisor import advisor
+    from tests.test_intent_engine import (CORPUS, engine_all, legacy_coin, legacy_match_crypto_pattern,
+                                          legacy_match_pattern)
+
+    corpus = CORPUS * 20
+
+    def legacy_all(user_input: str):
+        return (
+            legacy_coin(user_input),
+            legacy_match_crypto_pattern(MARKET_PATTERNS, user_input),
+            legacy_match_pattern(advisor.CRYPTO_PATTERNS, user_input)
+        )
+
+    runs = 5
+    legacy_time = min(timeit.repeat(lambda: [legacy_all(line) for line in corpus], number=1, repeat=runs))
+    engine_time = min(timeit.repeat(lambda: [engine_all(line) for line in corpus], number=1, repeat=runs))
+    print(f"Legacy matchers: {legacy_time / len(corpus) * 1e6:.2f} us/message")
+    print(f"Intent engine:   {engine_time / len(corpus) * 1e6:.2f} us/message")
+    print(f"Speedup: {legacy_time / engine_time:.1f}x")
@@ -1,38 +1,56 @@
-import requests
 import json
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 from datetime import datetime
 import pandas as pd
+from response_cache import ResponseCache
+from fetch_profiles import BULK_FETCH_PROFILES, BULK_PAGE_SIZE, FETCH_PROFILES
+from technical_analysis import fetch_market_chart, market_chart_to_frame, price_frame_to_ohlcv, latest_indicators
+from price_store import PriceHistoryStore, price_store
+from upstream import INTERACTIVE, upstream_scheduler
 
 class MarketDataHandler:
     def __init__(self):
         self.coingecko_api = "https://api.coingecko.com/api/v3"
-        self.cache = {}
         self.cache_duration = 60  # seconds
+        self.cache = ResponseCache(max_entries=512, ttl=self.cache_duration, stale_ttl=self.cache_duration * 4)
 
-    def get_coin_data(self, coin_id: str) -> Optional[Dict]:
-        """Fetch current coin data from CoinGecko"""
+    def _fetch_json(self, url: str, params: Dict, priority: int = INTERACTIVE) -> Optional[Dict]:
         try:
-            url = f"{self.coingecko_api}/coins/{coin_id}"
-            params = {
-                "localization": "false",
-                "tickers": "true",
-                "market_data": "true",
-                "community_data": "true",
-                "developer_data": "true"
-            }
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return upstream_scheduler.get_json(url, params, priority)
         except Exception as e:
             print(f"Error fetching coin data: {str(e)}")
             return None
 
+    def get_coin_data(self, coin_id: str, profile: str = 'full') -> Optional[Dict]:
+        """Fetch current coin data from CoinGecko using the named fetch profile"""
+        fetch_profile = FETCH_PROFILES[profile]
+        url = fetch_profile.url(self.coingecko_api, coin_id)
+        params = fetch_profile.params_for(coin_id)
+        key = self.cache.make_key(fetch_profile.path, coin_id, params)
+        return self.cache.get_or_fetch(key, lambda: fetch_profile.normalize(coin_id, self._fetch_json(url, params)))
+
+    def get_coin_data_many(self, coin_ids: List[str], profile: str = 'markets',
+                           priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Fetch many coins through a batched endpoint, BULK_PAGE_SIZE ids per request"""
+        bulk_profile = BULK_FETCH_PROFILES[profile]
+        url = bulk_profile.url(self.coingecko_api)
+        coin_datas: Dict[str, Dict] = {}
+        for i in range(0, len(coin_ids), BULK_PAGE_SIZE):
+            params = bulk_profile.params_for(coin_ids[i:i + BULK_PAGE_SIZE])
+            key = self.cache.make_key(bulk_profile.path, "", params)
+            # Bind this page's params; a late-running fetch must not see a later page's ids
+            page = self.cache.get_or_fetch(
+                key, lambda params=params: bulk_profile.normalize(self._fetch_json(url, params, priority))
+            )
+            coin_datas.update(page or {})
+        return coin_datas
+
     def get_market_analysis_sync(self, coin_id: str) -> Dict:
         """Get comprehensive market analysis"""
         try:
-            coin_data = self.get_coin_data(coin_id)
+            # Only market and community data are read below; skip tickers and developer stats
+            coin_data = self.get_coin_data(coin_id, 'market_community')
             if not coin_data:
                 return self.get_default_analysis()
 
@@ -127,4 +145,84 @@ class MarketDataHandler:
         elif volume_change < -50:
             signals.append(f"Significant volume decrease: {volume_change:.1f}% in 24h")
 
-        return signals
\ No newline at end of file
+        return signals
+
+class MarketDataAdapter:
+    """Raw /coins/{id} market payloads for DecisionEngine, served through MarketDataHandler's cache"""
+
+    def __init__(self, handler: Optional[MarketDataHandler] = None, profile: str = 'market'):
+        self.handler = handler or MarketDataHandler()
+        self.profile = profile
+
+    def get_market_data(self, coin_id: str) -> Optional[Dict]:
+        return self.handler.get_coin_data(coin_id, self.profile)
+
+    def get_market_data_many(self, coin_ids: List[str], priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Market payloads for many coins from /coins/markets, one request per page of ids"""
+        return self.handler.get_coin_data_many(list(dict.fromkeys(coin_ids)), 'markets', priority)
+
+class MarketAnalyzer:
+    """Technical indicators computed from historical OHLCV data"""
+
+    def __init__(self, days: int = 30, freq: str = "1h", store: Optional[PriceHistoryStore] = price_store):
+        self.days = days
+        self.freq = freq
+        self.store = store
+        # Stored history is used only if its newest bar is this recent and most bars are present
+        self.max_staleness_bars = 2
+        self.min_bar_coverage = 0.9
+        self.cache_duration = 300  # seconds
+        self.cache = ResponseCache(max_entries=256, ttl=self.cache_duration, stale_ttl=self.cache_duration)
+
+    def get_market_chart(self, coin_id: str, priority: int = INTERACTIVE) -> Optional[Dict]:
+        """Raw (cached) market_chart payload covering the analyzer's window"""
+        key = self.cache.make_key("/market_chart", coin_id, {"days": self.days})
+        return self.cache.get_or_fetch(key, lambda: fetch_market_chart(coin_id, self.days, priority))
+
+    def _covers_window(self, history: pd.DataFrame, start_ms: int) -> bool:
+        """Stored history starts at the window, is recent and has (almost) every bar"""
+        if not len(history):
+            return False
+        bar = pd.Timedelta(self.freq)
+        start = pd.Timestamp(start_ms, unit='ms', tz='UTC')
+        if history.index[0] > start + bar or history.index[-1] < pd.Timestamp.now(tz='UTC') - self.max_staleness_bars * bar:
+            return False
+        expected_bars = pd.Timedelta(days=self.days) / bar
+        bars = history['price'].resample(self.freq).count()
+        return (bars > 0).sum() >= self.min_bar_coverage * expected_bars
+
+    def get_ohlcv(self, coin_id: str) -> Optional[pd.DataFrame]:
+        """History from the local store when it covers the window, else from CoinGecko"""
+        start_ms = int((time.time() - self.days * 86400) * 1000)
+        if self.store is not None:
+            history = self.store.read_frame(coin_id, start_ms)
+            if self._covers_window(history, start_ms):
+                return price_frame_to_ohlcv(history, self.freq)
+
+        payload = self.get_market_chart(coin_id)
+        if not payload:
+            return None
+        frame = market_chart_to_frame(payload)
+        if self.store is not None and len(frame):
+            try:
+                # Merge rather than append: the backfill lies behind any live ticks already stored
+                # Epoch ms regardless of the index resolution (pandas 2+ may keep ms rather than ns)
+                timestamps_ms = ((frame.index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)).to_numpy()
+                self.store.merge(
+                    coin_id, timestamps_ms, frame['price'].to_numpy(),
+                    frame['volume'].to_numpy(), frame['market_cap'].to_numpy()
+                )
+                history = self.store.read_frame(coin_id, start_ms)
+                if len(history):
+                    return price_frame_to_ohlcv(history, self.freq)
+            except Exception as e:
+                print(f"Error writing price history: {str(e)}")
+        return price_frame_to_ohlcv(frame, self.freq)
+
+    def get_technical_indicators(self, coin_id: str) -> Dict:
+        """Latest SMA/EMA/RSI/MACD/Bollinger/ATR values for a coin"""
+        try:
+            return latest_indicators(self.get_ohlcv(coin_id))
+        except Exception as e:
+            print(f"Error computing technical indicators: {str(e)}")
+            return {}
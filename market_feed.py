@@ -0,0 +1,139 @@
+"""Shared live market feed for browsers.
+
+``MarketFeed`` subscribes to a SnapshotStore and turns each published
+snapshot into a delta against the last state it broadcast for that coin.
+Every delta is JSON-encoded once into a bounded in-memory log; each client
+only keeps a cursor into that log, so one upstream update reaches any number
+of connected clients without per-client copies. Clients that fall further
+behind than the log retains are resynchronised with a full snapshot.
+"""
+import json
+import threading
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from market_poller import MarketSnapshot, SnapshotStore, thaw
+
+# Views rendered by the web UI's market panels
+FEED_VIEWS = ['price_data', 'market_metrics', 'social_metrics', 'trading_signals', 'risk_analysis']
+
+def diff_views(previous: Optional[Dict], current: Dict) -> Dict:
+    """Changed views between two states; dict views are diffed key by key, others replaced"""
+    previous = previous or {}
+    changes = {}
+    for view, value in current.items():
+        old = previous.get(view)
+        if value == old:
+            continue
+        if isinstance(value, dict) and isinstance(old, dict):
+            changed = {key: item for key, item in value.items() if old.get(key) != item}
+            # Keys that disappeared are sent as null so clients drop them
+            changed.update({key: None for key in old if key not in value})
+            changes[view] = changed
+        else:
+            changes[view] = value
+    return changes
+
+class MarketFeed:
+    def __init__(self, store: SnapshotStore, views: Optional[List[str]] = None,
+                 history: int = 256, heartbeat: float = 15):
+        self.views = views or FEED_VIEWS
+        self.heartbeat = heartbeat
+
+        self._state: Dict[str, Dict] = {}
+        self._log: "deque[Tuple[int, str, str]]" = deque(maxlen=history)  # (seq, coin_id, encoded delta)
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self.clients = 0
+        self.deltas = 0
+        self.resyncs = 0
+
+        for snapshot in store.all().values():
+            self._state[snapshot.coin_id] = self._project(snapshot)
+        self._unsubscribe = store.subscribe(self._on_snapshot)
+
+    def _project(self, snapshot: MarketSnapshot) -> Dict:
+        return {view: thaw(snapshot.analysis[view]) for view in self.views if view in snapshot.analysis}
+
+    def _on_snapshot(self, snapshot: MarketSnapshot) -> None:
+        current = self._project(snapshot)
+        with self._cond:
+            changes = diff_views(self._state.get(snapshot.coin_id), current)
+            if not changes:
+                return
+            self._state[snapshot.coin_id] = current
+            self._seq += 1
+            encoded = json.dumps({
+                'coin': snapshot.coin_id,
+                'version': snapshot.version,
+                'fetched_at': snapshot.fetched_at,
+                'changes': changes
+            })
+            self._log.append((self._seq, snapshot.coin_id, encoded))
+            self.deltas += 1
+            self._cond.notify_all()
+
+    def _encode_state(self, coins: Optional[Set[str]]) -> str:
+        # Caller must hold self._cond
+        return json.dumps({
+            coin_id: views for coin_id, views in self._state.items()
+            if coins is None or coin_id in coins
+        })
+
+    def listen(self, coins: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (event, data) pairs for one client: a 'snapshot', then 'delta's.
+
+        ``('heartbeat', None)`` is yielded when nothing changed for
+        ``heartbeat`` seconds, so callers can keep idle connections alive.
+        """
+        coins = set(coins) if coins else None
+        with self._cond:
+            self.clients += 1
+            cursor = self._seq
+            state = self._encode_state(coins)
+        try:
+            yield 'snapshot', state
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq > cursor or self._closed, timeout=self.heartbeat)
+                    if self._closed:
+                        return
+                    if self._seq == cursor:
+                        pending = None
+                    elif self._log[0][0] > cursor + 1:
+                        # Too far behind: the deltas it missed are gone, send the whole state
+                        self.resyncs += 1
+                        pending = [('snapshot', self._encode_state(coins))]
+                    else:
+                        pending = [
+                            ('delta', encoded) for seq, coin_id, encoded in self._log
+                            if seq > cursor and (coins is None or coin_id in coins)
+                        ]
+                    cursor = self._seq
+
+                if pending is None:
+                    yield 'heartbeat', None
+                for event, data in pending or []:
+                    yield event, data
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def close(self) -> None:
+        """Detach from the store and end every client stream"""
+        self._unsubscribe()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_metrics(self) -> Dict:
+        with self._cond:
+            return {
+                'clients': self.clients,
+                'coins': len(self._state),
+                'deltas': self.deltas,
+                'resyncs': self.resyncs,
+                'sequence': self._seq
+            }
@@ -1,54 +1,244 @@
 import aiohttp
 import asyncio
-from typing import Dict, Optional, List
+import copy
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, List
 import json
 from datetime import datetime, timedelta
+from response_cache import ResponseCache
+import risk_engine
+from streaming_indicators import CoinIndicatorState, payload_timestamp
+from price_store import price_store
+from fetch_profiles import FETCH_PROFILES, BULK_FETCH_PROFILES, BULK_PAGE_SIZE, select_profile, select_bulk_profile
+from upstream import INTERACTIVE, upstream_scheduler
+from orderbook import DEFAULT_EXCHANGE_SYMBOLS
+
+# Views returned by get_market_analysis, in order
+DEFAULT_ANALYSIS_VIEWS = ['price_data', 'market_metrics', 'social_metrics', 'trading_signals', 'risk_analysis']
+
+# Views returned by get_market_analysis_many; all are served by /coins/markets
+BULK_ANALYSIS_VIEWS = ['price_data', 'market_metrics', 'trading_signals', 'risk_analysis']
+
+class AnalysisStage:
+    """A named view derived from the raw CoinGecko coin payload"""
+
+    def __init__(self, name: str, derive: Callable[[Dict], object], default: object = None,
+                 requires: Iterable[str] = ('market',),
+                 derive_batch: Optional[Callable[[List[Dict]], List[object]]] = None):
+        self.name = name
+        self.derive = derive
+        self.default = default
+        self.requires = frozenset(requires)
+        self.derive_batch = derive_batch
+
+    def derive_many(self, coin_datas: List[Dict]) -> List[object]:
+        """Derive the view for many payloads at once (columnar when the stage supports it)"""
+        if self.derive_batch is not None:
+            return self.derive_batch(coin_datas)
+        return [self.derive(coin_data) for coin_data in coin_datas]
+
+    def empty(self) -> object:
+        # Fresh copy so callers can mutate the result safely
+        return copy.deepcopy(self.default)
 
 class MarketDataHandler:
     def __init__(self):
         self.coingecko_api = "https://api.coingecko.com/api/v3"
-        self.cache = {}
         self.cache_duration = 60  # seconds
+        self.cache = ResponseCache(max_entries=512, ttl=self.cache_duration, stale_ttl=self.cache_duration * 4)
+
+        # Connection pool settings for the shared session
+        self.connection_limit = 100
+        self.connection_limit_per_host = 20
+        self.request_timeout = 10  # seconds
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Streaming indicator state per coin, updated on every fetched price point
+        self.indicator_states: Dict[str, CoinIndicatorState] = {}
+        self.price_store = price_store
+        self.min_volatility_samples = 2
+        # Realised volatility over a few minutes of ticks is far below a 24h figure; wait until most of the window is seen
+        self.min_volatility_coverage = 0.9
+        self._indicator_lock = threading.Lock()
+
+        # Exchange order-book/trade feed (see orderbook.py), attached with attach_microstructure
+        self.microstructure = None
+        self.exchange_symbols: Dict[str, str] = dict(DEFAULT_EXCHANGE_SYMBOLS)
 
-    async def get_coin_data(self, coin_id: str) -> Optional[Dict]:
-        """Fetch comprehensive coin data from CoinGecko"""
+        # Derivation stages; each turns the single fetched payload into one view
+        self.stages: Dict[str, AnalysisStage] = {}
+        self.register_stage('spot_price', self._derive_spot_price, {}, requires=['spot'])
+        self.register_stage('price_data', self._derive_price_data, {}, requires=['market'])
+        self.register_stage('market_metrics', self._derive_market_metrics, {}, requires=['market'])
+        self.register_stage('social_metrics', self._derive_social_metrics, {}, requires=['community'])
+        self.register_stage('trading_signals', self._derive_trading_signals, [], requires=['spot'],
+                            derive_batch=self._derive_trading_signals_batch)
+        self.register_stage('risk_analysis', self._derive_risk_analysis, {}, requires=['spot'],
+                            derive_batch=self._derive_risk_analysis_batch)
+        self.register_stage('social_impact', self._derive_social_impact, {}, requires=['community'])
+        self.register_stage('streaming_indicators', self._derive_streaming_indicators, {}, requires=['spot'])
+        self.register_stage('microstructure', self._derive_microstructure, {}, requires=[])
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating it on the running loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Close the pooled session; call from the loop that owns it"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def _fetch_json(self, url: str, params: Dict, priority: int = INTERACTIVE) -> Optional[Dict]:
+        """GET through the shared upstream scheduler (rate limit, retries, circuit breaker)"""
         try:
-            url = f"{self.coingecko_api}/coins/{coin_id}"
-            params = {
-                "localization": "false",
-                "tickers": "true",
-                "market_data": "true",
-                "community_data": "true",
-                "developer_data": "true",
-                "sparkline": "true"
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        return await response.json()
+            session = await self._get_session()
+            return await upstream_scheduler.get_json_async(
+                session, url, params, priority=priority, timeout=self.request_timeout
+            )
         except Exception as e:
             print(f"Error fetching coin data: {str(e)}")
         return None
 
+    async def get_coin_data(self, coin_id: str, profile: str = 'full', priority: int = INTERACTIVE) -> Optional[Dict]:
+        """Fetch coin data from CoinGecko using the named fetch profile"""
+        fetch_profile = FETCH_PROFILES[profile]
+        url = fetch_profile.url(self.coingecko_api, coin_id)
+        params = fetch_profile.params_for(coin_id)
+
+        async def fetch():
+            return fetch_profile.normalize(coin_id, await self._fetch_json(url, params, priority))
+
+        key = self.cache.make_key(fetch_profile.path, coin_id, params)
+        return await self.cache.get_or_fetch_async(key, fetch)
+
+    async def analyze(self, coin_id: str, views: Optional[List[str]] = None, priority: int = INTERACTIVE) -> Dict:
+        """Run the requested derivation stages over a single payload fetch"""
+        views = views or DEFAULT_ANALYSIS_VIEWS
+        stages = [self.stages[view] for view in views]
+        data = {'timestamp': datetime.now().isoformat()}
+
+        # Fetch only the payload sections the requested stages declare
+        profile = select_profile(section for stage in stages for section in stage.requires)
+        coin_data = await self.get_coin_data(coin_id, profile.name, priority) if profile else {'id': coin_id}
+        if coin_data:
+            self.update_indicators(coin_id, coin_data)
+        for stage in stages:
+            if coin_data is None:
+                data[stage.name] = stage.empty()
+                continue
+            try:
+                data[stage.name] = stage.derive(coin_data)
+            except Exception as e:
+                print(f"Error in {stage.name} stage: {str(e)}")
+                data[stage.name] = stage.empty()
+        return data
+
+    def register_stage(self, name: str, derive: Callable[[Dict], object], default: object = None,
+                       requires: Iterable[str] = ('market',),
+                       derive_batch: Optional[Callable[[List[Dict]], List[object]]] = None):
+        """Add or replace a derivation stage computed from the raw coin payload.
+
+        ``requires`` lists the payload sections (see fetch_profiles) the stage reads;
+        ``derive_batch`` optionally computes the view for a list of payloads in one pass.
+        """
+        self.stages[name] = AnalysisStage(name, derive, default, requires, derive_batch)
+
+    async def get_coin_data_many(self, coin_ids: List[str], profile: str = 'markets',
+                                 priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Fetch many coins through a batched endpoint, BULK_PAGE_SIZE ids per request"""
+        bulk_profile = BULK_FETCH_PROFILES[profile]
+        url = bulk_profile.url(self.coingecko_api)
+
+        async def fetch_page(page_ids: List[str]) -> Dict[str, Dict]:
+            params = bulk_profile.params_for(page_ids)
+
+            async def fetch():
+                return bulk_profile.normalize(await self._fetch_json(url, params, priority))
+
+            key = self.cache.make_key(bulk_profile.path, "", params)
+            return await self.cache.get_or_fetch_async(key, fetch) or {}
+
+        pages = [coin_ids[i:i + BULK_PAGE_SIZE] for i in range(0, len(coin_ids), BULK_PAGE_SIZE)]
+        coin_datas: Dict[str, Dict] = {}
+        for page in await asyncio.gather(*(fetch_page(page_ids) for page_ids in pages)):
+            coin_datas.update(page)
+        return coin_datas
+
+    async def get_market_analysis_many(self, coin_ids: List[str], views: Optional[List[str]] = None,
+                                       priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Analyse many coins using CoinGecko's batched endpoints.
+
+        Views whose sections the batched endpoints cannot provide (e.g. social
+        data) fall back to concurrent per-coin analysis.
+        """
+        views = views or BULK_ANALYSIS_VIEWS
+        coin_ids = list(dict.fromkeys(coin_ids))
+        stages = [self.stages[view] for view in views]
+
+        bulk_profile = select_bulk_profile(section for stage in stages for section in stage.requires)
+        if bulk_profile is None:
+            analyses = await asyncio.gather(*(self.analyze(coin_id, views, priority) for coin_id in coin_ids))
+            return dict(zip(coin_ids, analyses))
+
+        timestamp = datetime.now().isoformat()
+        coin_datas = await self.get_coin_data_many(coin_ids, bulk_profile.name, priority)
+        found = [coin_id for coin_id in coin_ids if coin_id in coin_datas]
+        payloads = [coin_datas[coin_id] for coin_id in found]
+        for coin_id, coin_data in zip(found, payloads):
+            self.update_indicators(coin_id, coin_data)
+
+        results = {coin_id: {'timestamp': timestamp} for coin_id in coin_ids}
+        for stage in stages:
+            try:
+                values = stage.derive_many(payloads)
+            except Exception as e:
+                print(f"Error in {stage.name} stage: {str(e)}")
+                values = [stage.empty() for _ in payloads]
+            for coin_id, value in zip(found, values):
+                results[coin_id][stage.name] = value
+            for coin_id in coin_ids:
+                if stage.name not in results[coin_id]:
+                    results[coin_id][stage.name] = stage.empty()
+        return results
+
     async def get_market_analysis(self, coin_id: str) -> Dict:
         """Get comprehensive market analysis"""
-        data = {
-            'timestamp': datetime.now().isoformat(),
-            'price_data': {},
-            'market_metrics': {},
-            'social_metrics': {},
-            'trading_signals': [],
-            'risk_analysis': {}
+        return await self.analyze(coin_id, DEFAULT_ANALYSIS_VIEWS)
+
+    async def get_social_impact(self, coin_id: str) -> Dict:
+        """Analyze social media impact"""
+        analysis = await self.analyze(coin_id, ['social_impact'])
+        return analysis['social_impact']
+
+    def _derive_spot_price(self, coin_data: Dict) -> Dict:
+        market_data = coin_data.get('market_data', {})
+        return {
+            'current_price': market_data.get('current_price', {}).get('usd'),
+            'price_change_24h': market_data.get('price_change_percentage_24h'),
+            'market_cap': market_data.get('market_cap', {}).get('usd'),
+            'total_volume': market_data.get('total_volume', {}).get('usd')
         }
-        
-        coin_data = await self.get_coin_data(coin_id)
-        if not coin_data:
-            return data
 
-        # Price Data
+    def _derive_price_data(self, coin_data: Dict) -> Dict:
         market_data = coin_data.get('market_data', {})
-        data['price_data'] = {
+        return {
             'current_price': market_data.get('current_price', {}).get('usd'),
             'price_change_24h': market_data.get('price_change_percentage_24h'),
             'price_change_7d': market_data.get('price_change_percentage_7d'),
@@ -57,8 +247,9 @@ class MarketDataHandler:
             'ath_change_percentage': market_data.get('ath_change_percentage', {}).get('usd')
         }
 
-        # Market Metrics
-        data['market_metrics'] = {
+    def _derive_market_metrics(self, coin_data: Dict) -> Dict:
+        market_data = coin_data.get('market_data', {})
+        return {
             'market_cap': market_data.get('market_cap', {}).get('usd'),
             'market_cap_rank': coin_data.get('market_cap_rank'),
             'total_volume': market_data.get('total_volume', {}).get('usd'),
@@ -66,35 +257,146 @@ class MarketDataHandler:
             'total_supply': market_data.get('total_supply')
         }
 
-        # Social Metrics
+    def _derive_social_metrics(self, coin_data: Dict) -> Dict:
         community_data = coin_data.get('community_data', {})
-        data['social_metrics'] = {
+        return {
             'twitter_followers': community_data.get('twitter_followers'),
             'reddit_subscribers': community_data.get('reddit_subscribers'),
             'reddit_active_accounts': community_data.get('reddit_active_accounts'),
             'telegram_channel_user_count': community_data.get('telegram_channel_user_count')
         }
 
-        # Trading Signals
+    def _derive_trading_signals(self, coin_data: Dict) -> List[str]:
+        market_data = coin_data.get('market_data') or {}
+        signals = []
         volume_change = market_data.get('volume_change_24h', 0)
         price_change = market_data.get('price_change_percentage_24h', 0)
         
         if volume_change and price_change:
             if volume_change > 20 and price_change > 0:
-                data['trading_signals'].append("High volume with price increase - potential bullish signal")
+                signals.append("High volume with price increase - potential bullish signal")
             elif volume_change > 20 and price_change < 0:
-                data['trading_signals'].append("High volume with price decrease - potential bearish signal")
+                signals.append("High volume with price decrease - potential bearish signal")
+        return signals
 
-        # Risk Analysis
-        volume_to_mcap = data['market_metrics']['total_volume'] / data['market_metrics']['market_cap'] if data['market_metrics']['market_cap'] else 0
+    def _derive_risk_analysis(self, coin_data: Dict) -> Dict:
+        market_data = coin_data.get('market_data') or {}
+        price_change = market_data.get('price_change_percentage_24h') or 0
+        total_volume = (market_data.get('total_volume') or {}).get('usd') or 0
+        market_cap = (market_data.get('market_cap') or {}).get('usd')
+        volume_to_mcap = total_volume / market_cap if market_cap else 0
         
-        data['risk_analysis'] = {
-            'volatility_24h': abs(price_change) if price_change else 0,
+        return {
+            'volatility_24h': self._volatility_24h(coin_data.get('id'), abs(price_change) if price_change else 0),
             'volume_to_mcap_ratio': volume_to_mcap,
             'risk_level': self._calculate_risk_level(price_change, volume_to_mcap, market_data)
         }
 
-        return data
+    def _derive_trading_signals_batch(self, coin_datas: List[Dict]) -> List[List[str]]:
+        columns = risk_engine.columns_from_coin_datas(coin_datas)
+        flags = risk_engine.signal_flags(columns['price_change'], columns['volume_change'])
+        signals = [[] for _ in coin_datas]
+        for index in flags['bullish_volume'].nonzero()[0]:
+            signals[index].append("High volume with price increase - potential bullish signal")
+        for index in flags['bearish_volume'].nonzero()[0]:
+            signals[index].append("High volume with price decrease - potential bearish signal")
+        return signals
+
+    def _derive_risk_analysis_batch(self, coin_datas: List[Dict]) -> List[Dict]:
+        # Score every coin in one vectorised pass; matches _derive_risk_analysis per coin
+        result = risk_engine.analyze_coin_datas(coin_datas)
+        return [
+            {
+                'volatility_24h': self._volatility_24h(coin_data.get('id'), float(volatility)),
+                'volume_to_mcap_ratio': float(ratio),
+                'risk_level': risk_level
+            }
+            for coin_data, volatility, ratio, risk_level in zip(
+                coin_datas, result['volatility_24h'], result['volume_to_mcap_ratio'], result['risk_level']
+            )
+        ]
+
+    def _volatility_24h(self, coin_id: Optional[str], fallback: float) -> float:
+        """Rolling 24h realised volatility once the ticks span most of the window, else |24h change|"""
+        state = self.indicator_states.get(coin_id)
+        if state is None or state.volatility_samples < self.min_volatility_samples:
+            return fallback
+        volatility = state.indicators['volatility']
+        return volatility.value if volatility.covers(time.time(), self.min_volatility_coverage) else fallback
+
+    def _derive_streaming_indicators(self, coin_data: Dict) -> Dict:
+        state = self.indicator_states.get(coin_data.get('id'))
+        return state.values() if state is not None else {}
+
+    def attach_microstructure(self, feed, symbols: Optional[Dict[str, str]] = None):
+        """Serve the microstructure stage from an ExchangeFeed/ReplayFeed; ``symbols`` maps coin ids to exchange symbols"""
+        self.microstructure = feed
+        if symbols:
+            self.exchange_symbols.update(symbols)
+
+    def _derive_microstructure(self, coin_data: Dict) -> Dict:
+        symbol = self.exchange_symbols.get(coin_data.get('id'))
+        if self.microstructure is None or symbol is None:
+            return {}
+        return self.microstructure.get_microstructure(symbol)
+
+    def update_indicators(self, coin_id: str, coin_data: Dict) -> bool:
+        """Feed the latest price point of a payload into the coin's streaming indicators"""
+        market_data = coin_data.get('market_data') or {}
+        price = (market_data.get('current_price') or {}).get('usd')
+        if price is None:
+            return False
+        volume = (market_data.get('total_volume') or {}).get('usd')
+        market_cap = (market_data.get('market_cap') or {}).get('usd')
+        timestamp = payload_timestamp(market_data)
+        with self._indicator_lock:
+            state = self.indicator_states.get(coin_id)
+            if state is None:
+                state = self.indicator_states[coin_id] = self._load_indicator_state(coin_id, coin_data)
+            updated = state.update(timestamp, price, volume)
+
+        if updated and self.price_store is not None:
+            try:
+                self.price_store.append(coin_id, [int(timestamp * 1000)], [price], [volume], [market_cap])
+            except Exception as e:
+                print(f"Error writing price history: {str(e)}")
+        return updated
+
+    def _load_indicator_state(self, coin_id: str, coin_data: Dict) -> CoinIndicatorState:
+        """Build a coin's indicator state, warm-started from stored history"""
+        state = CoinIndicatorState()
+        if self.price_store is None:
+            return state
+        try:
+            self._backfill_sparkline(coin_id, coin_data)
+            window = state.indicators['volatility'].window_seconds
+            history = self.price_store.read(coin_id, start_ms=int((time.time() - window) * 1000))
+            for timestamp, price, volume in zip(history['timestamp'], history['price'], history['volume']):
+                state.update(timestamp / 1000, float(price), None if volume != volume else float(volume))
+        except Exception as e:
+            print(f"Error loading price history: {str(e)}")
+        return state
+
+    def _backfill_sparkline(self, coin_id: str, coin_data: Dict):
+        """Persist the hourly 7d sparkline (full profile) when the store has no history yet"""
+        market_data = coin_data.get('market_data') or {}
+        prices = (market_data.get('sparkline_7d') or {}).get('price')
+        if not prices or self.price_store.last_timestamp(coin_id) is not None:
+            return
+        # Sparkline points are hourly and end at the payload's last update
+        end_ms = int(payload_timestamp(market_data) * 1000)
+        timestamps = [end_ms - (len(prices) - 1 - index) * 3600 * 1000 for index in range(len(prices))]
+        # The final point duplicates the live price written by update_indicators
+        self.price_store.append(coin_id, timestamps[:-1], prices[:-1])
+
+    def snapshot_indicators(self) -> Dict[str, Dict]:
+        with self._indicator_lock:
+            return {coin_id: state.snapshot() for coin_id, state in self.indicator_states.items()}
+
+    def restore_indicators(self, snapshots: Dict[str, Dict]):
+        with self._indicator_lock:
+            for coin_id, snapshot in snapshots.items():
+                self.indicator_states[coin_id] = CoinIndicatorState.restore(snapshot)
 
     def _calculate_risk_level(self, price_change: float, volume_to_mcap: float, market_data: Dict) -> str:
         risk_score = 0
@@ -114,7 +416,7 @@ class MarketDataHandler:
             risk_score += 1
 
         # Market cap risk
-        market_cap = market_data.get('market_cap', {}).get('usd', 0)
+        market_cap = (market_data.get('market_cap') or {}).get('usd') or 0
         if market_cap < 100000000:  # Less than 100M
             risk_score += 3
         elif market_cap < 1000000000:  # Less than 1B
@@ -129,22 +431,17 @@ class MarketDataHandler:
         else:
             return "Low"
 
-    async def get_social_impact(self, coin_id: str) -> Dict:
-        """Analyze social media impact"""
-        data = await self.get_coin_data(coin_id)
-        if not data:
-            return {}
-
-        community_data = data.get('community_data', {})
-        public_interest_stats = data.get('public_interest_stats', {})
+    def _derive_social_impact(self, coin_data: Dict) -> Dict:
+        community_data = coin_data.get('community_data', {})
+        public_interest_stats = coin_data.get('public_interest_stats', {})
 
         return {
-            'social_score': data.get('coingecko_score'),
-            'community_score': data.get('community_score'),
+            'social_score': coin_data.get('coingecko_score'),
+            'community_score': coin_data.get('community_score'),
             'social_metrics': {
                 'twitter_followers': community_data.get('twitter_followers'),
                 'reddit_subscribers': community_data.get('reddit_subscribers'),
                 'telegram_users': community_data.get('telegram_channel_user_count')
             },
             'public_interest': public_interest_stats.get('alexa_rank')
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,312 @@
+import asyncio
+import math
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from async_runtime import BackgroundEventLoop
+from fetch_profiles import BULK_PAGE_SIZE, select_bulk_profile
+from upstream import BACKGROUND
+
+def freeze(value):
+    """Recursively turn dicts/lists into read-only mappings/tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Plain, JSON-serialisable copy of a frozen value"""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+class MarketSnapshot(NamedTuple):
+    coin_id: str
+    analysis: MappingProxyType
+    fetched_at: float
+    version: int
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def to_dict(self) -> Dict:
+        return thaw(self.analysis)
+
+class SnapshotStore:
+    """Latest immutable analysis per coin.
+
+    Writers replace the whole mapping (copy-on-write), so readers take a
+    single attribute read with no locking.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, MarketSnapshot] = {}
+        self._write_lock = threading.Lock()
+        self._subscribers: List[Callable[[MarketSnapshot], None]] = []
+        self._version = 0
+
+    def publish(self, coin_id: str, analysis: Dict) -> MarketSnapshot:
+        with self._write_lock:
+            self._version += 1
+            snapshot = MarketSnapshot(coin_id, freeze(analysis), time.time(), self._version)
+            snapshots = dict(self._snapshots)
+            snapshots[coin_id] = snapshot
+            self._snapshots = snapshots
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Error notifying snapshot subscriber: {str(e)}")
+        return snapshot
+
+    def latest(self, coin_id: str, max_age: Optional[float] = None) -> Optional[MarketSnapshot]:
+        snapshot = self._snapshots.get(coin_id)
+        if snapshot is None or (max_age is not None and snapshot.age > max_age):
+            return None
+        return snapshot
+
+    def discard(self, coin_id: str) -> None:
+        with self._write_lock:
+            if coin_id in self._snapshots:
+                snapshots = dict(self._snapshots)
+                del snapshots[coin_id]
+                self._snapshots = snapshots
+
+    def all(self) -> Dict[str, MarketSnapshot]:
+        return self._snapshots
+
+    def subscribe(self, callback: Callable[[MarketSnapshot], None]) -> Callable[[], None]:
+        """Call ``callback`` with every published snapshot; returns an unsubscribe function"""
+        with self._write_lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._write_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+class MarketPoller:
+    """Refreshes a watchlist in the background and publishes snapshots.
+
+    ``rate_budget`` caps upstream requests per minute: watchlists served by
+    the batched endpoints cost one request per 250 coins, otherwise one per
+    coin, and the cycle is stretched so the budget is never exceeded.
+
+    ``slow_views`` (e.g. social data, which only per-coin requests serve)
+    are refreshed every ``slow_interval`` seconds with whatever budget a
+    cycle leaves over, and published with each snapshot.
+
+    Coins added with ``watch`` (on top of the configured watchlist) are
+    capped at ``max_watched``, least recently requested first out, and
+    dropped once nobody has asked for them for ``idle_ttl`` seconds.
+    """
+
+    def __init__(self, handler, store: SnapshotStore, event_loop: BackgroundEventLoop,
+                 watchlist: Iterable[str] = ('bitcoin',), views: Optional[List[str]] = None,
+                 interval: float = 60, rate_budget: float = 30,
+                 max_watched: Optional[int] = 50, idle_ttl: Optional[float] = 900,
+                 slow_views: Optional[List[str]] = None, slow_interval: float = 900):
+        self.handler = handler
+        self.store = store
+        self.event_loop = event_loop
+        self.watchlist: List[str] = list(dict.fromkeys(watchlist))
+        self.views = views
+        self.interval = interval
+        self.rate_budget = rate_budget
+        self.max_watched = max_watched
+        self.idle_ttl = idle_ttl
+        self.slow_views = slow_views or []
+        self.slow_interval = slow_interval
+        # coin id -> (fetched at, slow views) from the latest successful per-coin pass
+        self._slow: Dict[str, Tuple[float, Dict]] = {}
+
+        # Configured coins are always polled; watched ones carry a last-requested time
+        self._pinned = set(self.watchlist)
+        self._last_seen: Dict[str, float] = {}
+        self._watch_lock = threading.Lock()
+        self.expired = 0
+
+        self._future = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._start_lock = threading.Lock()
+        self.cycles = 0
+        self.last_cycle_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def start(self) -> None:
+        """Start polling on the background loop (idempotent)"""
+        if self.running:
+            return
+        with self._start_lock:
+            if not self.running:
+                self._future = self.event_loop.submit(self._run())
+
+    def stop(self) -> None:
+        if self._stopping is not None:
+            self.event_loop.loop.call_soon_threadsafe(self._stopping.set)
+
+    async def shutdown(self) -> None:
+        """Stop polling and wait for the current cycle to finish (run on the poller's loop)"""
+        if self._stopping is not None:
+            self._stopping.set()
+        if self._task is not None:
+            await self._task
+
+    def watch(self, coin_id: str) -> None:
+        """Poll a coin (or mark it as recently requested if already watched)"""
+        if coin_id in self._pinned:
+            return
+        with self._watch_lock:
+            self._last_seen[coin_id] = time.time()
+            if coin_id in self.watchlist:
+                return
+            evicted = []
+            if self.max_watched is not None:
+                watched = sorted(self._last_seen, key=self._last_seen.get)
+                evicted = watched[:max(len(watched) - self.max_watched, 0)]
+            # Replace rather than mutate so a running cycle keeps a consistent list
+            self.watchlist = [watched for watched in self.watchlist if watched not in evicted] + [coin_id]
+            for evicted_id in evicted:
+                self._forget(evicted_id)
+
+    def unwatch(self, coin_id: str) -> None:
+        with self._watch_lock:
+            self._pinned.discard(coin_id)
+            self.watchlist = [watched for watched in self.watchlist if watched != coin_id]
+            self._forget(coin_id)
+
+    def _forget(self, coin_id: str) -> None:
+        # Caller must hold self._watch_lock
+        self._last_seen.pop(coin_id, None)
+        self._slow.pop(coin_id, None)
+        self.store.discard(coin_id)
+        self.expired += 1
+
+    def expire_idle(self) -> None:
+        """Stop polling watched coins nobody has requested for idle_ttl seconds"""
+        if self.idle_ttl is None:
+            return
+        cutoff = time.time() - self.idle_ttl
+        with self._watch_lock:
+            idle = {coin_id for coin_id, seen in self._last_seen.items() if seen < cutoff}
+            if not idle:
+                return
+            self.watchlist = [watched for watched in self.watchlist if watched not in idle]
+            for coin_id in idle:
+                self._forget(coin_id)
+
+    def _uses_bulk(self) -> bool:
+        views = self.views or []
+        stages = [self.handler.stages[view] for view in views]
+        return bool(views) and select_bulk_profile(
+            section for stage in stages for section in stage.requires
+        ) is not None
+
+    def requests_per_cycle(self, watchlist: Optional[List[str]] = None) -> int:
+        count = len(watchlist if watchlist is not None else self.watchlist)
+        return math.ceil(count / BULK_PAGE_SIZE) if self._uses_bulk() else count
+
+    async def refresh_once(self) -> None:
+        self.expire_idle()
+        watchlist = self.watchlist
+        if not watchlist:
+            return
+        if self._uses_bulk():
+            analyses = await self.handler.get_market_analysis_many(watchlist, self.views, priority=BACKGROUND)
+            for coin_id, analysis in analyses.items():
+                self._publish(coin_id, analysis)
+        else:
+            # Per-coin refresh, spaced so the request rate stays within budget
+            spacing = 60.0 / self.rate_budget
+            for index, coin_id in enumerate(watchlist):
+                if index:
+                    await asyncio.sleep(spacing)
+                analysis = await self.handler.analyze(coin_id, self.views, priority=BACKGROUND)
+                self._publish(coin_id, analysis)
+        await self.refresh_slow_views(watchlist)
+
+    async def refresh_slow_views(self, watchlist: List[str]) -> int:
+        """Per-coin fetch of slow views that are due, within the budget this cycle leaves; returns coins refreshed"""
+        if not self.slow_views:
+            return 0
+        now = time.time()
+        due = [coin_id for coin_id in watchlist
+               if now - self._slow.get(coin_id, (0.0, None))[0] >= self.slow_interval]
+        # Oldest first, so a watchlist larger than one cycle's budget is covered round-robin
+        due.sort(key=lambda coin_id: self._slow.get(coin_id, (0.0, None))[0])
+        spare = int(self.interval * self.rate_budget / 60) - self.requests_per_cycle(watchlist)
+        spacing = 60.0 / self.rate_budget
+        refreshed = 0
+        for coin_id in due[:max(spare, 1)]:
+            await asyncio.sleep(spacing)
+            views = await self.handler.analyze(coin_id, self.slow_views, priority=BACKGROUND)
+            views = {view: views[view] for view in self.slow_views}
+            # Skip coins dropped from the watchlist while this pass ran
+            if any(views.values()) and coin_id in self.watchlist:
+                self._slow[coin_id] = (time.time(), views)
+                refreshed += 1
+        return refreshed
+
+    def _publish(self, coin_id: str, analysis: Dict) -> None:
+        # A failed fetch yields only empty views; keep the previous snapshot instead
+        if not any(value for key, value in analysis.items() if key != 'timestamp'):
+            return
+        if self.slow_views:
+            slow = self._slow.get(coin_id)
+            previous = self.store.latest(coin_id)
+            for view in self.slow_views:
+                if slow is not None:
+                    analysis[view] = slow[1][view]
+                elif previous is not None and view in previous.analysis:
+                    # Not fetched by this poller yet (e.g. published by a request); keep what is there
+                    analysis[view] = thaw(previous.analysis[view])
+        self.store.publish(coin_id, analysis)
+
+    async def _run(self) -> None:
+        self._task = asyncio.current_task()
+        self._stopping = asyncio.Event()
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                await self.refresh_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error refreshing market snapshots: {str(e)}")
+            self.cycles += 1
+            self.last_cycle_seconds = time.monotonic() - started
+
+            budget_period = self.requests_per_cycle() * 60.0 / self.rate_budget
+            delay = max(self.interval, budget_period) - self.last_cycle_seconds
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def get_metrics(self) -> Dict:
+        return {
+            'running': self.running,
+            'watchlist_size': len(self.watchlist),
+            'max_watched': self.max_watched,
+            'expired': self.expired,
+            'cycles': self.cycles,
+            'last_cycle_seconds': self.last_cycle_seconds,
+            'requests_per_cycle': self.requests_per_cycle(),
+            'slow_views_cached': len(self._slow),
+            'snapshots': len(self.store.all()),
+            'last_error': self.last_error
+        }
@@ -0,0 +1,249 @@
+import os
+import threading
+from contextlib import nullcontext
+from typing import Dict, Tuple, Optional, List
+
+DEFAULT_MODEL_NAME = "facebook/opt-350m"  # Using a smaller model for faster responses
+
+# fp32: weights as published; int8: Linear layers dynamically quantized for CPU inference
+INFERENCE_MODES = ('fp32', 'int8')
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else None
+
+def inference_context():
+    """torch.inference_mode when torch is importable (no autograd bookkeeping), else a no-op"""
+    try:
+        import torch
+    except ImportError:
+        return nullcontext()
+    return torch.inference_mode()
+
+class ModelRegistry:
+    """Process-wide, lazily-initialised store of tokenizer/model pairs.
+
+    Every caller that asks for the same model name and inference mode gets
+    the same loaded weights, so a model is read from disk once per process
+    instead of once per chat message.
+    """
+
+    def __init__(self, inference_mode: str = 'fp32', num_threads: Optional[int] = None,
+                 interop_threads: Optional[int] = None, compile_model: bool = False):
+        if inference_mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode {inference_mode!r}; expected one of {INFERENCE_MODES}")
+        self.inference_mode = inference_mode
+        self.num_threads = num_threads
+        self.interop_threads = interop_threads
+        self.compile_model = compile_model
+        self._models: Dict[Tuple[str, str], Tuple[object, object]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._torch_configured = False
+
+    def _key(self, model_name: str, mode: Optional[str]) -> Tuple[str, str]:
+        mode = mode or self.inference_mode
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode {mode!r}; expected one of {INFERENCE_MODES}")
+        return model_name, mode
+
+    def _get_load_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            if key not in self._load_locks:
+                self._load_locks[key] = threading.Lock()
+            return self._load_locks[key]
+
+    def _configure_torch(self):
+        """Apply thread settings once, before the first model runs"""
+        if self._torch_configured:
+            return
+        import torch
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                # Only allowed before any inter-op parallel work has started
+                print(f"Error setting inter-op threads: {str(e)}")
+        self._torch_configured = True
+
+    def _load(self, model_name: str, mode: str) -> Tuple[object, object]:
+        # Imported here so pattern-only callers never pay for importing torch
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self._configure_torch()
+        # Decoder-only models generate after the last prompt token, so batches are left padded
+        tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left")
+        model = AutoModelForCausalLM.from_pretrained(model_name)
+        model.eval()
+        if mode == 'int8':
+            # Weights stored as int8, activations quantized on the fly per batch
+            quantize_dynamic = getattr(torch.ao.quantization, 'quantize_dynamic', None) or torch.quantization.quantize_dynamic
+            model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.compile_model:
+            original_forward = model.forward
+            try:
+                model.forward = torch.compile(model.forward, dynamic=True)
+                # torch.compile is lazy; run one pass so compile errors surface here, not in a request
+                with torch.inference_mode():
+                    model(**tokenizer("warm up", return_tensors="pt"))
+            except Exception as e:
+                model.forward = original_forward
+                print(f"Error compiling model {model_name}: {str(e)}")
+        return tokenizer, model
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME, mode: Optional[str] = None) -> Tuple[object, object]:
+        """Return (tokenizer, model), loading them on first use"""
+        key = self._key(model_name, mode)
+        loaded = self._models.get(key)
+        if loaded is not None:
+            return loaded
+
+        # Per-model lock so concurrent first requests trigger a single load
+        with self._get_load_lock(key):
+            loaded = self._models.get(key)
+            if loaded is None:
+                loaded = self._load(*key)
+                with self._lock:
+                    self._models[key] = loaded
+            return loaded
+
+    def warm_up(self, model_names: Optional[List[str]] = None) -> None:
+        """Eagerly load models at startup so the first request is not slow"""
+        for model_name in model_names or [DEFAULT_MODEL_NAME]:
+            try:
+                self.get(model_name)
+            except Exception as e:
+                print(f"Error warming up model {model_name}: {str(e)}")
+
+    def is_loaded(self, model_name: str = DEFAULT_MODEL_NAME, mode: Optional[str] = None) -> bool:
+        return self._key(model_name, mode) in self._models
+
+    def unload(self, model_name: str = DEFAULT_MODEL_NAME, mode: Optional[str] = None) -> bool:
+        """Evict a model so its memory can be reclaimed; returns True if it was loaded"""
+        key = self._key(model_name, mode)
+        with self._get_load_lock(key):
+            with self._lock:
+                loaded = self._models.pop(key, None)
+        if loaded is None:
+            return False
+        del loaded
+        import gc
+        gc.collect()
+        return True
+
+    def unload_all(self) -> None:
+        for model_name, mode in list(self._models):
+            self.unload(model_name, mode)
+
+# Shared registry used by the Flask and Streamlit front ends
+model_registry = ModelRegistry(
+    inference_mode=os.getenv("ADVISOR_INFERENCE_MODE", "fp32"),
+    num_threads=_env_int("ADVISOR_NUM_THREADS"),
+    interop_threads=_env_int("ADVISOR_INTEROP_THREADS"),
+    compile_model=os.getenv("ADVISOR_TORCH_COMPILE", "0").lower() in ("1", "true", "yes")
+)
+
+if __name__ == "__main__":
+    import argparse
+    import difflib
+    import json
+    import resource
+    import subprocess
+    import sys
+    import time
+
+    PROMPTS = [
+        "User: What is the price of bitcoin today?\nAdvisor:",
+        "User: Is it safe to buy dogecoin right now?\nAdvisor:",
+        "User: Why is ethereum going down?\nAdvisor:",
+        "User: What do people say about solana?\nAdvisor:",
+    ]
+
+    parser = argparse.ArgumentParser(description="Benchmark advisor inference modes, one subprocess per configuration")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--modes", default=",".join(INFERENCE_MODES))
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--compile", action="store_true", help="also benchmark each mode with torch.compile")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    def current_rss_mb() -> float:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+    if args.worker:
+        # Child process: one configuration, results as JSON on the last stdout line
+        mode, compiled = args.worker.split(":")
+        registry = ModelRegistry(mode, args.threads, args.interop_threads, compiled == "1")
+        started = time.perf_counter()
+        tokenizer, model = registry.get(args.model)
+        load_seconds = time.perf_counter() - started
+
+        latencies, new_tokens, outputs = [], 0, []
+        for run in range(args.runs + 1):
+            for prompt in PROMPTS:
+                inputs = tokenizer(prompt, return_tensors="pt")
+                started = time.perf_counter()
+                with inference_context():
+                    output = model.generate(
+                        **inputs, max_new_tokens=args.max_new_tokens, do_sample=False,
+                        pad_token_id=tokenizer.eos_token_id
+                    )
+                elapsed = time.perf_counter() - started
+                generated = output[0][inputs["input_ids"].shape[1]:]
+                # The first pass warms caches (and compiles); only later runs are timed
+                if run:
+                    latencies.append(elapsed)
+                    new_tokens += len(generated)
+                else:
+                    outputs.append(tokenizer.decode(generated, skip_special_tokens=True))
+
+        latencies.sort()
+        print(json.dumps({
+            'config': args.worker,
+            'load_seconds': load_seconds,
+            'tokens_per_second': new_tokens / sum(latencies),
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p95_ms': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000,
+            'rss_mb': current_rss_mb(),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'outputs': outputs
+        }))
+        sys.exit(0)
+
+    configs = [f"{mode}:0" for mode in args.modes.split(",")]
+    if args.compile:
+        configs += [f"{mode}:1" for mode in args.modes.split(",")]
+
+    results = []
+    for config in configs:
+        command = [sys.executable, os.path.abspath(__file__), "--worker", config, "--model", args.model,
+                   "--runs", str(args.runs), "--max-new-tokens", str(args.max_new_tokens)]
+        if args.threads:
+            command += ["--threads", str(args.threads)]
+        if args.interop_threads:
+            command += ["--interop-threads", str(args.interop_threads)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"Error benchmarking {config}: {completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    # Answer quality: similarity of greedy outputs to the fp32 baseline
+    baseline = next((result['outputs'] for result in results if result['config'] == 'fp32:0'), None)
+    print(f"{'config':<10} {'load s':>7} {'tok/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'RSS MB':>8} {'peak MB':>8} {'vs fp32':>8}")
+    for result in results:
+        similarity = (
+            sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(baseline, result['outputs'])) / len(baseline)
+            if baseline else float('nan')
+        )
+        print(f"{result['config']:<10} {result['load_seconds']:>7.1f} {result['tokens_per_second']:>8.1f} "
+              f"{result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} {result['rss_mb']:>8.0f} "
+              f"{result['peak_rss_mb']:>8.0f} {similarity:>8.2f}")
@@ -0,0 +1,345 @@
+"""Exchange order-book and trade-tape ingestion.
+
+Keeps a local L2 order book and a trade tape per symbol, fed by ccxt REST
+polling (a full book snapshot first, then diffs against the local book as
+incremental updates) or by replaying a recorded JSONL event file, so the
+same code paths can be exercised offline.
+
+Recorded events, one JSON object per line (timestamps in epoch ms)::
+
+    {"type": "snapshot", "symbol": "BTC/USDT", "timestamp": ..., "bids": [[price, amount], ...], "asks": [...]}
+    {"type": "update", "symbol": "BTC/USDT", "timestamp": ..., "bids": [[price, 0.0], ...], "asks": [...]}
+    {"type": "trades", "symbol": "BTC/USDT", "trades": [[timestamp, price, amount, side, id], ...]}
+
+An amount of 0 in an update removes the level.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from streaming_indicators import RollingVWAP, RollingVolatility
+
+# CoinGecko id -> exchange symbol used for the microstructure stage
+DEFAULT_EXCHANGE_SYMBOLS = {
+    'bitcoin': 'BTC/USDT',
+    'ethereum': 'ETH/USDT',
+    'solana': 'SOL/USDT',
+    'binancecoin': 'BNB/USDT',
+    'ripple': 'XRP/USDT',
+    'cardano': 'ADA/USDT',
+    'dogecoin': 'DOGE/USDT'
+}
+
+Levels = List[List[float]]
+
+class OrderBook:
+    """L2 book with price levels kept sorted via bisect, best level first"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self._bid_keys: List[float] = []  # negated prices, so the best bid sorts first
+        self._ask_keys: List[float] = []
+        self.timestamp: Optional[int] = None
+        self.updates = 0
+
+    @staticmethod
+    def _set_level(levels: Dict[float, float], keys: List[float], key: float, price: float, amount: float):
+        if amount <= 0:
+            if levels.pop(price, None) is not None:
+                del keys[bisect_left(keys, key)]
+        else:
+            if price not in levels:
+                insort(keys, key)
+            levels[price] = amount
+
+    def apply_snapshot(self, bids: Levels, asks: Levels, timestamp: Optional[int] = None):
+        self.bids = {float(price): float(amount) for price, amount in bids if amount > 0}
+        self.asks = {float(price): float(amount) for price, amount in asks if amount > 0}
+        self._bid_keys = sorted(-price for price in self.bids)
+        self._ask_keys = sorted(self.asks)
+        self.timestamp = timestamp
+        self.updates += 1
+
+    def apply_update(self, bids: Levels, asks: Levels, timestamp: Optional[int] = None):
+        for price, amount in bids:
+            self._set_level(self.bids, self._bid_keys, -float(price), float(price), float(amount))
+        for price, amount in asks:
+            self._set_level(self.asks, self._ask_keys, float(price), float(price), float(amount))
+        self.timestamp = timestamp
+        self.updates += 1
+
+    def top(self, side: str, count: int = 10) -> Levels:
+        if side == 'bids':
+            return [[-key, self.bids[-key]] for key in self._bid_keys[:count]]
+        return [[key, self.asks[key]] for key in self._ask_keys[:count]]
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return -self._bid_keys[0] if self._bid_keys else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self._ask_keys[0] if self._ask_keys else None
+
+    @property
+    def mid(self) -> Optional[float]:
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return (self.best_bid + self.best_ask) / 2
+
+    @property
+    def spread(self) -> Optional[float]:
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return self.best_ask - self.best_bid
+
+    def depth(self, within_pct: float = 1.0) -> Tuple[float, float]:
+        """Quote notional (bid, ask) resting within ``within_pct`` % of the mid"""
+        mid = self.mid
+        if mid is None:
+            return 0.0, 0.0
+        bid_floor = mid * (1 - within_pct / 100)
+        ask_ceiling = mid * (1 + within_pct / 100)
+        bid_depth = 0.0
+        for key in self._bid_keys:
+            if -key < bid_floor:
+                break
+            bid_depth += -key * self.bids[-key]
+        ask_depth = 0.0
+        for key in self._ask_keys:
+            if key > ask_ceiling:
+                break
+            ask_depth += key * self.asks[key]
+        return bid_depth, ask_depth
+
+def diff_levels(current: Dict[float, float], levels: Levels) -> Levels:
+    """Level changes turning ``current`` into ``levels``; removed levels get amount 0"""
+    target = {float(price): float(amount) for price, amount in levels if amount > 0}
+    changes = [[price, amount] for price, amount in target.items() if current.get(price) != amount]
+    changes.extend([price, 0.0] for price in current if price not in target)
+    return changes
+
+class TradeTape:
+    """Recent trades with rolling VWAP and realised volatility over ``window_seconds``"""
+
+    def __init__(self, window_seconds: float = 300, max_trades: int = 1000):
+        self.window_seconds = window_seconds
+        self.trades = deque(maxlen=max_trades)  # (timestamp_ms, price, amount, side, id)
+        self.volatility = RollingVolatility(window_seconds)
+        self.vwap = RollingVWAP(window_seconds)
+        self.last_timestamp: Optional[int] = None
+        self._ids_at_last: set = set()
+
+    def add(self, trades: Iterable) -> int:
+        """Append trades in time order, skipping ones already seen; returns how many were new"""
+        added = 0
+        for timestamp, price, amount, side, trade_id in sorted(trades, key=lambda trade: trade[0]):
+            if self.last_timestamp is not None:
+                # Polls overlap: drop older trades and duplicates at the boundary millisecond
+                if timestamp < self.last_timestamp or (timestamp == self.last_timestamp and trade_id in self._ids_at_last):
+                    continue
+            if timestamp != self.last_timestamp:
+                self._ids_at_last = set()
+            self.last_timestamp = timestamp
+            self._ids_at_last.add(trade_id)
+
+            self.trades.append((timestamp, price, amount, side, trade_id))
+            self.volatility.update(timestamp / 1000, price)
+            self.vwap.update(timestamp / 1000, price, amount)
+            added += 1
+        return added
+
+    @property
+    def last_price(self) -> Optional[float]:
+        return self.trades[-1][1] if self.trades else None
+
+class MarketMicrostructure:
+    """Order books and trade tapes for a set of symbols, updated by applying feed events"""
+
+    def __init__(self, symbols: Iterable[str], trade_window: float = 300, depth_pct: float = 1.0,
+                 record_path: Optional[str] = None):
+        self.symbols = list(dict.fromkeys(symbols))
+        self.trade_window = trade_window
+        self.depth_pct = depth_pct
+        self.books: Dict[str, OrderBook] = {symbol: OrderBook(symbol) for symbol in self.symbols}
+        self.tapes: Dict[str, TradeTape] = {symbol: TradeTape(trade_window) for symbol in self.symbols}
+        self._lock = threading.Lock()
+        self._record_file = open(record_path, 'a') if record_path else None
+        self.events = 0
+
+    def apply_event(self, event: Dict):
+        symbol = event['symbol']
+        with self._lock:
+            if symbol not in self.books:
+                self.books[symbol] = OrderBook(symbol)
+                self.tapes[symbol] = TradeTape(self.trade_window)
+            if event['type'] == 'snapshot':
+                self.books[symbol].apply_snapshot(event['bids'], event['asks'], event.get('timestamp'))
+            elif event['type'] == 'update':
+                self.books[symbol].apply_update(event['bids'], event['asks'], event.get('timestamp'))
+            elif event['type'] == 'trades':
+                self.tapes[symbol].add(tuple(trade) for trade in event['trades'])
+            self.events += 1
+            if self._record_file is not None:
+                self._record_file.write(json.dumps(event) + "\n")
+
+    def get_microstructure(self, symbol: str) -> Dict:
+        """Spread, depth and realised volatility for one symbol"""
+        with self._lock:
+            book = self.books.get(symbol)
+            tape = self.tapes.get(symbol)
+            if book is None or not book.updates:
+                return {}
+            bid_depth, ask_depth = book.depth(self.depth_pct)
+            mid = book.mid
+            total_depth = bid_depth + ask_depth
+            updated_ms = max(book.timestamp or 0, tape.last_timestamp or 0)
+            return {
+                'symbol': symbol,
+                'best_bid': book.best_bid,
+                'best_ask': book.best_ask,
+                'mid_price': mid,
+                'spread': book.spread,
+                'spread_bps': book.spread / mid * 10000 if mid else None,
+                'bid_depth': bid_depth,
+                'ask_depth': ask_depth,
+                'depth_pct': self.depth_pct,
+                'depth_imbalance': (bid_depth - ask_depth) / total_depth if total_depth else None,
+                'last_trade_price': tape.last_price,
+                'vwap': tape.vwap.value,
+                'realized_volatility': tape.volatility.value,
+                'volatility_window_seconds': tape.window_seconds,
+                'trades_in_window': len(tape.vwap.points),
+                'updated_at': updated_ms / 1000 if updated_ms else None
+            }
+
+    def close(self):
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
+
+class ExchangeFeed(MarketMicrostructure):
+    """Polls an exchange through ccxt and turns the REST snapshots into book/trade events"""
+
+    def __init__(self, exchange_id: str, symbols: Iterable[str], poll_interval: float = 1.0,
+                 book_limit: int = 50, **kwargs):
+        super().__init__(symbols, **kwargs)
+        self.exchange_id = exchange_id
+        self.poll_interval = poll_interval
+        self.book_limit = book_limit
+        self._exchange = None
+        self._needs_snapshot = set(self.symbols)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+    def _get_exchange(self):
+        if self._exchange is None:
+            import ccxt
+
+            self._exchange = getattr(ccxt, self.exchange_id)({'enableRateLimit': True})
+        return self._exchange
+
+    def poll_symbol(self, symbol: str):
+        exchange = self._get_exchange()
+        order_book = exchange.fetch_order_book(symbol, limit=self.book_limit)
+        timestamp = order_book.get('timestamp') or int(time.time() * 1000)
+        if symbol in self._needs_snapshot:
+            self.apply_event({'type': 'snapshot', 'symbol': symbol, 'timestamp': timestamp,
+                              'bids': order_book['bids'], 'asks': order_book['asks']})
+            self._needs_snapshot.discard(symbol)
+        else:
+            # Only the changed levels are applied (and recorded)
+            with self._lock:
+                book = self.books[symbol]
+                bids = diff_levels(book.bids, order_book['bids'])
+                asks = diff_levels(book.asks, order_book['asks'])
+            if bids or asks:
+                self.apply_event({'type': 'update', 'symbol': symbol, 'timestamp': timestamp,
+                                  'bids': bids, 'asks': asks})
+
+        trades = exchange.fetch_trades(symbol, since=self.tapes[symbol].last_timestamp)
+        if trades:
+            self.apply_event({'type': 'trades', 'symbol': symbol, 'trades': [
+                [trade['timestamp'], trade['price'], trade['amount'], trade.get('side'), trade.get('id')]
+                for trade in trades
+            ]})
+
+    def _run(self):
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            for symbol in self.symbols:
+                try:
+                    self.poll_symbol(symbol)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    # The local book may have missed changes; start over from a snapshot
+                    self._needs_snapshot.add(symbol)
+                    print(f"Error polling {symbol} on {self.exchange_id}: {str(e)}")
+            self._stopping.wait(max(self.poll_interval - (time.monotonic() - started), 0))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=f"exchange-feed-{self.exchange_id}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.close()
+
+class ReplayFeed(MarketMicrostructure):
+    """Rebuilds books and tapes from a recorded JSONL event file"""
+
+    def __init__(self, path: str, symbols: Iterable[str] = (), **kwargs):
+        super().__init__(symbols, **kwargs)
+        self.path = path
+
+    def read_events(self) -> Iterator[Dict]:
+        with open(self.path) as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+    def replay(self, speed: Optional[float] = None) -> int:
+        """Apply every recorded event; ``speed`` > 0 replays in (scaled) real time"""
+        previous = None
+        for event in self.read_events():
+            timestamp = event.get('timestamp')
+            if speed and previous is not None and timestamp is not None and timestamp > previous:
+                time.sleep((timestamp - previous) / 1000 / speed)
+            if timestamp is not None:
+                previous = timestamp
+            self.apply_event(event)
+        return self.events
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python orderbook.py <recording.jsonl> | --record <exchange> <symbol> <seconds> <recording.jsonl>")
+        sys.exit(1)
+
+    if sys.argv[1] == '--record':
+        exchange_id, symbol, seconds, path = sys.argv[2:6]
+        feed = ExchangeFeed(exchange_id, [symbol], record_path=path)
+        feed.start()
+        time.sleep(float(seconds))
+        feed.stop()
+        print(f"Recorded {feed.events} events to {path}")
+    else:
+        feed = ReplayFeed(sys.argv[1])
+        started = time.perf_counter()
+        count = feed.replay()
+        elapsed = time.perf_counter() - started
+        print(f"Replayed {count} events in {elapsed:.3f}s ({count / elapsed if elapsed else 0:,.0f} events/s)")
+        for symbol in feed.books:
+            print(json.dumps(feed.get_microstructure(symbol), indent=2))
@@ -0,0 +1,176 @@
+"""Append-only, per-coin columnar price history on local disk.
+
+Each coin gets a directory holding one raw little-endian file per column
+(``timestamp.i8`` in epoch milliseconds, ``price.f8``, ``volume.f8``,
+``market_cap.f8``). Reads memory-map the files, so slicing a time range is a
+binary search plus zero-copy views over the mapped arrays.
+"""
+import os
+import re
+import shutil
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = {
+    'timestamp': np.dtype('<i8'),
+    'price': np.dtype('<f8'),
+    'volume': np.dtype('<f8'),
+    'market_cap': np.dtype('<f8')
+}
+
+# Value columns are written before timestamps, so the timestamp file length
+# marks how many rows are complete even if a write is interrupted
+WRITE_ORDER = ['price', 'volume', 'market_cap', 'timestamp']
+
+class PriceHistoryStore:
+    def __init__(self, root_dir: str = "data/prices"):
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+        self._coin_locks: Dict[str, threading.Lock] = {}
+
+    def _coin_dir(self, coin_id: str) -> str:
+        if not re.fullmatch(r'[A-Za-z0-9._-]+', coin_id):
+            raise ValueError(f"Invalid coin id for price store: {coin_id!r}")
+        return os.path.join(self.root_dir, coin_id)
+
+    def _column_path(self, coin_id: str, column: str) -> str:
+        suffix = 'i8' if COLUMNS[column].kind == 'i' else 'f8'
+        return os.path.join(self._coin_dir(coin_id), f"{column}.{suffix}")
+
+    def _get_coin_lock(self, coin_id: str) -> threading.Lock:
+        with self._lock:
+            if coin_id not in self._coin_locks:
+                self._coin_locks[coin_id] = threading.Lock()
+            return self._coin_locks[coin_id]
+
+    def _row_count(self, coin_id: str) -> int:
+        counts = []
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(coin_id, column)
+            counts.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(counts)
+
+    def _map_column(self, coin_id: str, column: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.empty(0, dtype=COLUMNS[column])
+        return np.memmap(self._column_path(coin_id, column), dtype=COLUMNS[column], mode='r', shape=(rows,))
+
+    def coins(self) -> List[str]:
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root_dir)
+            if os.path.isdir(os.path.join(self.root_dir, name))
+        )
+
+    def last_timestamp(self, coin_id: str) -> Optional[int]:
+        """Epoch milliseconds of the newest stored row"""
+        rows = self._row_count(coin_id)
+        if rows == 0:
+            return None
+        return int(self._map_column(coin_id, 'timestamp', rows)[-1])
+
+    def append(self, coin_id: str, timestamps, prices, volumes=None, market_caps=None) -> int:
+        """Append rows (timestamps in epoch ms); rows not newer than the last stored one are dropped"""
+        timestamps = np.asarray(timestamps, dtype=COLUMNS['timestamp'])
+        columns = {
+            'timestamp': timestamps,
+            'price': np.asarray(prices, dtype=COLUMNS['price']),
+            'volume': np.asarray(volumes if volumes is not None else np.full(len(timestamps), np.nan), dtype=COLUMNS['volume']),
+            'market_cap': np.asarray(market_caps if market_caps is not None else np.full(len(timestamps), np.nan), dtype=COLUMNS['market_cap'])
+        }
+
+        with self._get_coin_lock(coin_id):
+            os.makedirs(self._coin_dir(coin_id), exist_ok=True)
+            rows = self._row_count(coin_id)
+            self._truncate(coin_id, rows)
+
+            # Keep the store sorted: only strictly increasing, newer timestamps
+            order = np.argsort(timestamps, kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+            keep = np.ones(len(order), dtype=bool)
+            keep[1:] = np.diff(columns['timestamp']) > 0
+            if rows:
+                keep &= columns['timestamp'] > self._map_column(coin_id, 'timestamp', rows)[-1]
+            if not keep.any():
+                return 0
+
+            for column in WRITE_ORDER:
+                with open(self._column_path(coin_id, column), 'ab') as handle:
+                    handle.write(columns[column][keep].tobytes())
+            return int(keep.sum())
+
+    def merge(self, coin_id: str, timestamps, prices, volumes=None, market_caps=None) -> int:
+        """Insert rows at any position (e.g. a history backfill behind live ticks); returns rows added.
+
+        Stored rows win on equal timestamps. The coin's files are rewritten in
+        a sibling directory and swapped in, so readers never see a partial merge.
+        """
+        timestamps = np.asarray(timestamps, dtype=COLUMNS['timestamp'])
+        incoming = {
+            'timestamp': timestamps,
+            'price': np.asarray(prices, dtype=COLUMNS['price']),
+            'volume': np.asarray(volumes if volumes is not None else np.full(len(timestamps), np.nan), dtype=COLUMNS['volume']),
+            'market_cap': np.asarray(market_caps if market_caps is not None else np.full(len(timestamps), np.nan), dtype=COLUMNS['market_cap'])
+        }
+
+        with self._get_coin_lock(coin_id):
+            coin_dir = self._coin_dir(coin_id)
+            rows = self._row_count(coin_id) if os.path.isdir(coin_dir) else 0
+            stored = {column: np.array(self._map_column(coin_id, column, rows)) for column in COLUMNS}
+            new_rows = ~np.isin(incoming['timestamp'], stored['timestamp'])
+            if not new_rows.any():
+                return 0
+
+            # Stored rows first so np.unique keeps them on duplicate timestamps
+            combined = {column: np.concatenate([stored[column], incoming[column]]) for column in COLUMNS}
+            _, first = np.unique(combined['timestamp'], return_index=True)
+            merged = {column: values[first] for column, values in combined.items()}
+
+            staging = f"{coin_dir}.merge-{os.getpid()}-{threading.get_ident()}"
+            os.makedirs(staging, exist_ok=True)
+            for column in WRITE_ORDER:
+                suffix = 'i8' if COLUMNS[column].kind == 'i' else 'f8'
+                with open(os.path.join(staging, f"{column}.{suffix}"), 'wb') as handle:
+                    handle.write(merged[column].tobytes())
+            retired = f"{staging}.old"
+            if os.path.isdir(coin_dir):
+                os.rename(coin_dir, retired)
+            os.rename(staging, coin_dir)
+            shutil.rmtree(retired, ignore_errors=True)
+            return len(merged['timestamp']) - rows
+
+    def _truncate(self, coin_id: str, rows: int):
+        # Drop the tail of any column left longer than the others by an interrupted write
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(coin_id, column)
+            if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                with open(path, 'r+b') as handle:
+                    handle.truncate(rows * dtype.itemsize)
+
+    def read(self, coin_id: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Zero-copy views of every column for rows with start_ms <= timestamp <= end_ms"""
+        try:
+            rows = self._row_count(coin_id)
+        except ValueError:
+            rows = 0
+        mapped = {column: self._map_column(coin_id, column, rows) for column in COLUMNS}
+        timestamps = mapped['timestamp']
+        lo = int(np.searchsorted(timestamps, start_ms, side='left')) if start_ms is not None else 0
+        hi = int(np.searchsorted(timestamps, end_ms, side='right')) if end_ms is not None else rows
+        return {column: values[lo:hi] for column, values in mapped.items()}
+
+    def read_frame(self, coin_id: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> pd.DataFrame:
+        """Rows in a time range as a DataFrame indexed by UTC datetime"""
+        columns = self.read(coin_id, start_ms, end_ms)
+        frame = pd.DataFrame({
+            column: np.asarray(values) for column, values in columns.items() if column != 'timestamp'
+        })
+        frame.index = pd.to_datetime(np.asarray(columns['timestamp']), unit='ms', utc=True)
+        return frame
+
+# Shared store; the location can be moved with PRICE_STORE_DIR
+price_store = PriceHistoryStore(os.getenv("PRICE_STORE_DIR", "data/prices"))
@@ -0,0 +1,213 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+class FetchCancelled(Exception):
+    """Raised to callers coalesced onto a fetch whose leader was cancelled"""
+
+    def __init__(self, key: Hashable):
+        super().__init__(f"Fetch for {key!r} was cancelled")
+
+class ResponseCache:
+    """Bounded TTL + LRU cache for upstream API payloads.
+
+    Entries are fresh for ``ttl`` seconds and may then be served stale for a
+    further ``stale_ttl`` seconds while a single background refresh runs.
+    Concurrent misses for the same key are coalesced into one upstream fetch
+    (single-flight), both for threads and for coroutines on any event loop.
+    Failed fetches (``None``) are never cached; if an older copy of the entry
+    is still held it is returned instead (stale-if-error).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60, stale_ttl: float = 240, wait_timeout: float = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # Longest a thread waits on another thread's in-flight fetch
+        self.wait_timeout = wait_timeout
+
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._background_tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.served_on_error = 0
+
+    @staticmethod
+    def make_key(endpoint: str, coin_id: str = "", params: Optional[Dict] = None) -> Tuple:
+        return (endpoint, coin_id, tuple(sorted((params or {}).items())))
+
+    def _lookup(self, key: Hashable) -> Tuple[Any, Optional[str]]:
+        # Caller must hold self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = self.clock() - stored_at
+        if age < self.ttl:
+            state = 'fresh'
+        elif age < self.ttl + self.stale_ttl:
+            state = 'stale'
+        else:
+            return None, None
+        self._entries.move_to_end(key)
+        return value, state
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh or stale value without fetching"""
+        with self._lock:
+            return self._lookup(key)[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _begin(self, key: Hashable, count: bool = True) -> Tuple[Any, Optional[str], Optional[Future], bool]:
+        """Look up ``key`` and, on a miss or stale hit, claim or join its in-flight fetch.
+
+        Returns (value, state, future, is_leader).
+        """
+        with self._lock:
+            value, state = self._lookup(key)
+            if state == 'fresh':
+                if count:
+                    self.hits += 1
+                return value, state, None, False
+
+            if count:
+                if state == 'stale':
+                    self.stale_hits += 1
+                else:
+                    self.misses += 1
+
+            future = self._inflight.get(key)
+            if future is not None:
+                if state is None and count:
+                    self.coalesced += 1
+                return value, state, future, False
+
+            future = Future()
+            self._inflight[key] = future
+            return value, state, future, True
+
+    def _finish(self, key: Hashable, future: Future, value: Any = None, error: Optional[BaseException] = None) -> Any:
+        """Store the outcome, resolve waiters and return what they were given"""
+        if error is None and value is not None:
+            self.set(key, value)
+        elif error is None:
+            # Upstream failed (or its circuit is open): serve the last good copy, however old
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    value = entry[0]
+                    self.served_on_error += 1
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+        return value
+
+    def _run_fetch(self, key: Hashable, future: Future, fetch: Callable[[], Any]) -> Any:
+        try:
+            value = fetch()
+        except BaseException as e:
+            # Cancellation included: waiters must never be left on an unresolved future
+            self._finish(key, future, error=e if isinstance(e, Exception) else FetchCancelled(key))
+            raise
+        return self._finish(key, future, value)
+
+    async def _run_fetch_async(self, key: Hashable, future: Future, fetch: Callable[[], Awaitable]) -> Any:
+        try:
+            value = await fetch()
+        except BaseException as e:
+            # Cancellation included: waiters must never be left on an unresolved future
+            self._finish(key, future, error=e if isinstance(e, Exception) else FetchCancelled(key))
+            raise
+        return self._finish(key, future, value)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Synchronous read-through lookup"""
+        value, state, future, is_leader = self._begin(key)
+        if state == 'fresh':
+            return value
+
+        if state == 'stale':
+            if is_leader:
+                # Revalidate in the background and answer immediately with the stale copy
+                threading.Thread(
+                    target=self._refresh, args=(key, future, fetch), daemon=True
+                ).start()
+            return value
+
+        if is_leader:
+            return self._run_fetch(key, future, fetch)
+        return future.result(timeout=self.wait_timeout)
+
+    async def get_or_fetch_async(self, key: Hashable, fetch: Callable[[], Awaitable]) -> Any:
+        """Asynchronous read-through lookup; ``fetch`` is a zero-argument coroutine factory"""
+        value, state, future, is_leader = self._begin(key)
+        if state == 'fresh':
+            return value
+
+        if state == 'stale':
+            if is_leader:
+                task = asyncio.ensure_future(self._refresh_async(key, future, fetch))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            return value
+
+        if is_leader:
+            return await self._run_fetch_async(key, future, fetch)
+        # wrap_future lets waiters on any event loop join a fetch led from another
+        return await asyncio.wrap_future(future)
+
+    def _refresh(self, key: Hashable, future: Future, fetch: Callable[[], Any]) -> None:
+        try:
+            self._run_fetch(key, future, fetch)
+        except Exception as e:
+            print(f"Error refreshing cache entry {key}: {str(e)}")
+
+    async def _refresh_async(self, key: Hashable, future: Future, fetch: Callable[[], Awaitable]) -> None:
+        try:
+            await self._run_fetch_async(key, future, fetch)
+        except Exception as e:
+            print(f"Error refreshing cache entry {key}: {str(e)}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'served_on_error': self.served_on_error,
+                'in_flight': len(self._inflight),
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0
+            }
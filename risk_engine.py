@@ -0,0 +1,154 @@
+"""Columnar risk and signal engine.
+
+Vectorised equivalents of the per-coin rules in ``market_handler`` and
+``market_data``: each function takes NumPy arrays (one element per coin) and
+returns arrays, matching the scalar implementations value for value.
+Missing inputs (None/NaN) are treated as 0, like ``value or 0`` in the
+scalar paths.
+"""
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+RISK_LEVELS = np.array(["Low", "Medium", "High", "Very High"], dtype=object)
+
+def _column(values) -> np.ndarray:
+    """Convert a sequence (possibly containing None) to a float64 array with NaN -> 0"""
+    array = np.asarray(values, dtype=float)
+    return np.nan_to_num(array, nan=0.0)
+
+def columns_from_coin_datas(coin_datas: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """Extract the engine's input columns from /coins/{id}-shaped payloads"""
+    price_change, total_volume, market_cap, volume_change = [], [], [], []
+    for coin_data in coin_datas:
+        market_data = coin_data.get('market_data') or {}
+        price_change.append(market_data.get('price_change_percentage_24h'))
+        total_volume.append((market_data.get('total_volume') or {}).get('usd'))
+        market_cap.append((market_data.get('market_cap') or {}).get('usd'))
+        volume_change.append(market_data.get('volume_change_24h'))
+    return {
+        'price_change': _column(price_change),
+        'total_volume': _column(total_volume),
+        'market_cap': _column(market_cap),
+        'volume_change': _column(volume_change)
+    }
+
+def volume_to_mcap_ratio(total_volume: np.ndarray, market_cap: np.ndarray) -> np.ndarray:
+    # Coins without a market cap get a ratio of 0 rather than inf/NaN
+    ratio = np.zeros_like(market_cap)
+    np.divide(total_volume, market_cap, out=ratio, where=market_cap != 0)
+    return ratio
+
+def risk_scores(price_change: np.ndarray, volume_to_mcap: np.ndarray, market_cap: np.ndarray) -> np.ndarray:
+    """Vectorised MarketDataHandler._calculate_risk_level score"""
+    abs_change = np.abs(price_change)
+    # Price volatility risk
+    score = np.select([abs_change > 20, abs_change > 10, abs_change > 5], [3, 2, 1], default=0)
+    # Volume to market cap risk
+    score += np.select([volume_to_mcap > 0.3, volume_to_mcap > 0.1], [3, 1], default=0)
+    # Market cap risk
+    score += np.select([market_cap < 100000000, market_cap < 1000000000], [3, 2], default=0)
+    return score
+
+def risk_levels(scores: np.ndarray) -> np.ndarray:
+    """Map risk scores to the 'Low' .. 'Very High' labels"""
+    index = np.select([scores >= 7, scores >= 5, scores >= 3], [3, 2, 1], default=0)
+    return RISK_LEVELS[index]
+
+def volatility_risk_levels(volatility: np.ndarray) -> np.ndarray:
+    """Vectorised market_data.MarketDataHandler.calculate_risk_metrics level"""
+    return np.select([volatility > 20, volatility < 5], ["High", "Low"], default="Medium").astype(object)
+
+def signal_flags(price_change: np.ndarray, volume_change: np.ndarray) -> Dict[str, np.ndarray]:
+    """Boolean signal columns for both handlers' trading-signal rules"""
+    both_present = (volume_change != 0) & (price_change != 0)
+    high_volume = both_present & (volume_change > 20)
+    return {
+        'bullish_volume': high_volume & (price_change > 0),
+        'bearish_volume': high_volume & (price_change < 0),
+        'high_volatility': np.abs(price_change) > 10,
+        'volume_surge': volume_change > 50,
+        'volume_drop': volume_change < -50
+    }
+
+def analyze_columns(price_change, total_volume, market_cap, volume_change=None) -> Dict[str, np.ndarray]:
+    """Score a struct-of-arrays batch of coins"""
+    price_change = _column(price_change)
+    total_volume = _column(total_volume)
+    market_cap = _column(market_cap)
+    volume_change = _column(volume_change) if volume_change is not None else np.zeros_like(price_change)
+
+    ratio = volume_to_mcap_ratio(total_volume, market_cap)
+    scores = risk_scores(price_change, ratio, market_cap)
+    volatility = np.abs(price_change)
+    result = {
+        'volatility_24h': volatility,
+        'volume_to_mcap_ratio': ratio,
+        'risk_score': scores,
+        'risk_level': risk_levels(scores),
+        'volatility_risk_level': volatility_risk_levels(volatility)
+    }
+    result.update(signal_flags(price_change, volume_change))
+    return result
+
+def analyze_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Score a DataFrame with price_change, total_volume, market_cap (and optional volume_change) columns"""
+    result = analyze_columns(
+        frame['price_change'].to_numpy(),
+        frame['total_volume'].to_numpy(),
+        frame['market_cap'].to_numpy(),
+        frame['volume_change'].to_numpy() if 'volume_change' in frame else None
+    )
+    return frame.assign(**result)
+
+def analyze_coin_datas(coin_datas: List[Dict]) -> Dict[str, np.ndarray]:
+    """Score a list of /coins/{id}-shaped payloads in one vectorised pass"""
+    return analyze_columns(**columns_from_coin_datas(coin_datas))
+
+def _random_coin_datas(count: int, seed: int = 7) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    price_change = rng.normal(0, 12, count)
+    market_cap = 10 ** rng.uniform(6, 12, count)
+    total_volume = market_cap * rng.uniform(0, 0.6, count)
+    volume_change = rng.normal(0, 40, count)
+    return [
+        {
+            'market_data': {
+                'price_change_percentage_24h': float(price_change[i]),
+                'total_volume': {'usd': float(total_volume[i])},
+                'market_cap': {'usd': float(market_cap[i])},
+                'volume_change_24h': float(volume_change[i])
+            }
+        }
+        for i in range(count)
+    ]
+
+if __name__ == "__main__":
+    # Benchmark: per-dict scalar path vs. the columnar engine (parity is covered in tests/test_risk_engine.py)
+    from market_handler import MarketDataHandler
+
+    handler = MarketDataHandler()
+    for count in (1000, 10000, 100000):
+        coin_datas = _random_coin_datas(count)
+
+        started = time.perf_counter()
+        scalar = [handler._derive_risk_analysis(coin_data) for coin_data in coin_datas]
+        scalar_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        vectorized = analyze_coin_datas(coin_datas)
+        vector_seconds = time.perf_counter() - started
+
+        # Engine only (inputs already columnar)
+        columns = columns_from_coin_datas(coin_datas)
+        started = time.perf_counter()
+        analyze_columns(**columns)
+        engine_seconds = time.perf_counter() - started
+
+        print(
+            f"{count:>7} coins | scalar {count / scalar_seconds:>12,.0f} coins/s"
+            f" | engine+extract {count / vector_seconds:>12,.0f} coins/s"
+            f" | engine only {count / engine_seconds:>14,.0f} coins/s"
+        )
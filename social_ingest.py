@@ -0,0 +1,328 @@
+"""Streaming ingestion of social post archives.
+
+Posts are read from JSONL files (a stand-in for live feeds), one object per
+line::
+
+    {"id": "...", "author": "elonmusk", "platform": "twitter",
+     "timestamp": 1717000000, "text": "...", "likes": 120, "reposts": 15}
+
+``timestamp`` may be epoch seconds, epoch milliseconds or an ISO-8601 string.
+Batches are parsed, scored for per-coin relevance with token/hash lookups and
+added to a PostWindow, which indexes posts by author and by coin and keeps
+a time-decayed impact accumulator per (author, coin).
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9\-]*")
+
+class Post(NamedTuple):
+    post_id: str
+    author: str
+    platform: str
+    timestamp: float
+    text: str
+    engagement: float
+    coins: Tuple[Tuple[str, float], ...]  # (coin id, relevance in (0, 1])
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.post_id,
+            'author': self.author,
+            'platform': self.platform,
+            'timestamp': self.timestamp,
+            'text': self.text,
+            'engagement': self.engagement,
+            'coins': dict(self.coins)
+        }
+
+def parse_timestamp(value) -> Optional[float]:
+    """Epoch seconds from epoch seconds/milliseconds or an ISO-8601 string"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e12 else float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def engagement_factor(engagement: float) -> float:
+    """Diminishing boost for widely shared posts: 1.0 with no engagement, 2.0 at 10k"""
+    return 1 + math.log10(1 + max(engagement, 0)) / 4
+
+class CoinRelevanceScorer:
+    """Scores which coins a post is about from keyword hits (single words and short phrases)"""
+
+    def __init__(self, keywords: Dict[str, str]):
+        self.words: Dict[str, str] = {}
+        self.phrases: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        for keyword, coin_id in keywords.items():
+            words = tuple(TOKEN_PATTERN.findall(keyword.lower()))
+            if len(words) == 1:
+                self.words[words[0]] = coin_id
+            elif words:
+                self.phrases.setdefault(words[0], []).append((words, coin_id))
+
+    @classmethod
+    def from_resolver(cls, resolver, extra_keywords: Optional[Dict[str, str]] = None) -> "CoinRelevanceScorer":
+        """Keywords for the major coins (id, symbol, name) plus any extra keyword -> coin pairs"""
+        from coin_resolver import STOPWORDS
+
+        resolver.load()
+        keywords = {}
+        for coin_id in resolver.rank:
+            for alias in resolver.aliases(coin_id):
+                if alias not in STOPWORDS:
+                    keywords[alias] = coin_id
+        keywords.update(extra_keywords or {})
+        return cls(keywords)
+
+    def score(self, text: str) -> Tuple[Tuple[str, float], ...]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        hits: Dict[str, int] = {}
+        for index, token in enumerate(tokens):
+            coin_id = self.words.get(token)
+            if coin_id is not None:
+                hits[coin_id] = hits.get(coin_id, 0) + 1
+            for words, phrase_coin in self.phrases.get(token, ()):
+                if tuple(tokens[index:index + len(words)]) == words:
+                    hits[phrase_coin] = hits.get(phrase_coin, 0) + 1
+        # Each additional mention halves the remaining doubt: 0.5, 0.75, 0.875, ...
+        return tuple((coin_id, 1 - 0.5 ** count) for coin_id, count in hits.items())
+
+class PostWindow:
+    """Recent posts indexed by author and coin, with decayed (author, coin) impact sums.
+
+    Decay and eviction are relative to the watermark (newest timestamp seen),
+    so replayed archives behave like a live feed at that point in time.
+    """
+
+    def __init__(self, window_seconds: float = 7 * 86400, half_life_seconds: float = 6 * 3600,
+                 max_posts_per_key: int = 1000, max_seen_ids: int = 1_000_000, min_impact: float = 1e-6):
+        self.window_seconds = window_seconds
+        self.half_life_seconds = half_life_seconds
+        self.max_posts_per_key = max_posts_per_key
+        self.max_seen_ids = max_seen_ids
+        # Impact sums that have decayed below this are dropped
+        self.min_impact = min_impact
+
+        self.by_author: Dict[str, Deque[Post]] = {}
+        self.by_coin: Dict[str, Deque[Post]] = {}
+        # (author, coin) -> [decayed impact sum, reference time]
+        self.impacts: Dict[Tuple[str, str], List[float]] = {}
+        self.watermark = 0.0
+        self._seen = set()
+        self._seen_order: Deque[str] = deque()
+        self._lock = threading.Lock()
+        self.posts = 0
+        self.duplicates = 0
+
+    def decay(self, age: float) -> float:
+        return 0.5 ** (age / self.half_life_seconds)
+
+    def _remember(self, post_id: str) -> bool:
+        if post_id in self._seen:
+            return False
+        self._seen.add(post_id)
+        self._seen_order.append(post_id)
+        if len(self._seen_order) > self.max_seen_ids:
+            self._seen.discard(self._seen_order.popleft())
+        return True
+
+    def _accumulate(self, key: Tuple[str, str], weight: float, timestamp: float):
+        entry = self.impacts.get(key)
+        if entry is None:
+            self.impacts[key] = [weight, timestamp]
+            return
+        value, reference = entry
+        if timestamp > reference:
+            # Move the reference forward so the stored value never grows unboundedly
+            entry[0] = value * self.decay(timestamp - reference) + weight
+            entry[1] = timestamp
+        else:
+            entry[0] = value + weight * self.decay(reference - timestamp)
+
+    def add_batch(self, posts: Iterable[Post], impact_weight: Callable[[str], float]) -> int:
+        added = 0
+        with self._lock:
+            for post in posts:
+                if post.post_id and not self._remember(post.post_id):
+                    self.duplicates += 1
+                    continue
+                if post.timestamp < self.watermark - self.window_seconds:
+                    continue
+                self.watermark = max(self.watermark, post.timestamp)
+                author_posts = self.by_author.setdefault(post.author, deque(maxlen=self.max_posts_per_key))
+                author_posts.append(post)
+                if post.coins:
+                    weight = impact_weight(post.author) * engagement_factor(post.engagement)
+                    for coin_id, relevance in post.coins:
+                        self.by_coin.setdefault(coin_id, deque(maxlen=self.max_posts_per_key)).append(post)
+                        self._accumulate((post.author, coin_id), weight * relevance, post.timestamp)
+                added += 1
+            self.posts += added
+            self._evict()
+        return added
+
+    def _evict(self):
+        cutoff = self.watermark - self.window_seconds
+        for index in (self.by_author, self.by_coin):
+            for key in list(index):
+                posts = index[key]
+                while posts and posts[0].timestamp < cutoff:
+                    posts.popleft()
+                if not posts:
+                    del index[key]
+        for key in list(self.impacts):
+            value, reference = self.impacts[key]
+            if value * self.decay(max(self.watermark - reference, 0)) < self.min_impact:
+                del self.impacts[key]
+
+    def recent_posts(self, author: str, limit: int = 50, since: Optional[float] = None) -> List[Post]:
+        """Newest posts by an author first"""
+        with self._lock:
+            posts = list(self.by_author.get(author, ()))
+        posts = [post for post in posts if since is None or post.timestamp >= since]
+        posts.sort(key=lambda post: post.timestamp, reverse=True)
+        return posts[:limit]
+
+    def posts_for_coin(self, coin_id: str, limit: int = 50) -> List[Post]:
+        with self._lock:
+            posts = list(self.by_coin.get(coin_id, ()))
+        posts.sort(key=lambda post: post.timestamp, reverse=True)
+        return posts[:limit]
+
+    def impact(self, author: str, coin_id: str, now: Optional[float] = None) -> float:
+        """Decayed impact of an author's posts on a coin, in O(1)"""
+        with self._lock:
+            entry = self.impacts.get((author, coin_id))
+            if entry is None:
+                return 0.0
+            value, reference = entry
+            now = now if now is not None else self.watermark
+        return value * self.decay(max(now - reference, 0))
+
+class SocialIngestPipeline:
+    def __init__(self, window: PostWindow, scorer: CoinRelevanceScorer,
+                 impact_weight: Callable[[str], float], batch_size: int = 5000):
+        self.window = window
+        self.scorer = scorer
+        self.impact_weight = impact_weight
+        self.batch_size = batch_size
+        self.malformed = 0
+
+    def iter_lines(self, paths: Iterable[str]) -> Iterator[bytes]:
+        for path in paths:
+            files = sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith('.jsonl')
+            ) if os.path.isdir(path) else [path]
+            for file_path in files:
+                with open(file_path, 'rb') as handle:
+                    for line in handle:
+                        if line.strip():
+                            yield line
+
+    def iter_batches(self, paths: Iterable[str]) -> Iterator[List[bytes]]:
+        batch = []
+        for line in self.iter_lines(paths):
+            batch.append(line)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def parse(self, line: bytes) -> Optional[Post]:
+        """One archive line as a Post; lines that are not a usable post object count as malformed"""
+        try:
+            raw = _loads(line)
+            if not isinstance(raw, dict):
+                raise ValueError("not a JSON object")
+            timestamp = parse_timestamp(raw.get('timestamp'))
+            text = raw.get('text') or ''
+            if timestamp is None or not raw.get('author') or not isinstance(text, str):
+                raise ValueError("missing timestamp, author or text")
+            engagement = float(raw.get('likes') or 0) + 2 * float(raw.get('reposts') or raw.get('retweets') or 0)
+        except (TypeError, ValueError):
+            self.malformed += 1
+            return None
+        return Post(
+            str(raw.get('id') or ''),
+            raw['author'],
+            raw.get('platform', 'twitter'),
+            timestamp,
+            text,
+            engagement,
+            self.scorer.score(text)
+        )
+
+    def ingest(self, paths: Iterable[str]) -> Dict:
+        """Stream every post in ``paths`` (files or directories of .jsonl) into the window"""
+        started = time.perf_counter()
+        read = added = 0
+        for batch in self.iter_batches(paths):
+            posts = [post for post in map(self.parse, batch) if post is not None]
+            read += len(batch)
+            added += self.window.add_batch(posts, self.impact_weight)
+        elapsed = time.perf_counter() - started
+        return {
+            'lines': read,
+            'added': added,
+            'malformed': self.malformed,
+            'seconds': elapsed,
+            'posts_per_minute': read / elapsed * 60 if elapsed else 0
+        }
+
+if __name__ == "__main__":
+    import random
+    import sys
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    authors = ['elonmusk', 'VitalikButerin', 'cz_binance', 'saylor'] + [f"user{i}" for i in range(1000)]
+    phrases = [
+        "bitcoin to the moon", "eth gas fees are wild today", "just bought more doge",
+        "solana outage again?", "shiba inu community is strong", "nothing to see here",
+        "btc dominance rising while ethereum lags", "gm frens", "new bnb listing soon"
+    ]
+
+    random.seed(0)
+    start = time.time() - 86400
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+        for index in range(count):
+            handle.write(json.dumps({
+                'id': str(index),
+                'author': random.choice(authors),
+                'timestamp': start + index * 86400 / count,
+                'text': random.choice(phrases),
+                'likes': random.randint(0, 5000),
+                'reposts': random.randint(0, 500)
+            }) + "\n")
+        path = handle.name
+
+    scorer = CoinRelevanceScorer({
+        'bitcoin': 'bitcoin', 'btc': 'bitcoin', 'ethereum': 'ethereum', 'eth': 'ethereum',
+        'doge': 'dogecoin', 'solana': 'solana', 'shiba inu': 'shiba-inu', 'bnb': 'binancecoin'
+    })
+    window = PostWindow()
+    pipeline = SocialIngestPipeline(window, scorer, lambda author: 9.5 if author == 'elonmusk' else 1.0)
+    stats = pipeline.ingest([path])
+    os.remove(path)
+
+    print(f"Ingested {stats['added']:,} of {stats['lines']:,} posts in {stats['seconds']:.2f}s "
+          f"({stats['posts_per_minute'] / 1e6:.2f}M posts/minute)")
+    print(f"elonmusk -> bitcoin impact: {window.impact('elonmusk', 'bitcoin'):.2f}")
@@ -1,37 +1,201 @@
-import requests
-from typing import Dict, List, Optional
+from upstream import upstream_scheduler
+from coin_resolver import coin_resolver
+from aho_corasick import AhoCorasick
+from social_ingest import CoinRelevanceScorer, PostWindow, SocialIngestPipeline, engagement_factor
+from async_runtime import BackgroundEventLoop
+from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Pattern, Tuple
 from datetime import datetime, timedelta
+import aiohttp
+import asyncio
+import hashlib
+import io
 import json
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Used when the influencer config file is missing or unreadable
+DEFAULT_INFLUENCERS = {
+    'elonmusk': {
+        'impact_score': 9.5,
+        'keywords': ['doge', 'crypto', 'bitcoin', 'btc'],
+        'platform': 'twitter'
+    },
+    'VitalikButerin': {
+        'impact_score': 8.5,
+        'keywords': ['ethereum', 'eth', 'layer2', 'scaling'],
+        'platform': 'twitter'
+    },
+    'cz_binance': {
+        'impact_score': 8.0,
+        'keywords': ['bnb', 'binance', 'listing', 'trading'],
+        'platform': 'twitter'
+    },
+    'saylor': {
+        'impact_score': 8.0,
+        'keywords': ['bitcoin', 'btc', 'crypto'],
+        'platform': 'twitter'
+    }
+}
+
+def load_influencers(path: str) -> Optional[Dict[str, Dict]]:
+    """Read the influencer registry (handle -> impact_score/keywords/platform) from JSON"""
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError) as e:
+        print(f"Error loading influencers from {path}: {str(e)}")
+        return None
+
+class InfluencerIndex:
+    """Inverted index from keyword (and the coin it names) to influencers"""
+
+    def __init__(self, influencers: Dict[str, Dict]):
+        self.handles = list(influencers)
+        # keyword -> [(influencer position, keyword position)]
+        self.owners: Dict[str, List[Tuple[int, int]]] = {}
+        for rank, data in enumerate(influencers.values()):
+            for position, keyword in enumerate(data['keywords']):
+                self.owners.setdefault(keyword.lower(), []).append((rank, position))
+        self.automaton = AhoCorasick(self.owners)
+        self._by_coin: Optional[Dict[str, List[str]]] = None
+
+    @property
+    def by_coin(self) -> Dict[str, List[str]]:
+        """Coin id -> keywords naming it ("btc" -> bitcoin); resolved on first use"""
+        if self._by_coin is None:
+            by_coin: Dict[str, List[str]] = {}
+            for keyword in self.owners:
+                coin_id = coin_resolver.resolve(keyword, fuzzy=False)
+                if coin_id:
+                    by_coin.setdefault(coin_id, []).append(keyword)
+            self._by_coin = by_coin
+        return self._by_coin
+
+    def lookup(self, coin_id: str) -> Dict[int, List[str]]:
+        """Influencer position -> relevant keywords, in registry order"""
+        resolved_id = coin_resolver.resolve(coin_id, fuzzy=False) or coin_id
+        # Keywords contained in the id itself, plus keywords that are another name for the coin
+        keywords = {keyword for _, keyword in self.automaton.iter(coin_id)}
+        keywords.update(alias for alias in coin_resolver.aliases(resolved_id) if alias in self.owners)
+        keywords.update(self.by_coin.get(resolved_id, ()))
+
+        hits: Dict[int, List[Tuple[int, str]]] = {}
+        for keyword in keywords:
+            for rank, position in self.owners[keyword]:
+                hits.setdefault(rank, []).append((position, keyword))
+        return {rank: [keyword for _, keyword in sorted(hits[rank])] for rank in sorted(hits)}
+
+class InfluencerRegistry(NamedTuple):
+    """Influencer registry and its keyword index, published together as one value"""
+    influencers: Mapping[str, Dict]
+    index: InfluencerIndex
 
 class InfluencerTracker:
     """Tracks crypto influencers and their market impact without using tweepy"""
     
-    def __init__(self):
+    def __init__(self, config_path: Optional[str] = None):
         self.cache = {}
         self.cache_duration = 300  # 5 minutes
         
-        # Define key influencers and their typical impact
-        self.INFLUENCERS = {
-            'elonmusk': {
-                'impact_score': 9.5,
-                'keywords': ['doge', 'crypto', 'bitcoin', 'btc'],
-                'platform': 'twitter'
-            },
-            'VitalikButerin': {
-                'impact_score': 8.5,
-                'keywords': ['ethereum', 'eth', 'layer2', 'scaling'],
-                'platform': 'twitter'
-            },
-            'cz_binance': {
-                'impact_score': 8.0,
-                'keywords': ['bnb', 'binance', 'listing', 'trading'],
-                'platform': 'twitter'
-            },
-            'saylor': {
-                'impact_score': 8.0,
-                'keywords': ['bitcoin', 'btc', 'crypto'],
-                'platform': 'twitter'
-            }
+        # Key influencers and their typical impact, from config/influencers.json
+        self.config_path = config_path or os.getenv("INFLUENCERS_CONFIG", "config/influencers.json")
+        self.reload_influencers()
+
+        # Ingested posts (see social_ingest.py), indexed by author and coin
+        self.posts = PostWindow()
+        self.default_impact = 1.0  # weight of authors outside the registry
+        self._scorer: Optional[Tuple[InfluencerRegistry, CoinRelevanceScorer]] = None
+
+    def reload_influencers(self):
+        """Re-read the registry file and rebuild the keyword index"""
+        self._set_influencers(load_influencers(self.config_path) or DEFAULT_INFLUENCERS)
+
+    def _set_influencers(self, influencers: Dict[str, Dict]):
+        # One attribute write, so a reader holding the registry never sees it disagree with its index
+        influencers = dict(influencers)
+        self._registry = InfluencerRegistry(MappingProxyType(influencers), InfluencerIndex(influencers))
+
+    @property
+    def INFLUENCERS(self) -> Mapping[str, Dict]:
+        return self._registry.influencers
+
+    def register_influencer(self, handle: str, impact_score: float, keywords: List[str], platform: str = 'twitter'):
+        influencers = dict(self.INFLUENCERS)
+        influencers[handle] = {'impact_score': impact_score, 'keywords': list(keywords), 'platform': platform}
+        self._set_influencers(influencers)
+
+    def remove_influencer(self, handle: str):
+        influencers = {name: data for name, data in self.INFLUENCERS.items() if name != handle}
+        self._set_influencers(influencers)
+
+    def impact_weight(self, author: str) -> float:
+        data = self.INFLUENCERS.get(author)
+        return data['impact_score'] if data else self.default_impact
+
+    @property
+    def relevance_scorer(self) -> CoinRelevanceScorer:
+        """Coin keywords: major coins' names/symbols plus registry keywords that name a coin"""
+        registry, cached = self._registry, self._scorer
+        if cached is None or cached[0] is not registry:
+            extra = {keyword: coin_id for coin_id, keywords in registry.index.by_coin.items() for keyword in keywords}
+            cached = self._scorer = (registry, CoinRelevanceScorer.from_resolver(coin_resolver, extra))
+        return cached[1]
+
+    def ingest_posts(self, paths: List[str], batch_size: int = 5000) -> Dict:
+        """Load post archives (JSONL files or directories of them) into the recent-post window"""
+        pipeline = SocialIngestPipeline(self.posts, self.relevance_scorer, self.impact_weight, batch_size)
+        return pipeline.ingest(paths)
+
+    def get_recent_posts(self, influencer: str, limit: int = 50, since: Optional[float] = None) -> List[Dict]:
+        """Newest ingested posts by an influencer"""
+        return [post.to_dict() for post in self.posts.recent_posts(influencer, limit, since)]
+
+    def analyze_impact(self, posts: List[Dict], coin_id: str, now: Optional[float] = None) -> Dict:
+        """Time-decayed impact of ``posts`` on a coin, weighted by author impact, relevance and engagement"""
+        resolved_id = coin_resolver.resolve(coin_id, fuzzy=False) or coin_id.lower()
+        now = now if now is not None else (self.posts.watermark or time.time())
+        impact_score = 0.0
+        relevant_posts = []
+        for post in posts:
+            relevance = post.get('coins', {}).get(resolved_id)
+            if not relevance:
+                continue
+            impact_score += (
+                self.impact_weight(post['author'])
+                * relevance
+                * engagement_factor(post.get('engagement', 0))
+                * self.posts.decay(max(now - post['timestamp'], 0))
+            )
+            relevant_posts.append(post)
+        return {
+            'impact_score': round(impact_score, 4),
+            'relevant_posts': relevant_posts
+        }
+
+    def influencer_impact(self, influencer: str, coin_id: str, now: Optional[float] = None, limit: int = 50) -> Dict:
+        """Same score as analyze_impact over all of an influencer's ingested posts, read from the window's accumulator"""
+        resolved_id = coin_resolver.resolve(coin_id, fuzzy=False) or coin_id.lower()
+        relevant_posts = [
+            post.to_dict() for post in self.posts.recent_posts(influencer, limit)
+            if any(coin == resolved_id for coin, _ in post.coins)
+        ]
+        return {
+            'impact_score': round(self.posts.impact(influencer, resolved_id, now), 4),
+            'relevant_posts': relevant_posts
         }
 
     def get_social_metrics(self, coin_id: str) -> Dict:
@@ -45,9 +209,8 @@ class InfluencerTracker:
                 "community_data": "true",
                 "developer_data": "false"
             }
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
+            data = upstream_scheduler.get_json(url, params)
+            if data:
                 community_data = data.get('community_data', {})
                 return {
                     'twitter_followers': community_data.get('twitter_followers', 0),
@@ -111,15 +274,17 @@ class InfluencerTracker:
 
     def get_influencer_impact(self, coin_id: str) -> List[Dict]:
         """Get potential influencer impact for a coin"""
+        registry = self._registry
         impacts = []
-        for influencer, data in self.INFLUENCERS.items():
-            if any(keyword in coin_id.lower() for keyword in data['keywords']):
-                impacts.append({
-                    'influencer': influencer,
-                    'platform': data['platform'],
-                    'impact_score': data['impact_score'],
-                    'relevant_keywords': [k for k in data['keywords'] if k in coin_id.lower()]
-                })
+        for rank, relevant in registry.index.lookup(coin_id.lower()).items():
+            influencer = registry.index.handles[rank]
+            data = registry.influencers[influencer]
+            impacts.append({
+                'influencer': influencer,
+                'platform': data['platform'],
+                'impact_score': data['impact_score'],
+                'relevant_keywords': relevant
+            })
         return impacts
 
     def get_overall_analysis(self, coin_id: str) -> Dict:
@@ -129,4 +294,391 @@ class InfluencerTracker:
             'metrics': self.get_social_metrics(coin_id),
             'sentiment': self.analyze_social_sentiment(coin_id),
             'influencer_impact': self.get_influencer_impact(coin_id)
-        }
\ No newline at end of file
+        }
+
+# Streaming fallback read size when a file cannot be memory-mapped
+TEXT_CHUNK_SIZE = 8 << 20
+TEXT_EXTENSIONS = ('.txt', '.log', '.md', '.csv', '.json', '.jsonl')
+
+WORD_BYTE = re.compile(rb'\w')
+
+@lru_cache(maxsize=64)
+def compile_keyword_pattern(keywords: Tuple[str, ...], whole_words: bool = True) -> Pattern[bytes]:
+    """One bytes regex alternation over every keyword, longest first so phrases win over their prefixes"""
+    encoded = sorted({keyword.encode('utf-8') for keyword in keywords if keyword}, key=len, reverse=True)
+    if not encoded:
+        # An empty alternation would match the empty string at every offset
+        raise ValueError("compile_keyword_pattern needs at least one non-empty keyword")
+    if not whole_words:
+        return re.compile(b'|'.join(map(re.escape, encoded)))
+    # \b is about twice as fast as lookarounds but only means "word edge" next to a word character
+    plain = [keyword for keyword in encoded if WORD_BYTE.match(keyword[:1]) and WORD_BYTE.match(keyword[-1:])]
+    others = [
+        rb'(?<!\w)' + re.escape(keyword) + rb'(?!\w)' for keyword in encoded if keyword not in plain
+    ]
+    alternatives = others + ([rb'\b(?:' + b'|'.join(map(re.escape, plain)) + rb')\b'] if plain else [])
+    return re.compile(b'|'.join(alternatives))
+
+class TextFileAnalyzer:
+    """Keyword counts, positions and per-window densities for large text dumps.
+
+    Files are memory-mapped (or streamed when they cannot be mapped) and read
+    in fixed-size chunks scanned by one compiled regex, so memory use does
+    not grow with file size. Case-insensitive scans lowercase each chunk
+    instead of using re.IGNORECASE, which is several times slower. Positions
+    are byte offsets.
+    """
+
+    def __init__(self, window_size: int = 1 << 20, max_positions: int = 1000, whole_words: bool = True,
+                 case_sensitive: bool = False, max_workers: Optional[int] = None):
+        self.window_size = window_size
+        self.max_positions = max_positions
+        self.whole_words = whole_words
+        self.case_sensitive = case_sensitive
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def _pattern(self, keywords: Iterable[str]) -> Tuple[Optional[Pattern[bytes]], Dict[bytes, str]]:
+        """Compiled matcher (None without keywords) and a map from matched bytes back to the caller's keyword"""
+        names = {}
+        for keyword in keywords:
+            if keyword:
+                key = keyword.encode('utf-8')
+                names.setdefault(key if self.case_sensitive else key.lower(), keyword)
+        if not names:
+            return None, names
+        return compile_keyword_pattern(tuple(key.decode('utf-8') for key in names), self.whole_words), names
+
+    def _iter_chunk_matches(self, handle, pattern: Pattern[bytes], overlap: int) -> Iterator[Tuple[int, bytes]]:
+        """Matches over a stream; each chunk keeps ``overlap`` trailing bytes so boundary matches are found once"""
+        # buffer[:pos] is one byte of already-scanned context for the word-boundary lookbehind
+        buffer, base, pos = b'', 0, 0
+        while True:
+            chunk = handle.read(TEXT_CHUNK_SIZE)
+            # bytes.lower only folds ASCII, so offsets are unchanged
+            buffer += chunk if self.case_sensitive else chunk.lower()
+            # Matches starting in the tail may continue into the next chunk; leave them for the next pass
+            limit = len(buffer) if not chunk else max(len(buffer) - overlap, pos)
+            cut = limit
+            for match in pattern.finditer(buffer, pos):
+                if match.start() >= limit:
+                    break
+                cut = max(cut, match.end())
+                yield base + match.start(), match.group(0)
+            if not chunk:
+                return
+            # Resume after the last accepted match, as a single pass over the whole file would
+            pos = 1 if cut else 0
+            base += cut - pos
+            buffer = buffer[cut - pos:]
+
+    def _iter_matches(self, path: str, pattern: Pattern[bytes], overlap: int) -> Iterator[Tuple[int, bytes]]:
+        with open(path, 'rb') as handle:
+            try:
+                data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty files and non-mappable streams
+                yield from self._iter_chunk_matches(handle, pattern, overlap)
+                return
+            with data:
+                if hasattr(data, 'madvise'):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+                yield from self._iter_chunk_matches(data, pattern, overlap)
+
+    def _summarize(self, matches: Iterable[Tuple[int, bytes]], names: Dict[bytes, str], size: int) -> Dict:
+        counts = {keyword: 0 for keyword in names.values()}
+        positions: Dict[str, List[int]] = {keyword: [] for keyword in names.values()}
+        windows: Dict[int, Dict[str, int]] = {}
+        for start, text in matches:
+            keyword = names.get(text)
+            if keyword is None:
+                continue
+            counts[keyword] += 1
+            if len(positions[keyword]) < self.max_positions:
+                positions[keyword].append(start)
+            window = windows.setdefault(start // self.window_size, {})
+            window[keyword] = window.get(keyword, 0) + 1
+
+        window_stats = []
+        for index in sorted(windows):
+            start = index * self.window_size
+            length = max(min(self.window_size, size - start), 1)
+            total = sum(windows[index].values())
+            window_stats.append({
+                'start': start,
+                'end': start + length,
+                'matches': total,
+                'density': total / (length / 1024),  # matches per KB
+                'keywords': windows[index]
+            })
+        return {
+            'bytes': size,
+            'total_matches': sum(counts.values()),
+            'keyword_counts': counts,
+            'positions': positions,
+            'windows': window_stats,
+            'peak_window': max(window_stats, key=lambda window: window['density']) if window_stats else None
+        }
+
+    def scan_file(self, path: str, keywords: List[str]) -> Dict:
+        """Analyse a file of any size in bounded memory"""
+        pattern, names = self._pattern(keywords)
+        if pattern is None:
+            # Nothing to look for, so the file is not read
+            result = self._summarize((), names, os.path.getsize(path))
+            result['path'] = path
+            return result
+        overlap = max(len(key) for key in names) + 1
+        result = self._summarize(self._iter_matches(path, pattern, overlap), names, os.path.getsize(path))
+        result['path'] = path
+        return result
+
+    def analyze_directory(self, path: str, keywords: List[str], extensions: Tuple[str, ...] = TEXT_EXTENSIONS,
+                          max_workers: Optional[int] = None) -> Dict:
+        """Scan every matching file under ``path`` across a process pool and merge the counts"""
+        files = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names if name.lower().endswith(extensions)
+        ]
+        # Largest first so one big file does not start last and stretch the run
+        files.sort(key=os.path.getsize, reverse=True)
+        results: Dict[str, Dict] = {}
+        # Keyed like scan_file's counts: no empty keywords, case duplicates folded into the first spelling
+        _, names = self._pattern(keywords)
+        totals = {keyword: 0 for keyword in names.values()}
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers or self.max_workers, mp_context=context) as pool:
+            futures = {pool.submit(self.scan_file, file_path, keywords): file_path for file_path in files}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    results[file_path] = future.result()
+                except Exception as e:
+                    print(f"Error scanning {file_path}: {str(e)}")
+                    results[file_path] = {'path': file_path, 'error': str(e)}
+                    continue
+                for keyword, count in results[file_path]['keyword_counts'].items():
+                    totals[keyword] = totals.get(keyword, 0) + count
+        return {
+            'files': results,
+            'bytes': sum(result.get('bytes', 0) for result in results.values()),
+            'total_matches': sum(totals.values()),
+            'keyword_counts': totals
+        }
+
+    def read_file(self, file_path: str) -> Optional[str]:
+        """Whole file as text; prefer scan_file for anything large"""
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as handle:
+                return handle.read()
+        except Exception as e:
+            print(f"Error reading file: {str(e)}")
+            return None
+
+    def analyze_content(self, content: str, keywords: List[str]) -> Dict:
+        """Same report as scan_file for text already in memory (positions are UTF-8 byte offsets)"""
+        data = content.encode('utf-8')
+        pattern, names = self._pattern(keywords)
+        if pattern is None:
+            return self._summarize((), names, len(data))
+        overlap = max(len(key) for key in names) + 1
+        return self._summarize(self._iter_chunk_matches(io.BytesIO(data), pattern, overlap), names, len(data))
+
+WHITESPACE = re.compile(r"\s+")
+
+def parse_html(html: str) -> Dict:
+    """Title and visible text of a page"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for tag in soup(['script', 'style', 'noscript', 'template', 'svg']):
+        tag.decompose()
+    title = soup.title.get_text(strip=True) if soup.title else ''
+    return {'title': title, 'text': WHITESPACE.sub(' ', soup.get_text(' ')).strip()}
+
+class WebContentAnalyzer:
+    """Concurrent page fetcher with conditional GETs and a disk cache of parsed pages.
+
+    Pages are fetched over one pooled aiohttp session (with a per-host
+    connection limit), revalidated with ETag/Last-Modified so unchanged pages
+    are not downloaded or parsed again, and parsed with BeautifulSoup (lxml
+    when installed) in a worker thread.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, event_loop: Optional[BackgroundEventLoop] = None):
+        self.cache_dir = cache_dir or os.getenv("WEB_CACHE_DIR", "data/web_cache")
+        # Pages younger than this are served from the cache without revalidating
+        self.refresh_interval = float(os.getenv("WEB_REFRESH_INTERVAL", "300"))
+        self.connection_limit = 100
+        self.connection_limit_per_host = int(os.getenv("WEB_CONNECTIONS_PER_HOST", "4"))
+        self.request_timeout = 15  # seconds
+        self.max_page_bytes = 5 << 20
+        self.user_agent = "crypto-advisor/1.0 (+content analysis)"
+        self.event_loop = event_loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.metrics = {'fetched': 0, 'not_modified': 0, 'fresh_cache_hits': 0, 'stale_on_error': 0, 'errors': 0}
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating it on the running loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                headers={'User-Agent': self.user_agent}
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Close the pooled session; call from the loop that owns it"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_cached(self, url: str) -> Optional[Dict]:
+        try:
+            with open(self._cache_path(url), 'r', encoding='utf-8') as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading web cache for {url}: {str(e)}")
+            return None
+
+    def _store_cached(self, page: Dict):
+        path = self._cache_path(page['url'])
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as handle:
+                json.dump(page, handle)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Error writing web cache for {page['url']}: {str(e)}")
+
+    def _count(self, metric: str):
+        with self._lock:
+            self.metrics[metric] += 1
+
+    async def _read_body(self, response: aiohttp.ClientResponse) -> bytes:
+        """Body up to max_page_bytes; a single read() returns as soon as any data has arrived"""
+        chunks, size = [], 0
+        while size < self.max_page_bytes:
+            chunk = await response.content.read(self.max_page_bytes - size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        return b''.join(chunks)
+
+    async def fetch_page(self, url: str) -> Optional[Dict]:
+        """Parsed page ({'url', 'title', 'text', 'etag', 'last_modified', 'fetched_at', ...}) or None"""
+        cached = await asyncio.to_thread(self._load_cached, url)
+        if cached and time.time() - cached.get('fetched_at', 0) < self.refresh_interval:
+            self._count('fresh_cache_hits')
+            return dict(cached, source='cache')
+
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            session = await self._get_session()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self._count('not_modified')
+                    page = dict(cached, fetched_at=time.time())
+                    await asyncio.to_thread(self._store_cached, page)
+                    return dict(page, source='not_modified')
+                response.raise_for_status()
+                body = await self._read_body(response)
+                html = body.decode(response.charset or 'utf-8', errors='replace')
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except Exception as e:
+            print(f"Error fetching webpage {url}: {str(e) or type(e).__name__}")
+            if cached:
+                self._count('stale_on_error')
+                return dict(cached, source='stale')
+            self._count('errors')
+            return None
+
+        # Parsing is CPU-bound; keep it off the event loop
+        parsed = await asyncio.to_thread(parse_html, html)
+        page = {
+            'url': url,
+            'title': parsed['title'],
+            'text': parsed['text'],
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time()
+        }
+        await asyncio.to_thread(self._store_cached, page)
+        self._count('fetched')
+        return dict(page, source='network')
+
+    async def crawl(self, urls: List[str], keywords: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Fetch every URL concurrently; each result carries the page and, with keywords, its analysis"""
+        urls = list(dict.fromkeys(urls))
+        pages = await asyncio.gather(*(self.fetch_page(url) for url in urls))
+        results = {}
+        for url, page in zip(urls, pages):
+            if page is None:
+                results[url] = {'url': url, 'error': 'fetch failed'}
+                continue
+            if keywords is not None:
+                page['analysis'] = self.analyze_webpage(page['text'], keywords)
+            results[url] = page
+        return results
+
+    def _run(self, coro):
+        if self.event_loop is None:
+            self.event_loop = BackgroundEventLoop("web-content-analyzer")
+            self.event_loop.add_shutdown_hook(self.close)
+        return self.event_loop.run(coro)
+
+    def crawl_sync(self, urls: List[str], keywords: Optional[List[str]] = None) -> Dict[str, Dict]:
+        return self._run(self.crawl(urls, keywords))
+
+    def fetch_webpage(self, url: str) -> Optional[str]:
+        """Visible text of a page, fetched (or revalidated) through the cache"""
+        page = self._run(self.fetch_page(url))
+        return page['text'] if page else None
+
+    def analyze_webpage(self, content: str, keywords: List[str]) -> Dict:
+        """Keyword hits in page text (raw HTML is parsed first)"""
+        if content.lstrip()[:1] == '<':
+            content = parse_html(content)['text']
+        counts = {keyword: 0 for keyword in keywords if keyword}
+        names = {}
+        for keyword in counts:
+            names.setdefault(keyword.lower(), keyword)
+        if names:
+            pattern = compile_keyword_pattern(tuple(names))
+            for match in pattern.finditer(content.lower().encode('utf-8')):
+                counts[names[match.group(0).decode('utf-8')]] += 1
+        word_count = len(content.split())
+        total = sum(counts.values())
+        return {
+            'word_count': word_count,
+            'keyword_counts': counts,
+            'total_matches': total,
+            'keyword_density': total / word_count * 1000 if word_count else 0.0  # per 1000 words
+        }
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return dict(self.metrics)
@@ -0,0 +1,257 @@
+"""Incremental indicators updated in O(1) (amortised) per new price point.
+
+Each indicator keeps only the state it needs, exposes ``update`` and
+``value``, and can be captured with ``snapshot()`` and rebuilt with
+``restore()`` so state survives restarts.
+"""
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+class IncrementalIndicator:
+    """Base class providing snapshot/restore over plain attributes"""
+
+    # Attributes holding deques; snapshotted as lists
+    _deque_fields = ()
+
+    def snapshot(self) -> Dict:
+        state = {}
+        for name, value in vars(self).items():
+            state[name] = [list(item) if isinstance(item, tuple) else item for item in value] \
+                if name in self._deque_fields else value
+        state['type'] = type(self).__name__
+        return state
+
+    @classmethod
+    def restore(cls, state: Dict) -> "IncrementalIndicator":
+        indicator = cls.__new__(cls)
+        for name, value in state.items():
+            if name == 'type':
+                continue
+            if name in cls._deque_fields:
+                value = deque(tuple(item) if isinstance(item, list) else item for item in value)
+            setattr(indicator, name, value)
+        return indicator
+
+class IncrementalEMA(IncrementalIndicator):
+    def __init__(self, span: int = 20):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.value: Optional[float] = None
+
+    def update(self, price: float) -> float:
+        self.value = price if self.value is None else self.alpha * price + (1 - self.alpha) * self.value
+        return self.value
+
+class IncrementalRSI(IncrementalIndicator):
+    """Wilder's RSI, seeded with a simple average over the first ``period`` changes"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous: Optional[float] = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0
+
+    def update(self, price: float) -> Optional[float]:
+        if self.previous is not None:
+            change = price - self.previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self.count += 1
+            if self.count <= self.period:
+                self.avg_gain += (gain - self.avg_gain) / self.count
+                self.avg_loss += (loss - self.avg_loss) / self.count
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        self.previous = price
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if self.count < self.period:
+            return None
+        if self.avg_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+class RollingVolatility(IncrementalIndicator):
+    """Realised volatility (%) of log returns over a trailing time window"""
+
+    _deque_fields = ('returns',)
+
+    def __init__(self, window_seconds: float = 86400):
+        self.window_seconds = window_seconds
+        self.returns = deque()  # (timestamp, log_return)
+        self.previous: Optional[float] = None
+        self.sum_squares = 0.0
+
+    def update(self, timestamp: float, price: float) -> float:
+        if self.previous is not None and self.previous > 0 and price > 0:
+            log_return = math.log(price / self.previous)
+            self.returns.append((timestamp, log_return))
+            self.sum_squares += log_return * log_return
+        self.previous = price
+        self._evict(timestamp)
+        return self.value
+
+    def _evict(self, now: float):
+        cutoff = now - self.window_seconds
+        while self.returns and self.returns[0][0] <= cutoff:
+            _, log_return = self.returns.popleft()
+            self.sum_squares -= log_return * log_return
+        if not self.returns:
+            # Reset accumulated floating point drift whenever the window empties
+            self.sum_squares = 0.0
+
+    @property
+    def samples(self) -> int:
+        return len(self.returns)
+
+    def covers(self, now: float, fraction: float = 0.9) -> bool:
+        """True once the returns reach back at least ``fraction`` of the window from ``now``"""
+        return bool(self.returns) and self.returns[0][0] <= now - fraction * self.window_seconds
+
+    @property
+    def value(self) -> float:
+        return math.sqrt(max(self.sum_squares, 0.0)) * 100
+
+class RollingVWAP(IncrementalIndicator):
+    """Volume-weighted average price over a trailing time window"""
+
+    _deque_fields = ('points',)
+
+    def __init__(self, window_seconds: float = 86400):
+        self.window_seconds = window_seconds
+        self.points = deque()  # (timestamp, price * volume, volume)
+        self.price_volume = 0.0
+        self.volume = 0.0
+
+    def update(self, timestamp: float, price: float, volume: float) -> Optional[float]:
+        if volume and volume > 0:
+            self.points.append((timestamp, price * volume, volume))
+            self.price_volume += price * volume
+            self.volume += volume
+        cutoff = timestamp - self.window_seconds
+        while self.points and self.points[0][0] <= cutoff:
+            _, price_volume, volume = self.points.popleft()
+            self.price_volume -= price_volume
+            self.volume -= volume
+        if not self.points:
+            self.price_volume = self.volume = 0.0
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.price_volume / self.volume if self.volume > 0 else None
+
+class RollingMinMax(IncrementalIndicator):
+    """Trailing-window minimum and maximum using monotonic deques"""
+
+    _deque_fields = ('minimums', 'maximums')
+
+    def __init__(self, window_seconds: float = 86400):
+        self.window_seconds = window_seconds
+        self.minimums = deque()  # (timestamp, price), prices increasing
+        self.maximums = deque()  # (timestamp, price), prices decreasing
+
+    def update(self, timestamp: float, price: float):
+        while self.minimums and self.minimums[-1][1] >= price:
+            self.minimums.pop()
+        self.minimums.append((timestamp, price))
+        while self.maximums and self.maximums[-1][1] <= price:
+            self.maximums.pop()
+        self.maximums.append((timestamp, price))
+
+        cutoff = timestamp - self.window_seconds
+        while self.minimums[0][0] <= cutoff:
+            self.minimums.popleft()
+        while self.maximums[0][0] <= cutoff:
+            self.maximums.popleft()
+        return self.minimum, self.maximum
+
+    @property
+    def minimum(self) -> Optional[float]:
+        return self.minimums[0][1] if self.minimums else None
+
+    @property
+    def maximum(self) -> Optional[float]:
+        return self.maximums[0][1] if self.maximums else None
+
+INDICATOR_TYPES = {
+    cls.__name__: cls
+    for cls in (IncrementalEMA, IncrementalRSI, RollingVolatility, RollingVWAP, RollingMinMax)
+}
+
+class CoinIndicatorState:
+    """The streaming indicators tracked for one coin"""
+
+    def __init__(self, window_seconds: float = 86400):
+        self.last_timestamp: Optional[float] = None
+        self.indicators = {
+            'ema_12': IncrementalEMA(12),
+            'ema_26': IncrementalEMA(26),
+            'rsi_14': IncrementalRSI(14),
+            'volatility': RollingVolatility(window_seconds),
+            'vwap': RollingVWAP(window_seconds),
+            'range': RollingMinMax(window_seconds)
+        }
+
+    def update(self, timestamp: float, price: float, volume: Optional[float] = None) -> bool:
+        """Apply a new price point; repeated or out-of-order points are ignored"""
+        if price is None or (self.last_timestamp is not None and timestamp <= self.last_timestamp):
+            return False
+        self.last_timestamp = timestamp
+        self.indicators['ema_12'].update(price)
+        self.indicators['ema_26'].update(price)
+        self.indicators['rsi_14'].update(price)
+        self.indicators['volatility'].update(timestamp, price)
+        self.indicators['vwap'].update(timestamp, price, volume or 0)
+        self.indicators['range'].update(timestamp, price)
+        return True
+
+    @property
+    def volatility_samples(self) -> int:
+        return self.indicators['volatility'].samples
+
+    def values(self) -> Dict:
+        price_range = self.indicators['range']
+        return {
+            'ema_12': self.indicators['ema_12'].value,
+            'ema_26': self.indicators['ema_26'].value,
+            'rsi_14': self.indicators['rsi_14'].value,
+            'volatility_24h': self.indicators['volatility'].value,
+            'volatility_samples': self.volatility_samples,
+            'vwap_24h': self.indicators['vwap'].value,
+            'low_24h': price_range.minimum,
+            'high_24h': price_range.maximum,
+            'last_update': self.last_timestamp
+        }
+
+    def snapshot(self) -> Dict:
+        return {
+            'last_timestamp': self.last_timestamp,
+            'indicators': {name: indicator.snapshot() for name, indicator in self.indicators.items()}
+        }
+
+    @classmethod
+    def restore(cls, state: Dict) -> "CoinIndicatorState":
+        coin_state = cls.__new__(cls)
+        coin_state.last_timestamp = state.get('last_timestamp')
+        coin_state.indicators = {
+            name: INDICATOR_TYPES[snapshot['type']].restore(snapshot)
+            for name, snapshot in state['indicators'].items()
+        }
+        return coin_state
+
+def payload_timestamp(market_data: Dict) -> float:
+    """Epoch seconds of a CoinGecko market_data block, falling back to now"""
+    last_updated = market_data.get('last_updated')
+    if last_updated:
+        try:
+            return datetime.fromisoformat(str(last_updated).replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return time.time()
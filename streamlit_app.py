@@ -1,15 +1,14 @@
 import streamlit as st
-from eliza_crypto_advisor import match_pattern, get_market_aware_response
-from market_data import MarketDataHandler
+from eliza_crypto_advisor import match_pattern, stream_market_aware_response
+from model_registry import model_registry
+from market_handler import MarketDataHandler, DEFAULT_ANALYSIS_VIEWS
+from market_poller import MarketPoller, SnapshotStore
+from async_runtime import BackgroundEventLoop
 from social_monitor import InfluencerTracker
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import pandas as pd
 
-# Initialize components
-market_handler = MarketDataHandler()
-influencer_tracker = InfluencerTracker()
-
 # Page config
 st.set_page_config(
     page_title="ElizaAI Two - Crypto Advisor",
@@ -17,6 +16,36 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def warm_up_advisor_model():
+    """Load the advisor model once per process instead of on every rerun"""
+    model_registry.warm_up()
+    return model_registry
+
+@st.cache_resource
+def get_market_services():
+    """Start one background poller per process; reruns only read its snapshots"""
+    event_loop = BackgroundEventLoop()
+    handler = MarketDataHandler()
+    store = SnapshotStore()
+    poller = MarketPoller(handler, store, event_loop, watchlist=['bitcoin'], views=DEFAULT_ANALYSIS_VIEWS)
+    poller.start()
+    return event_loop, handler, store
+
+SNAPSHOT_MAX_AGE = 300  # seconds
+
+def get_latest_analysis(coin_id: str):
+    snapshot = snapshot_store.latest(coin_id, max_age=SNAPSHOT_MAX_AGE)
+    if snapshot is not None:
+        return snapshot.to_dict()
+    # The poller has not finished its first cycle yet, or has stopped refreshing
+    return event_loop.run(market_handler.get_market_analysis(coin_id))
+
+# Initialize components
+event_loop, market_handler, snapshot_store = get_market_services()
+influencer_tracker = InfluencerTracker()
+warm_up_advisor_model()
+
 # Title and description
 st.title("ElizaAI Two - Crypto Market Advisor")
 st.markdown("""
@@ -48,17 +77,27 @@ with col1:
     if prompt := st.chat_input("Ask about market trends, tokens, or analysis..."):
         # Add user message
         st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.write(prompt)
         
         # Get AI response
-        pattern_match = match_pattern(prompt)
-        if pattern_match:
-            response_template, captured = pattern_match
-            try:
-                response = response_template.format(captured)
-            except:
-                response = response_template
-        else:
-            response = get_market_aware_response(prompt)
+        with st.chat_message("assistant"):
+            pattern_match = match_pattern(prompt)
+            if pattern_match:
+                response_template, captured = pattern_match
+                try:
+                    response = response_template.format(captured)
+                except:
+                    response = response_template
+                st.write(response)
+            else:
+                # Render the model output incrementally as tokens arrive
+                placeholder = st.empty()
+                response = ""
+                for token in stream_market_aware_response(prompt):
+                    response += token
+                    placeholder.markdown(response + "▌")
+                placeholder.markdown(response)
         
         # Add AI response
         st.session_state.messages.append({"role": "assistant", "content": response})
@@ -69,7 +108,7 @@ with col2:
     
     # Get current analysis if available
     try:
-        analysis = market_handler.get_market_analysis_sync('bitcoin')  # Default to Bitcoin
+        analysis = get_latest_analysis('bitcoin')  # Default to Bitcoin
         
         # Price metrics
         st.metric(
@@ -0,0 +1,162 @@
+"""OHLCV ingestion and vectorised technical indicators.
+
+Every indicator accepts either a Series (one coin) or a wide DataFrame with
+one column per coin, so hundreds of coins are computed by the same pandas
+rolling/ewm kernels without Python-level loops.
+"""
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from upstream import INTERACTIVE, upstream_scheduler
+
+COINGECKO_API = "https://api.coingecko.com/api/v3"
+
+Frame = Union[pd.Series, pd.DataFrame]
+
+def price_frame_to_ohlcv(frame: pd.DataFrame, freq: str = "1h") -> pd.DataFrame:
+    """Resample a datetime-indexed frame of price (and optional volume) points into OHLCV bars.
+
+    CoinGecko only reports a rolling 24h volume, so the bar volume is the
+    last reported value within the bar.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=['open', 'high', 'low', 'close', 'volume'])
+    ohlcv = frame['price'].resample(freq).ohlc()
+    ohlcv['volume'] = frame['volume'].resample(freq).last() if 'volume' in frame else np.nan
+    return ohlcv.dropna(subset=['close'])
+
+def market_chart_to_frame(payload: Dict) -> pd.DataFrame:
+    """Align a CoinGecko market_chart payload into price/volume/market_cap columns"""
+    series = {}
+    for column, key in (('price', 'prices'), ('volume', 'total_volumes'), ('market_cap', 'market_caps')):
+        points = payload.get(key) or []
+        if points:
+            values = pd.DataFrame(points, columns=['timestamp', column])
+            series[column] = values.groupby('timestamp')[column].last()
+    if 'price' not in series:
+        return pd.DataFrame(columns=['price', 'volume', 'market_cap'])
+    frame = pd.DataFrame(series).reindex(columns=['price', 'volume', 'market_cap'])
+    frame.index = pd.to_datetime(frame.index, unit='ms', utc=True)
+    return frame.dropna(subset=['price'])
+
+def market_chart_to_ohlcv(payload: Dict, freq: str = "1h") -> pd.DataFrame:
+    return price_frame_to_ohlcv(market_chart_to_frame(payload), freq)
+
+def fetch_market_chart(coin_id: str, days: int = 30, priority: int = INTERACTIVE) -> Optional[Dict]:
+    """Download raw price history from CoinGecko's market_chart endpoint"""
+    try:
+        return upstream_scheduler.get_json(
+            f"{COINGECKO_API}/coins/{coin_id}/market_chart",
+            params={"vs_currency": "usd", "days": str(days)},
+            priority=priority
+        )
+    except Exception as e:
+        print(f"Error fetching price history: {str(e)}")
+    return None
+
+def load_coingecko_ohlcv(coin_id: str, days: int = 30, freq: str = "1h") -> Optional[pd.DataFrame]:
+    payload = fetch_market_chart(coin_id, days)
+    return market_chart_to_ohlcv(payload, freq) if payload else None
+
+def load_store_ohlcv(store, coin_id: str, start_ms: Optional[int] = None,
+                     end_ms: Optional[int] = None, freq: str = "1h") -> pd.DataFrame:
+    """OHLCV bars built from the local PriceHistoryStore, no network involved"""
+    return price_frame_to_ohlcv(store.read_frame(coin_id, start_ms, end_ms), freq)
+
+def load_ccxt_ohlcv(exchange_id: str, symbol: str, timeframe: str = "1m",
+                    since: Optional[int] = None, limit: int = 1000, max_bars: int = 500000) -> Optional[pd.DataFrame]:
+    """Page through an exchange's OHLCV history with ccxt"""
+    try:
+        import ccxt
+
+        exchange = getattr(ccxt, exchange_id)({'enableRateLimit': True})
+        rows = []
+        while len(rows) < max_bars:
+            batch = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            if not batch:
+                break
+            rows.extend(batch)
+            next_since = batch[-1][0] + 1
+            if since is not None and next_since <= since:
+                break
+            since = next_since
+            if len(batch) < limit:
+                break
+        frame = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        frame.index = pd.to_datetime(frame.pop('timestamp'), unit='ms', utc=True)
+        return frame[~frame.index.duplicated(keep='last')]
+    except Exception as e:
+        print(f"Error fetching exchange history: {str(e)}")
+    return None
+
+def sma(close: Frame, window: int = 20) -> Frame:
+    return close.rolling(window, min_periods=window).mean()
+
+def ema(close: Frame, span: int = 20) -> Frame:
+    return close.ewm(span=span, adjust=False, min_periods=span).mean()
+
+def rsi(close: Frame, period: int = 14) -> Frame:
+    """Wilder's RSI"""
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    avg_gain = gain.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    avg_loss = loss.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    rs = avg_gain / avg_loss
+    # No losses in the window means maximum strength
+    return (100 - 100 / (1 + rs)).where(avg_loss != 0, 100.0)
+
+def macd(close: Frame, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, Frame]:
+    macd_line = ema(close, fast) - ema(close, slow)
+    signal_line = macd_line.ewm(span=signal, adjust=False, min_periods=signal).mean()
+    return {
+        'macd': macd_line,
+        'macd_signal': signal_line,
+        'macd_histogram': macd_line - signal_line
+    }
+
+def bollinger_bands(close: Frame, window: int = 20, num_std: float = 2.0) -> Dict[str, Frame]:
+    middle = sma(close, window)
+    std = close.rolling(window, min_periods=window).std(ddof=0)
+    upper = middle + num_std * std
+    lower = middle - num_std * std
+    return {
+        'bb_middle': middle,
+        'bb_upper': upper,
+        'bb_lower': lower,
+        'bb_bandwidth': (upper - lower) / middle
+    }
+
+def atr(high: Frame, low: Frame, close: Frame, period: int = 14) -> Frame:
+    """Average True Range with Wilder smoothing"""
+    previous_close = close.shift(1)
+    true_range = np.fmax(np.fmax(high - low, (high - previous_close).abs()), (low - previous_close).abs())
+    return true_range.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+
+def compute_indicators(ohlcv: pd.DataFrame) -> pd.DataFrame:
+    """Add SMA/EMA/RSI/MACD/Bollinger/ATR columns to a single-coin OHLCV frame"""
+    close = ohlcv['close']
+    columns = {
+        'sma_20': sma(close, 20),
+        'sma_50': sma(close, 50),
+        'ema_12': ema(close, 12),
+        'ema_26': ema(close, 26),
+        'rsi_14': rsi(close, 14),
+        'atr_14': atr(ohlcv['high'], ohlcv['low'], close, 14)
+    }
+    columns.update(macd(close))
+    columns.update(bollinger_bands(close))
+    return ohlcv.assign(**columns)
+
+def latest_indicators(ohlcv: Optional[pd.DataFrame]) -> Dict:
+    """Latest indicator values as plain floats (None where history is too short)"""
+    if ohlcv is None or ohlcv.empty:
+        return {}
+    last = compute_indicators(ohlcv).iloc[-1]
+    return {
+        name: (None if pd.isna(value) else float(value))
+        for name, value in last.items()
+        if name not in ('open', 'high', 'low', 'volume')
+    }
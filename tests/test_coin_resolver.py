@@ -0,0 +1,49 @@
+import pytest
+
+from coin_resolver import FALLBACK_COINS, CoinResolver
+
+@pytest.fixture
+def resolver(tmp_path):
+    resolver = CoinResolver(cache_path=str(tmp_path / "coins_list.json"))
+    coins = [{'id': coin_id, 'symbol': symbol, 'name': name} for coin_id, symbol, name in FALLBACK_COINS]
+    # Listed tokens named after ordinary words, as on the real /coins/list
+    coins += [{'id': 'lately', 'symbol': 'late', 'name': 'Lately'}, {'id': 'effect-ai', 'symbol': 'effect', 'name': 'Effect'}]
+    resolver.load(coins)
+    return resolver
+
+@pytest.mark.parametrize("message, expected", [
+    ("I am full of optimism about bitcoin", 'bitcoin'),
+    ("stellar performance for eth lately", 'ethereum'),
+    ("what is the ripple effect on btc", 'bitcoin'),
+    ("the ripples of the BTC halving", 'bitcoin'),
+    ("Stellar performance for ETH", 'ethereum'),
+    ("polygon or avalanche, which is better than solana?", 'solana'),
+    ("tether your expectations to doge", 'dogecoin'),
+    ("usdt supply is growing", 'tether'),
+])
+def test_common_words_do_not_shadow_coins(resolver, message, expected):
+    assert resolver.resolve_message(message) == expected
+
+@pytest.mark.parametrize("message, expected", [
+    ("is $optimism a buy?", 'optimism'),
+    ("What about Ripple?", 'ripple'),
+    ("Stellar price today", 'stellar'),
+    ("OP or ARB?", 'optimism'),
+    ("XLM vs Stellar", 'stellar'),
+])
+def test_explicit_mentions_of_common_word_coins(resolver, message, expected):
+    assert resolver.resolve_message(message) == expected
+
+def test_lowercase_common_words_are_not_mentions(resolver):
+    assert resolver.resolve_all("full of optimism, a stellar ripple") == []
+    assert resolver.resolve_message("full of optimism") is None
+
+def test_capitalised_common_word_yields_to_unambiguous_mention(resolver):
+    mentions = resolver.resolve_all("Ripple Effect: is Cardano next?")
+    assert [mention.coin_id for mention in mentions] == ['ripple', 'cardano']
+    assert mentions[0].ambiguous and not mentions[1].ambiguous
+    assert resolver.resolve_message("Ripple Effect: is Cardano next?") == 'cardano'
+
+def test_hints_need_an_exact_match(resolver):
+    assert resolver.resolve_message("tell me more", 'Solana') == 'solana'
+    assert resolver.resolve_message("tell me more", 'solanna') is None
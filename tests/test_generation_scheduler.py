@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import generation_scheduler
+from generation_scheduler import GenerationScheduler
+
+class FakeTokenizer:
+    """Whitespace tokenizer that left pads batches, like the registry's tokenizers"""
+    eos_token_id = 0
+    padding_side = "left"
+
+    def __init__(self):
+        self.vocabulary = {'<pad>': 0}
+
+    def _ids(self, text):
+        return [self.vocabulary.setdefault(word, len(self.vocabulary)) for word in text.split()]
+
+    def __call__(self, prompts, return_tensors="pt", padding=False, max_length=512, truncation=True):
+        rows = [self._ids(prompt)[:max_length] for prompt in prompts]
+        width = max(len(row) for row in rows)
+        input_ids = [[0] * (width - len(row)) + row for row in rows]
+        attention_mask = [[0] * (width - len(row)) + [1] * len(row) for row in rows]
+        return {'input_ids': torch.tensor(input_ids), 'attention_mask': torch.tensor(attention_mask)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        words = {index: word for word, index in self.vocabulary.items()}
+        return " ".join(words[int(index)] for index in ids if not (skip_special_tokens and int(index) == 0))
+
+class FakeModel:
+    """Echoes each row's last prompt token ``max_new_tokens`` times"""
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.options = []
+        self.fail = False
+
+    def generate(self, input_ids, attention_mask=None, max_new_tokens=1, **options):
+        self.batch_sizes.append(input_ids.shape[0])
+        self.options.append(options)
+        if self.fail:
+            raise RuntimeError("out of memory")
+        reply = input_ids[:, -1:].repeat(1, max_new_tokens)
+        return torch.cat([input_ids, reply], dim=1)
+
+class FakeRegistry:
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.model = FakeModel()
+
+    def get(self, model_name):
+        return self.tokenizer, self.model
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = FakeRegistry()
+    monkeypatch.setattr(generation_scheduler, 'model_registry', registry)
+    return registry
+
+def submit_all(scheduler, prompts):
+    # Queue everything before the worker starts so the batches are deterministic
+    futures = []
+    for prompt in prompts:
+        future = generation_scheduler.Future()
+        scheduler._queue.put((prompt, future))
+        futures.append(future)
+    scheduler._ensure_started()
+    return futures
+
+def test_concurrent_prompts_share_one_generate_call(registry):
+    scheduler = GenerationScheduler(max_batch_size=8, max_wait_ms=200, max_new_tokens=2)
+    prompts = ["price of bitcoin", "eth", "is solana safe to buy", "doge"]
+    futures = submit_all(scheduler, prompts)
+
+    # Each future gets the completion of its own row, without the padding or the prompt
+    assert [future.result(timeout=5) for future in futures] == [
+        "bitcoin bitcoin", "eth eth", "buy buy", "doge doge"
+    ]
+    assert registry.model.batch_sizes == [4]
+    metrics = scheduler.get_metrics()
+    assert (metrics['batches'], metrics['requests'], metrics['max_batch_seen']) == (1, 4, 4)
+
+def test_batches_are_capped_at_max_batch_size(registry):
+    scheduler = GenerationScheduler(max_batch_size=2, max_wait_ms=50, max_new_tokens=1)
+    futures = submit_all(scheduler, [f"coin{index}" for index in range(5)])
+
+    assert [future.result(timeout=5) for future in futures] == [f"coin{index}" for index in range(5)]
+    assert registry.model.batch_sizes == [2, 2, 1]
+
+def test_submit_from_many_threads(registry):
+    scheduler = GenerationScheduler(max_batch_size=4, max_wait_ms=20, max_new_tokens=1)
+    results = {}
+
+    def ask(index):
+        results[index] = scheduler.generate(f"coin{index}", timeout=5)
+
+    threads = [threading.Thread(target=ask, args=(index,)) for index in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {index: f"coin{index}" for index in range(10)}
+    assert sum(registry.model.batch_sizes) == 10
+    assert max(registry.model.batch_sizes) <= 4
+
+def test_generate_error_fails_every_future_in_the_batch(registry):
+    registry.model.fail = True
+    scheduler = GenerationScheduler(max_batch_size=8, max_wait_ms=200)
+    futures = submit_all(scheduler, ["a", "b"])
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    # The worker survives and serves the next batch
+    registry.model.fail = False
+    assert scheduler.generate("c", timeout=5).startswith("c")
+
+def test_temperature_switches_on_sampling(registry):
+    sampling = GenerationScheduler(max_wait_ms=0, temperature=0.7)
+    greedy = GenerationScheduler(max_wait_ms=0, temperature=0)
+    sampling.generate("a", timeout=5)
+    greedy.generate("b", timeout=5)
+
+    assert registry.model.options[0]['do_sample'] is True
+    assert registry.model.options[0]['temperature'] == 0.7
+    assert registry.model.options[1]['do_sample'] is False
+    assert 'temperature' not in registry.model.options[1]
+
+def test_shared_tokenizer_is_not_mutated(registry):
+    # Padding is chosen when the registry loads the tokenizer, never per batch
+    registry.tokenizer.padding_side = "right"
+    GenerationScheduler(max_wait_ms=0).generate("a", timeout=5)
+    assert registry.tokenizer.padding_side == "right"
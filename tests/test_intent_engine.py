@@ -0,0 +1,132 @@
+import re
+from typing import Optional, Tuple
+
+import pytest
+
+from intent_engine import IntentEngine, intent_engine, required_literals
+
+CORPUS = [
+    "analyze DOGE coin",
+    "What is the price of bitcoin today?",
+    "how much is my eth worth now",
+    "SOL price analysis please",
+    "why is xrp going up so fast",
+    "Why did ADA go down overnight?",
+    "what is happening with shiba inu",
+    "everyone says pepe is pumping",
+    "is the market dumping right now",
+    "did you see elon tweet about doge",
+    "what are people saying about solana",
+    "how is the community around avalanche",
+    "check LINK for me",
+    "tell me about polkadot",
+    "is it safe to buy matic",
+    "what's the risk on this new memecoin",
+    "is bitcoin trending this week",
+    "give me an analysis of arbitrum",
+    "hello there",
+    "thanks, that helps a lot",
+    "what value does chainlink add",
+    "I'm worried about danger in defi lending",
+    "should I hold or sell",
+    "btc to the moon, mooning hard",
+    "What do you think about the Fed meeting and crypto?",
+    "can you check the social buzz for bonk",
+    "gm",
+    "price of ethereum vs bitcoin this month",
+    "why is everything down today",
+    "what's happening in the market",
+    "",
+    "ABOUT",
+    "check\nETH",
+    "price price price of of of",
+]
+
+# Reference implementations mirroring the nested-loop matchers the engine replaced
+def legacy_match_crypto_pattern(market_patterns, user_input: str) -> Optional[Tuple[str, str]]:
+    for pattern_type, patterns in market_patterns.items():
+        for pattern, response_type in patterns:
+            match = re.search(pattern, user_input.lower())
+            if match:
+                groups = match.groups()
+                return response_type, groups[-1] if groups else ""
+    return None
+
+def legacy_match_pattern(crypto_patterns, user_input: str) -> Optional[Tuple[str, str]]:
+    for pattern in crypto_patterns:
+        match = re.search(pattern, user_input.lower())
+        if match:
+            return pattern, match.group(2) if len(match.groups()) > 1 else match.group(1)
+    return None
+
+def legacy_coin(user_input: str) -> str:
+    coin_match = re.search(r'(?i)(?:analyze|check|about)\s+(\w+)', user_input)
+    return coin_match.group(1).lower() if coin_match else 'bitcoin'
+
+def engine_all(user_input: str):
+    matches = intent_engine.match(user_input)
+    mention = matches.get('coin_mention')
+    market = matches.get('market')
+    crypto = matches.get('advisor')
+    return (
+        mention.coin if mention else 'bitcoin',
+        (market.intent, market.coin) if market else None,
+        (crypto.intent, crypto.coin) if crypto else None
+    )
+
+@pytest.fixture(scope="module")
+def legacy_all():
+    # Importing the pattern modules registers their sets with the shared engine
+    market_patterns = pytest.importorskip("eliza_patterns").MARKET_PATTERNS
+    crypto_patterns = pytest.importorskip("eliza_crypto_advisor").advisor.CRYPTO_PATTERNS
+
+    def match(user_input: str):
+        return (
+            legacy_coin(user_input),
+            legacy_match_crypto_pattern(market_patterns, user_input),
+            legacy_match_pattern(crypto_patterns, user_input)
+        )
+
+    return match
+
+@pytest.mark.parametrize("line", CORPUS)
+def test_engine_matches_legacy_matchers(legacy_all, line):
+    assert engine_all(line) == legacy_all(line)
+
+def test_first_rule_in_a_set_wins_over_an_earlier_match():
+    engine = IntentEngine()
+    engine.register('set', [(r'price of (\w+)', 'price'), (r'(\w+) today', 'today')])
+    # re.search semantics: rule order decides, not position in the text
+    match = engine.match("btc today, price of eth")['set']
+    assert (match.intent, match.index, match.coin) == ('price', 0, 'eth')
+
+def test_leftmost_occurrence_is_captured():
+    engine = IntentEngine()
+    engine.register('set', [(r'about (\w+)', 'about')])
+    assert engine.match("about sol and about eth")['set'].coin == 'sol'
+
+def test_sets_are_matched_independently():
+    engine = IntentEngine()
+    engine.register('a', [(r'(buy|sell)', 'trade')])
+    engine.register('b', [(r'check (\w+)', 'check')])
+    matches = engine.match("Check DOGE then sell")
+    assert matches['a'].coin == 'sell'
+    assert matches['b'].coin == 'doge'
+    assert engine.match("nothing here") == {}
+
+def test_register_replaces_a_set():
+    engine = IntentEngine()
+    engine.register('set', [(r'price', 'old')])
+    engine.register('set', [(r'price', 'new')])
+    assert engine.match("price")['set'].intent == 'new'
+
+@pytest.mark.parametrize("pattern,expected", [
+    (r'price of (\w+)', [('price of ',)]),
+    (r'(?:why|how) is (\w+)', [('why', 'how'), (' is ',)]),
+    (r'(buy|sell)s? now', [('buy', 'sell'), (' now',)]),
+    (r'pumping|dumping', []),
+    (r'(buy|sell)? now', [(' now',)]),
+    (r'[a-z]+ coin', [(' coin',)]),
+])
+def test_required_literals(pattern, expected):
+    assert required_literals(pattern) == expected
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import market_poller
+from market_poller import MarketPoller, SnapshotStore
+
+class FakeHandler:
+    def __init__(self):
+        self.stages = {
+            'price_data': SimpleNamespace(requires={'market'}),
+            'social_metrics': SimpleNamespace(requires={'community'})
+        }
+        self.bulk_calls = []
+        self.slow_calls = []
+        self.price = 100.0
+
+    async def get_market_analysis_many(self, coin_ids, views, priority=None):
+        self.bulk_calls.append(list(coin_ids))
+        return {coin_id: {'timestamp': 't', 'price_data': {'current_price': self.price}} for coin_id in coin_ids}
+
+    async def analyze(self, coin_id, views, priority=None):
+        self.slow_calls.append(coin_id)
+        return {'timestamp': 't', 'social_metrics': {'followers': len(self.slow_calls)}}
+
+def make_poller(handler, store, **kwargs):
+    options = dict(watchlist=['bitcoin'], views=['price_data'], slow_views=['social_metrics'],
+                   interval=60, rate_budget=6000, slow_interval=900)
+    options.update(kwargs)
+    return MarketPoller(handler, store, None, **options)
+
+def test_slow_views_are_published_with_the_snapshot():
+    handler, store = FakeHandler(), SnapshotStore()
+    poller = make_poller(handler, store, watchlist=['bitcoin', 'ethereum'])
+
+    asyncio.run(poller.refresh_once())
+    # The first cycle publishes prices, then fetches the social views off the request path
+    assert 'social_metrics' not in store.latest('bitcoin').analysis
+    assert sorted(handler.slow_calls) == ['bitcoin', 'ethereum']
+
+    handler.price = 101.0
+    asyncio.run(poller.refresh_once())
+    analysis = store.latest('bitcoin').to_dict()
+    assert analysis['price_data'] == {'current_price': 101.0}
+    assert analysis['social_metrics']['followers'] in (1, 2)
+    # Not due again within slow_interval
+    assert len(handler.slow_calls) == 2
+    assert len(handler.bulk_calls) == 2
+
+def test_slow_views_share_the_cycle_budget(monkeypatch):
+    handler, store = FakeHandler(), SnapshotStore()
+    # 3 requests per cycle: one bulk page leaves room for two per-coin fetches
+    poller = make_poller(handler, store, watchlist=['a', 'b', 'c', 'd', 'e'], rate_budget=3)
+    real_sleep = asyncio.sleep
+
+    async def no_sleep(delay):
+        await real_sleep(0)
+
+    # Spacing at this budget is 20s per request
+    monkeypatch.setattr(market_poller.asyncio, 'sleep', no_sleep)
+    asyncio.run(poller.refresh_once())
+    assert handler.slow_calls == ['a', 'b']
+    asyncio.run(poller.refresh_once())
+    assert handler.slow_calls == ['a', 'b', 'c', 'd']
+
+def test_request_published_slow_views_survive_the_next_cycle():
+    handler, store = FakeHandler(), SnapshotStore()
+    poller = make_poller(handler, store, slow_views=['social_metrics'])
+    poller.refresh_slow_views = lambda watchlist: asyncio.sleep(0)
+    store.publish('bitcoin', {'price_data': {'current_price': 1.0}, 'social_metrics': {'followers': 42}})
+
+    asyncio.run(poller.refresh_once())
+    analysis = store.latest('bitcoin').to_dict()
+    assert analysis['price_data'] == {'current_price': 100.0}
+    assert analysis['social_metrics'] == {'followers': 42}
+
+def test_watchlist_is_capped_and_idle_coins_expire():
+    handler, store = FakeHandler(), SnapshotStore()
+    poller = make_poller(handler, store, max_watched=2, idle_ttl=10)
+    for coin_id in ['a', 'b', 'c']:
+        poller.watch(coin_id)
+        store.publish(coin_id, {'price_data': {'current_price': 1.0}})
+    assert poller.watchlist == ['bitcoin', 'b', 'c']
+    assert store.latest('a') is None
+
+    poller._last_seen['b'] -= 100
+    poller.expire_idle()
+    assert poller.watchlist == ['bitcoin', 'c']
+    assert store.latest('b') is None
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from orderbook import ReplayFeed, diff_levels
+
+SYMBOL = 'BTC/USDT'
+
+EVENTS = [
+    {'type': 'snapshot', 'symbol': SYMBOL, 'timestamp': 1000,
+     'bids': [[100.0, 1.0], [99.0, 2.0], [90.0, 5.0]],
+     'asks': [[101.0, 1.0], [102.0, 3.0]]},
+    {'type': 'trades', 'symbol': SYMBOL, 'trades': [
+        [1000, 100.0, 1.0, 'buy', 'a'],
+        [2000, 101.0, 1.0, 'sell', 'b']
+    ]},
+    # Removes the 100 bid, adds a better one, resizes and adds asks
+    {'type': 'update', 'symbol': SYMBOL, 'timestamp': 3000,
+     'bids': [[100.0, 0.0], [100.5, 0.5]],
+     'asks': [[101.0, 1.5], [101.5, 1.0]]},
+    # Overlapping poll: 'b' is a duplicate and the 1500 trade is older than the tape
+    {'type': 'trades', 'symbol': SYMBOL, 'trades': [
+        [2000, 101.0, 1.0, 'sell', 'b'],
+        [2000, 102.0, 2.0, 'buy', 'c'],
+        [1500, 95.0, 9.0, 'sell', 'x']
+    ]}
+]
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    path.write_text("".join(json.dumps(event) + "\n" for event in EVENTS))
+    return str(path)
+
+def test_replay_rebuilds_book_and_tape(recording):
+    feed = ReplayFeed(recording)
+    assert feed.replay() == len(EVENTS)
+
+    book = feed.books[SYMBOL]
+    assert book.top('bids') == [[100.5, 0.5], [99.0, 2.0], [90.0, 5.0]]
+    assert book.top('asks') == [[101.0, 1.5], [101.5, 1.0], [102.0, 3.0]]
+    assert book.timestamp == 3000
+
+    tape = feed.tapes[SYMBOL]
+    assert [trade[4] for trade in tape.trades] == ['a', 'b', 'c']
+    assert tape.last_price == 102.0
+
+def test_microstructure_after_replay(recording):
+    feed = ReplayFeed(recording)
+    feed.replay()
+    view = feed.get_microstructure(SYMBOL)
+
+    assert view['best_bid'] == 100.5
+    assert view['best_ask'] == 101.0
+    assert view['mid_price'] == pytest.approx(100.75)
+    assert view['spread_bps'] == pytest.approx(0.5 / 100.75 * 10000)
+    # Within 1% of the mid: only the 100.5 bid and the 101/101.5 asks count
+    assert view['bid_depth'] == pytest.approx(100.5 * 0.5)
+    assert view['ask_depth'] == pytest.approx(101.0 * 1.5 + 101.5 * 1.0)
+    assert view['vwap'] == pytest.approx((100.0 + 101.0 + 204.0) / 4)
+    assert view['trades_in_window'] == 3
+    assert view['updated_at'] == 3.0
+    assert feed.get_microstructure('ETH/USDT') == {}
+
+def test_recorded_events_replay_identically(recording, tmp_path):
+    copy_path = tmp_path / "copy.jsonl"
+    original = ReplayFeed(recording, record_path=str(copy_path))
+    original.replay()
+    original.close()
+
+    replayed = ReplayFeed(str(copy_path))
+    replayed.replay()
+    assert replayed.get_microstructure(SYMBOL) == original.get_microstructure(SYMBOL)
+
+def test_diff_levels_round_trip(recording):
+    feed = ReplayFeed(recording)
+    feed.replay()
+    book = feed.books[SYMBOL]
+    target = [[100.5, 1.0], [98.0, 4.0]]
+
+    book.apply_update(diff_levels(book.bids, target), [])
+    assert book.top('bids') == target
+
+def test_microstructure_stage(recording):
+    market_handler = pytest.importorskip("market_handler")
+    feed = ReplayFeed(recording)
+    feed.replay()
+    handler = market_handler.MarketDataHandler()
+    handler.attach_microstructure(feed)
+
+    # The stage needs no payload, so analyze() makes no upstream request
+    analysis = asyncio.run(handler.analyze('bitcoin', ['microstructure']))
+    assert analysis['microstructure'] == feed.get_microstructure(SYMBOL)
+    assert asyncio.run(handler.analyze('tether', ['microstructure']))['microstructure'] == {}
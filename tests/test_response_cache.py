@@ -0,0 +1,191 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pytest
+
+from response_cache import FetchCancelled, ResponseCache
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def cache(clock):
+    return ResponseCache(max_entries=3, ttl=60, stale_ttl=240, wait_timeout=5, clock=clock)
+
+def counting_fetch(value):
+    calls = []
+
+    def fetch():
+        calls.append(value)
+        return value
+
+    return fetch, calls
+
+def test_entries_expire_after_ttl_and_stale_ttl(cache, clock):
+    cache.set('k', 1)
+    assert cache.get('k') == 1
+    clock.advance(299)  # past ttl, within stale_ttl
+    assert cache.get('k') == 1
+    clock.advance(1)
+    assert cache.get('k') is None
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key)
+    assert cache.get('a') == 'a'  # 'b' is now the oldest
+    cache.set('d', 'd')
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in ('a', 'c', 'd')] == ['a', 'c', 'd']
+    assert cache.get_stats()['evictions'] == 1
+
+def test_fresh_hit_does_not_fetch(cache):
+    fetch, calls = counting_fetch('v')
+    assert cache.get_or_fetch('k', fetch) == 'v'
+    assert cache.get_or_fetch('k', fetch) == 'v'
+    assert calls == ['v']
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+def test_concurrent_misses_share_one_fetch(cache):
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'v'
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_fetch, 'k', fetch) for _ in range(8)]
+        # Let every thread join the in-flight fetch before it completes
+        while cache.get_stats()['coalesced'] < 7:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == ['v'] * 8
+    assert len(calls) == 1
+    assert cache.get_stats()['in_flight'] == 0
+
+def test_async_misses_share_one_fetch(cache):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'v'
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch_async('k', fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['v'] * 5
+    assert len(calls) == 1
+    assert cache.get_stats()['coalesced'] == 4
+
+def test_stale_entry_is_served_while_one_refresh_runs(cache, clock):
+    cache.set('k', 'old')
+    clock.advance(61)
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'new'
+
+    assert cache.get_or_fetch('k', fetch) == 'old'
+    assert cache.get_or_fetch('k', fetch) == 'old'  # the refresh is already running
+    release.set()
+    for _ in range(500):
+        if cache.get_stats()['in_flight'] == 0:
+            break
+        threading.Event().wait(0.01)
+
+    assert len(calls) == 1
+    assert cache.get_or_fetch('k', fetch) == 'new'
+    assert cache.get_stats()['stale_hits'] == 2
+
+def test_async_stale_refresh_runs_in_the_background(cache, clock):
+    cache.set('k', 'old')
+    clock.advance(61)
+
+    async def fetch():
+        return 'new'
+
+    async def main():
+        stale = await cache.get_or_fetch_async('k', fetch)
+        await asyncio.gather(*cache._background_tasks)
+        return stale, await cache.get_or_fetch_async('k', fetch)
+
+    assert asyncio.run(main()) == ('old', 'new')
+
+def test_failed_fetch_serves_the_last_good_copy(cache, clock):
+    cache.set('k', 'old')
+    clock.advance(1000)  # expired for lookups, still held
+    assert cache.get_or_fetch('k', lambda: None) == 'old'
+    assert cache.get_stats()['served_on_error'] == 1
+
+def test_failed_fetch_is_not_cached(cache):
+    assert cache.get_or_fetch('k', lambda: None) is None
+    fetch, calls = counting_fetch('v')
+    assert cache.get_or_fetch('k', fetch) == 'v'
+    assert calls == ['v']
+
+def test_fetch_error_reaches_waiters_and_is_not_cached(cache):
+    def fetch():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get_or_fetch('k', fetch)
+    assert cache.get_stats()['in_flight'] == 0
+    assert cache.get_or_fetch('k', lambda: 'v') == 'v'
+
+def test_cancelled_leader_releases_waiters(cache):
+    async def main():
+        gate = asyncio.Event()
+
+        async def fetch():
+            gate.set()
+            await asyncio.sleep(10)
+            return 'v'
+
+        leader = asyncio.ensure_future(cache.get_or_fetch_async('k', fetch))
+        await gate.wait()
+        waiter = asyncio.ensure_future(cache.get_or_fetch_async('k', fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(FetchCancelled):
+            await waiter
+
+    asyncio.run(main())
+    assert cache.get_stats()['in_flight'] == 0
+    assert cache.get_or_fetch('k', lambda: 'v') == 'v'
+
+def test_thread_waiter_gives_up_after_wait_timeout(clock):
+    cache = ResponseCache(wait_timeout=0.05, clock=clock)
+    release = threading.Event()
+    leader = threading.Thread(target=cache.get_or_fetch, args=('k', lambda: release.wait(5) and 'v'))
+    leader.start()
+    while cache.get_stats()['in_flight'] == 0:
+        threading.Event().wait(0.01)
+
+    with pytest.raises(FutureTimeoutError):
+        cache.get_or_fetch('k', lambda: 'other')
+    release.set()
+    leader.join(5)
+    assert cache.get('k') == 'v'
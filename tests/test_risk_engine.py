@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import risk_engine
+
+@pytest.fixture
+def handler():
+    market_handler = pytest.importorskip("market_handler")
+    handler = market_handler.MarketDataHandler()
+    handler.price_store = None
+    return handler
+
+def market(price_change=5.0, total_volume=1e8, market_cap=1e9, volume_change=30.0, **overrides):
+    market_data = {
+        'price_change_percentage_24h': price_change,
+        'total_volume': {'usd': total_volume},
+        'market_cap': {'usd': market_cap},
+        'volume_change_24h': volume_change
+    }
+    market_data.update(overrides)
+    return {'market_data': market_data}
+
+def without(coin_data, key):
+    market_data = dict(coin_data['market_data'])
+    del market_data[key]
+    return {'market_data': market_data}
+
+EDGE_CASES = [
+    market(),
+    market(market_cap=None),
+    market(market_cap=0),
+    market(market_cap=None, total_volume=None),
+    market(total_volume=0),
+    market(total_volume=0, market_cap=0),
+    market(price_change=None),
+    market(price_change=-25.0, volume_change=None),
+    market(price_change=12.0, volume_change=0),
+    market(price_change=30.0, volume_change=None),
+    without(market(price_change=-30.0), 'volume_change_24h'),
+    without(market(price_change=-15.0, total_volume=5e7), 'market_cap'),
+    without(market(total_volume=5e7), 'total_volume'),
+    {'market_data': dict(market()['market_data'], market_cap=None)},
+    {'market_data': dict(market()['market_data'], total_volume=None)},
+    {'market_data': {}},
+    {'market_data': None},
+    {}
+]
+
+def assert_parity(handler, coin_datas):
+    vectorized = risk_engine.analyze_coin_datas(coin_datas)
+    scalar = [handler._derive_risk_analysis(coin_data) for coin_data in coin_datas]
+
+    assert [row['risk_level'] for row in scalar] == list(vectorized['risk_level'])
+    assert [row['volume_to_mcap_ratio'] for row in scalar] == list(vectorized['volume_to_mcap_ratio'])
+    assert [row['volatility_24h'] for row in scalar] == list(vectorized['volatility_24h'])
+    assert handler._derive_risk_analysis_batch(coin_datas) == scalar
+    assert handler._derive_trading_signals_batch(coin_datas) == [
+        handler._derive_trading_signals(coin_data) for coin_data in coin_datas
+    ]
+
+def test_random_payloads_match_scalar_rules(handler):
+    assert_parity(handler, risk_engine._random_coin_datas(2000))
+
+@pytest.mark.parametrize("coin_data", EDGE_CASES)
+def test_missing_and_zero_inputs_match_scalar_rules(handler, coin_data):
+    assert_parity(handler, [coin_data])
+
+def test_missing_market_cap_scores_as_small_cap():
+    result = risk_engine.analyze_columns([0.0], [1e6], [None])
+    assert result['volume_to_mcap_ratio'][0] == 0
+    assert result['risk_score'][0] == 3
+    assert result['risk_level'][0] == 'Medium'
+
+def test_missing_volume_change_raises_no_volume_signals():
+    result = risk_engine.analyze_columns([30.0, -30.0], [1e6, 1e6], [1e9, 1e9])
+    assert not result['bullish_volume'].any()
+    assert not result['bearish_volume'].any()
+    assert result['high_volatility'].all()
+
+def test_analyze_frame_matches_analyze_columns():
+    coin_datas = risk_engine._random_coin_datas(100)
+    columns = risk_engine.columns_from_coin_datas(coin_datas)
+    frame = risk_engine.analyze_frame(pd.DataFrame(columns))
+    expected = risk_engine.analyze_columns(**columns)
+    for name, values in expected.items():
+        assert np.array_equal(frame[name].to_numpy(), values)
@@ -0,0 +1,37 @@
+import pytest
+
+from social_ingest import Post, PostWindow
+
+HOUR = 3600
+
+def post(post_id, author, timestamp, coins=(('bitcoin', 1.0),)):
+    return Post(post_id, author, 'twitter', timestamp, '', 0, tuple(coins))
+
+def test_impact_decays_with_half_life():
+    window = PostWindow(half_life_seconds=HOUR)
+    window.add_batch([post('1', 'alice', 0)], lambda author: 1.0)
+
+    assert window.impact('alice', 'bitcoin') == pytest.approx(1.0)
+    assert window.impact('alice', 'bitcoin', now=HOUR) == pytest.approx(0.5)
+    assert window.impact('bob', 'bitcoin') == 0.0
+
+def test_decayed_impacts_are_evicted():
+    window = PostWindow(half_life_seconds=HOUR, min_impact=0.01)
+    window.add_batch([post('1', 'alice', 0), post('2', 'bob', 0, [('ethereum', 1.0)])], lambda author: 1.0)
+    assert set(window.impacts) == {('alice', 'bitcoin'), ('bob', 'ethereum')}
+
+    # Seven half-lives later alice's impact is below 0.01; bob posts again and stays
+    window.add_batch([post('3', 'bob', 7 * HOUR, [('ethereum', 1.0)])], lambda author: 1.0)
+    assert set(window.impacts) == {('bob', 'ethereum')}
+    assert window.impact('alice', 'bitcoin') == 0.0
+    assert window.impact('bob', 'ethereum') == pytest.approx(1.0 + 0.5 ** 7)
+
+def test_posts_outside_the_window_are_dropped():
+    window = PostWindow(window_seconds=10 * HOUR, half_life_seconds=HOUR)
+    window.add_batch([post('1', 'alice', 0), post('2', 'alice', 20 * HOUR)], lambda author: 1.0)
+
+    assert [p.post_id for p in window.recent_posts('alice')] == ['2']
+    assert [p.post_id for p in window.posts_for_coin('bitcoin')] == ['2']
+    # Late arrivals older than the window are ignored, duplicates are counted
+    assert window.add_batch([post('3', 'alice', 5 * HOUR), post('2', 'alice', 20 * HOUR)], lambda author: 1.0) == 0
+    assert window.duplicates == 1
@@ -0,0 +1,78 @@
+import io
+import random
+
+import pytest
+
+import social_monitor
+from social_monitor import TextFileAnalyzer, compile_keyword_pattern
+
+KEYWORDS = ['eth', 'ethereum', 'btc', 'bitcoin cash', 'bitcoin', '$doge', 'c++', 'señor']
+FILLER = ['the', 'ethe', 'xbtc', 'bitcoins', 'cash', '$', '+', 'doge', 'Señor', 'ETH', '\n', '.', 'ß']
+
+def random_text(rng: random.Random, words: int) -> str:
+    vocabulary = KEYWORDS + FILLER
+    separators = [' ', '', '  ', ', ', '\n']
+    return "".join(rng.choice(vocabulary) + rng.choice(separators) for _ in range(words))
+
+def whole_buffer_matches(analyzer: TextFileAnalyzer, data: bytes, keywords):
+    pattern, _ = analyzer._pattern(keywords)
+    haystack = data if analyzer.case_sensitive else data.lower()
+    return [(match.start(), match.group(0)) for match in pattern.finditer(haystack)]
+
+@pytest.mark.parametrize("whole_words", [True, False])
+@pytest.mark.parametrize("case_sensitive", [True, False])
+def test_chunked_scan_matches_whole_buffer(monkeypatch, whole_words, case_sensitive):
+    rng = random.Random(f"{whole_words}-{case_sensitive}")
+    analyzer = TextFileAnalyzer(whole_words=whole_words, case_sensitive=case_sensitive)
+    pattern, names = analyzer._pattern(KEYWORDS)
+    overlap = max(len(key) for key in names) + 1
+
+    for _ in range(50):
+        data = random_text(rng, rng.randint(0, 200)).encode('utf-8')
+        expected = whole_buffer_matches(analyzer, data, KEYWORDS)
+        # Chunks smaller than the longest keyword force matches across every boundary
+        monkeypatch.setattr(social_monitor, 'TEXT_CHUNK_SIZE', rng.randint(1, 40))
+        chunked = list(analyzer._iter_chunk_matches(io.BytesIO(data), pattern, overlap))
+        assert chunked == expected
+
+def test_scan_file_matches_analyze_content(tmp_path, monkeypatch):
+    rng = random.Random(7)
+    analyzer = TextFileAnalyzer(window_size=256)
+    text = random_text(rng, 5000)
+    path = tmp_path / "dump.txt"
+    path.write_bytes(text.encode('utf-8'))
+
+    in_memory = analyzer.analyze_content(text, KEYWORDS)
+    monkeypatch.setattr(social_monitor, 'TEXT_CHUNK_SIZE', 97)
+    scanned = analyzer.scan_file(str(path), KEYWORDS)
+
+    assert scanned.pop('path') == str(path)
+    assert scanned == in_memory
+    assert in_memory['total_matches'] == len(whole_buffer_matches(analyzer, text.encode('utf-8'), KEYWORDS))
+
+def test_no_keywords_returns_empty_report(tmp_path):
+    path = tmp_path / "dump.txt"
+    path.write_text("bitcoin " * 100)
+    analyzer = TextFileAnalyzer()
+
+    for report in (analyzer.scan_file(str(path), []), analyzer.analyze_content("bitcoin", ['', ''])):
+        assert report['total_matches'] == 0
+        assert report['keyword_counts'] == {}
+        assert report['windows'] == []
+        assert report['peak_window'] is None
+
+def test_analyze_directory_totals_use_normalised_keywords(tmp_path):
+    (tmp_path / "a.txt").write_text("Bitcoin and ETH, bitcoin again")
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "b.log").write_text("BITCOIN doge")
+    (tmp_path / "skip.bin").write_text("bitcoin")
+    analyzer = TextFileAnalyzer()
+
+    report = analyzer.analyze_directory(str(tmp_path), ['Bitcoin', '', 'bitcoin', 'eth', 'sol'], max_workers=2)
+    assert report['keyword_counts'] == {'Bitcoin': 3, 'eth': 1, 'sol': 0}
+    assert report['total_matches'] == 4
+    assert len(report['files']) == 2
+
+def test_compile_keyword_pattern_rejects_no_keywords():
+    with pytest.raises(ValueError):
+        compile_keyword_pattern(())
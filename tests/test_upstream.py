@@ -0,0 +1,195 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import upstream
+from upstream import (BACKGROUND, INTERACTIVE, CircuitBreaker, HostState, TokenBucket, UpstreamScheduler,
+                      parse_retry_after)
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def sleeps(monkeypatch, clock):
+    """Sleeps on the fake clock and records each delay"""
+    delays = []
+
+    def sleep(seconds):
+        delays.append(seconds)
+        clock.advance(seconds)
+
+    monkeypatch.setattr(upstream.time, 'sleep', sleep)
+    return delays
+
+def make_scheduler(session, clock, **kwargs):
+    scheduler = UpstreamScheduler(session=session, **kwargs)
+    scheduler._hosts['api.example.com'] = HostState(TokenBucket(60, 10, clock=clock), CircuitBreaker(clock=clock))
+    return scheduler
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(2):
+        assert breaker.admit() is CircuitBreaker.CLOSED
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.admit() is None
+
+    clock.advance(29.9)
+    assert breaker.state == 'open'
+
+def test_half_open_admits_one_trial_and_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.state == 'half-open'
+
+    trial = breaker.admit()
+    assert trial is not None and trial is not CircuitBreaker.CLOSED
+    assert breaker.admit() is None  # only one trial in flight
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+    assert breaker.admit() is CircuitBreaker.CLOSED
+
+def test_failed_trial_reopens_for_a_full_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.admit() is not None
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.advance(29)
+    assert breaker.admit() is None
+    clock.advance(1)
+    assert breaker.admit() is not None
+
+def test_stale_release_does_not_free_a_newer_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.advance(30)
+    first = breaker.admit()
+    breaker.release(first)
+    second = breaker.admit()
+    assert second is not None and second is not first
+
+    breaker.release(first)  # late release of the abandoned trial
+    assert breaker.admit() is None
+    breaker.release(second)
+    assert breaker.admit() is not None
+
+def test_bucket_refills_at_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=2, interactive_reserve=0, clock=clock)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(1.0)
+
+    clock.advance(0.5)
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert bucket.try_acquire() == 0
+
+def test_background_leaves_the_interactive_reserve(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=4, interactive_reserve=0.25, clock=clock)
+    # One token of the four is reserved for interactive callers
+    for _ in range(3):
+        assert bucket.try_acquire(BACKGROUND) == 0
+    assert bucket.try_acquire(BACKGROUND) > 0
+    assert bucket.try_acquire(INTERACTIVE) == 0
+
+def test_background_yields_to_waiting_interactive(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=4, interactive_reserve=0, clock=clock)
+    bucket.interactive_waiting = 1
+    assert bucket.try_acquire(BACKGROUND) > 0
+    assert bucket.try_acquire(INTERACTIVE) == 0
+
+def test_block_for_pauses_every_lane(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=10, clock=clock)
+    bucket.block_for(5)
+    assert bucket.try_acquire(INTERACTIVE) == pytest.approx(5)
+    clock.advance(5)
+    # The bucket was drained, so tokens refill from the end of the block
+    assert bucket.try_acquire(INTERACTIVE) == pytest.approx(1.0)
+    clock.advance(1)
+    assert bucket.try_acquire(INTERACTIVE) == 0
+
+def test_acquire_gives_up_past_the_queue_timeout(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=1, clock=clock)
+    bucket.block_for(10)
+    assert bucket.acquire(INTERACTIVE, timeout=2) is False
+    assert asyncio.run(bucket.acquire_async(INTERACTIVE, timeout=2)) is False
+    assert bucket.interactive_waiting == 0
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    when = datetime.now(timezone.utc) + timedelta(seconds=120)
+    assert parse_retry_after(format_datetime(when, usegmt=True)) == pytest.approx(120, abs=2)
+    assert parse_retry_after('soon') is None
+
+def test_retry_after_blocks_the_host(clock, sleeps):
+    session = FakeSession([FakeResponse(429, headers={'Retry-After': '3'}), FakeResponse(200, {'ok': True})])
+    scheduler = make_scheduler(session, clock)
+
+    assert scheduler.get_json('https://api.example.com/x', priority=BACKGROUND) == {'ok': True}
+    assert session.calls == 2
+    # Backoff honours Retry-After, then the drained bucket waits for its first token
+    assert sleeps[0] == 3.0
+    assert clock.now >= 1000.0 + 3.0 + 1.0
+    assert scheduler.get_metrics()['api.example.com']['retries'] == 1
+
+def test_interactive_calls_have_a_smaller_retry_budget(clock, sleeps):
+    failing = [FakeResponse(503) for _ in range(10)]
+    interactive, background = FakeSession(failing), FakeSession(failing)
+
+    make_scheduler(interactive, clock).get_json('https://api.example.com/x', priority=INTERACTIVE)
+    make_scheduler(background, clock).get_json('https://api.example.com/x', priority=BACKGROUND)
+
+    assert interactive.calls == 2
+    assert background.calls == 4
+
+def test_interactive_calls_fail_fast_while_the_host_is_blocked(clock, sleeps):
+    session = FakeSession([FakeResponse(200, {'ok': True})])
+    scheduler = make_scheduler(session, clock)
+    scheduler._hosts['api.example.com'].bucket.block_for(10)
+
+    assert scheduler.get_json('https://api.example.com/x', priority=INTERACTIVE) is None
+    assert session.calls == 0
+    assert sleeps == []
+    assert scheduler.get_metrics()['api.example.com']['throttled'] == 1
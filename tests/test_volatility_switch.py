@@ -0,0 +1,52 @@
+import math
+import time
+
+import pytest
+
+from streaming_indicators import CoinIndicatorState, RollingVolatility
+
+def feed(state, start, end, step, base=100.0):
+    timestamp, index = start, 0
+    while timestamp <= end:
+        state.update(timestamp, base * (1.01 if index % 2 else 1.0))
+        timestamp += step
+        index += 1
+
+def test_covers_needs_most_of_the_window():
+    volatility = RollingVolatility(window_seconds=1000)
+    assert not volatility.covers(0)
+    volatility.update(0, 100.0)
+    volatility.update(10, 101.0)
+    assert not volatility.covers(500)
+    assert volatility.covers(910)
+    assert volatility.covers(950, fraction=0.9)
+    assert not volatility.covers(950, fraction=0.95)
+
+@pytest.fixture
+def handler():
+    market_handler = pytest.importorskip("market_handler")
+    handler = market_handler.MarketDataHandler()
+    handler.price_store = None
+    return handler
+
+def test_fallback_until_ticks_span_the_window(handler):
+    now = time.time()
+    state = handler.indicator_states['bitcoin'] = CoinIndicatorState()
+
+    # Ten minutes of ticks: realised volatility is tiny, so keep reporting |24h change|
+    feed(state, now - 600, now, 60)
+    assert state.volatility_samples >= handler.min_volatility_samples
+    assert handler._volatility_24h('bitcoin', 4.2) == 4.2
+
+def test_switches_to_realised_volatility_with_full_coverage(handler):
+    now = time.time()
+    state = handler.indicator_states['bitcoin'] = CoinIndicatorState()
+
+    # Hourly ticks over the past day, e.g. from the stored history or a sparkline backfill
+    feed(state, now - 23.5 * 3600, now, 3600)
+    realised = state.indicators['volatility'].value
+    assert realised == pytest.approx(math.sqrt(state.volatility_samples) * math.log(1.01) * 100)
+    assert handler._volatility_24h('bitcoin', 4.2) == realised
+
+def test_unknown_coin_uses_fallback(handler):
+    assert handler._volatility_24h('nothing-here', 1.5) == 1.5
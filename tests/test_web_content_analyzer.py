@@ -0,0 +1,102 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from social_monitor import WebContentAnalyzer
+
+PAGE = b"<html><head><title>Market wrap</title><script>bitcoin()</script></head>" \
+       b"<body><p>Bitcoin rallied while ETH and bitcoin cash lagged.</p></body></html>"
+ETAG = '"v1"'
+
+class PageHandler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        PageHandler.hits[self.path] = PageHandler.hits.get(self.path, 0) + 1
+        if self.path == '/page':
+            if self.headers.get('If-None-Match') == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        elif self.path == '/slow':
+            # No Content-Length: the body arrives in pieces and ends when the connection closes
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(b"<html><body>")
+            for _ in range(4):
+                self.wfile.write(b"bitcoin " * 500)
+                self.wfile.flush()
+                time.sleep(0.05)
+            self.wfile.write(b"end-of-page</body></html>")
+            self.close_connection = True
+        else:
+            self.send_error(404)
+
+@pytest.fixture
+def server():
+    PageHandler.hits = {}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def analyzer(tmp_path):
+    analyzer = WebContentAnalyzer(cache_dir=str(tmp_path / "web_cache"))
+    yield analyzer
+    if analyzer.event_loop is not None:
+        analyzer.event_loop.shutdown()
+
+def test_crawl_parses_and_analyzes(server, analyzer):
+    results = analyzer.crawl_sync([f"{server}/page", f"{server}/missing"], ['bitcoin', 'eth', 'bitcoin cash'])
+
+    page = results[f"{server}/page"]
+    assert page['source'] == 'network'
+    assert page['title'] == 'Market wrap'
+    assert 'bitcoin()' not in page['text']
+    assert page['analysis']['keyword_counts'] == {'bitcoin': 1, 'eth': 1, 'bitcoin cash': 1}
+    assert results[f"{server}/missing"] == {'url': f"{server}/missing", 'error': 'fetch failed'}
+
+def test_refetch_revalidates_with_etag(server, analyzer):
+    url = f"{server}/page"
+    assert analyzer.crawl_sync([url])[url]['source'] == 'network'
+    assert analyzer.crawl_sync([url])[url]['source'] == 'cache'
+
+    analyzer.refresh_interval = 0
+    page = analyzer.crawl_sync([url])[url]
+    assert page['source'] == 'not_modified'
+    assert page['title'] == 'Market wrap'
+    assert PageHandler.hits[url[len(server):]] == 2
+    assert analyzer.get_metrics()['not_modified'] == 1
+
+def test_slow_body_is_read_to_the_end(server, analyzer):
+    text = analyzer.fetch_webpage(f"{server}/slow")
+    assert text.endswith('end-of-page')
+    assert text.count('bitcoin') == 2000
+
+def test_body_is_capped(server, analyzer):
+    analyzer.max_page_bytes = 1000
+    text = analyzer.fetch_webpage(f"{server}/slow")
+    assert 0 < len(text) <= 1000
+    assert 'end-of-page' not in text
+
+def test_analyze_webpage_without_keywords(analyzer):
+    report = analyzer.analyze_webpage(PAGE.decode('utf-8'), ['', ''])
+    assert report['keyword_counts'] == {}
+    assert report['total_matches'] == 0
+    assert report['word_count'] == 10  # title and body
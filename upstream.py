@@ -0,0 +1,369 @@
+"""Shared, rate-limit-aware gateway for upstream HTTP APIs.
+
+Every outbound call to CoinGecko goes through ``upstream_scheduler`` so the
+whole process shares one budget per host:
+
+- a token bucket per host, with part of the burst reserved for interactive
+  requests so background refreshes can never starve chat traffic;
+- ``Retry-After``-aware exponential backoff with full jitter on 429/5xx and
+  network errors, and a per-request timeout;
+- a much smaller queueing and retry budget for interactive requests, which
+  run on request threads and would rather fall back to cache than wait;
+- a circuit breaker per host; while it is open calls fail fast with ``None``
+  and callers fall back to cached data.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+# Priority lanes
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# One pooled session for every synchronous call, so connections to a host are kept alive
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: float, interactive_reserve: float = 0.25,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.burst = burst
+        self.interactive_reserve = interactive_reserve * burst
+        self.tokens = burst
+        self.updated = self.clock()
+        self.blocked_until = 0.0
+        self.interactive_waiting = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, priority: int = INTERACTIVE) -> float:
+        """Take a token and return 0, or return the seconds to wait before retrying"""
+        with self._lock:
+            now = self.clock()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            # Background requests must leave the interactive reserve untouched
+            # and yield to any interactive request already waiting
+            needed = 1.0 if priority == INTERACTIVE else 1.0 + self.interactive_reserve
+            if priority != INTERACTIVE and self.interactive_waiting:
+                return max((needed - self.tokens) / self.rate, 1.0 / self.rate)
+            if self.tokens >= needed:
+                self.tokens -= 1.0
+                return 0.0
+            return (needed - self.tokens) / self.rate
+
+    def block_for(self, seconds: float):
+        """Pause the whole host, e.g. after a 429 with Retry-After"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+            # Refill from the end of the block, not through it
+            self.tokens = 0.0
+            self.updated = self.blocked_until
+
+    def _waiting(self, priority: int, delta: int):
+        if priority == INTERACTIVE:
+            with self._lock:
+                self.interactive_waiting += delta
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else self.clock() + timeout
+        self._waiting(priority, 1)
+        try:
+            while True:
+                wait = self.try_acquire(priority)
+                if wait <= 0:
+                    return True
+                if deadline is not None and self.clock() + wait > deadline:
+                    return False
+                time.sleep(min(wait, 1.0))
+        finally:
+            self._waiting(priority, -1)
+
+    async def acquire_async(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else self.clock() + timeout
+        self._waiting(priority, 1)
+        try:
+            while True:
+                wait = self.try_acquire(priority)
+                if wait <= 0:
+                    return True
+                if deadline is not None and self.clock() + wait > deadline:
+                    return False
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            self._waiting(priority, -1)
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after ``reset_timeout``"""
+
+    # Admission ticket for calls made while the circuit is closed
+    CLOSED = object()
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial: Optional[object] = None  # ticket of the half-open trial in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def admit(self) -> Optional[object]:
+        """Ticket for an admitted call (CLOSED, or a fresh trial token when half-open), None if rejected"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return self.CLOSED
+            if state == 'half-open' and self._trial is None:
+                self._trial = object()
+                return self._trial
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = None
+
+    def release(self, ticket: Optional[object] = None):
+        """Forget an admitted call that ended without an outcome (local throttling, cancellation).
+
+        With a ticket only that call's trial is released, so a late release
+        never frees a newer trial.
+        """
+        with self._lock:
+            if ticket is None or ticket is self._trial:
+                self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = None
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+class HostState:
+    def __init__(self, bucket: TokenBucket, breaker: CircuitBreaker):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.rejected = 0
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class UpstreamScheduler:
+    def __init__(self, default_rate_per_minute: float = 60, default_burst: float = 10,
+                 timeout: float = 10, max_retries: int = 3, backoff_base: float = 1.0,
+                 backoff_max: float = 30, queue_timeout: float = 30,
+                 interactive_queue_timeout: float = 2, interactive_max_retries: int = 1,
+                 interactive_backoff_max: float = 1, session: Optional[requests.Session] = None):
+        self.default_rate_per_minute = default_rate_per_minute
+        self.default_burst = default_burst
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        # Interactive callers block a request thread; past this budget they get None and use cached data
+        self.interactive_queue_timeout = interactive_queue_timeout
+        self.interactive_max_retries = interactive_max_retries
+        self.interactive_backoff_max = interactive_backoff_max
+        self.session = session or http_session
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def configure_host(self, host: str, rate_per_minute: float, burst: float,
+                       failure_threshold: int = 5, reset_timeout: float = 30):
+        with self._lock:
+            self._hosts[host] = HostState(
+                TokenBucket(rate_per_minute, burst),
+                CircuitBreaker(failure_threshold, reset_timeout)
+            )
+
+    def _host_state(self, url: str) -> HostState:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(
+                    TokenBucket(self.default_rate_per_minute, self.default_burst),
+                    CircuitBreaker()
+                )
+            return self._hosts[host]
+
+    def _budget(self, priority: int) -> Tuple[float, int, float]:
+        """(queue timeout, max retries, backoff cap) for a priority lane"""
+        if priority == INTERACTIVE:
+            return self.interactive_queue_timeout, self.interactive_max_retries, self.interactive_backoff_max
+        return self.queue_timeout, self.max_retries, self.backoff_max
+
+    def _backoff(self, attempt: int, retry_after: Optional[float], backoff_max: Optional[float] = None) -> float:
+        backoff_max = self.backoff_max if backoff_max is None else backoff_max
+        if retry_after is not None:
+            return min(retry_after, backoff_max)
+        # Full jitter keeps many waiting clients from retrying in lockstep
+        return random.uniform(0, min(backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _admit(self, state: HostState, url: str) -> Optional[object]:
+        ticket = state.breaker.admit()
+        if ticket is not None:
+            state.requests += 1
+            return ticket
+        state.rejected += 1
+        print(f"Circuit open for {urlparse(url).netloc}; skipping request")
+        return None
+
+    def get_json(self, url: str, params: Optional[Dict] = None, priority: int = INTERACTIVE,
+                 timeout: Optional[float] = None) -> Optional[Any]:
+        """Rate-limited GET returning parsed JSON, or None on failure"""
+        state = self._host_state(url)
+        ticket = self._admit(state, url)
+        if ticket is None:
+            return None
+        try:
+            return self._get_json_attempts(state, url, params, priority, timeout)
+        finally:
+            # A call that ended without an outcome must not pin the breaker half-open
+            state.breaker.release(ticket)
+
+    def _get_json_attempts(self, state: HostState, url: str, params: Optional[Dict], priority: int,
+                           timeout: Optional[float]) -> Optional[Any]:
+        queue_timeout, max_retries, backoff_max = self._budget(priority)
+        for attempt in range(max_retries + 1):
+            if not state.bucket.acquire(priority, timeout=queue_timeout):
+                state.throttled += 1
+                # Local queueing, not an upstream fault; the caller releases the ticket
+                return None
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+                if response.status_code == 200:
+                    state.breaker.record_success()
+                    return response.json()
+                if response.status_code not in RETRYABLE_STATUSES:
+                    # e.g. 404 for an unknown coin: the host itself is healthy
+                    state.breaker.record_success()
+                    return None
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status_code == 429:
+                    state.bucket.block_for(retry_after if retry_after is not None else self._backoff(attempt, None, backoff_max))
+            except requests.RequestException as e:
+                print(f"Error requesting {url}: {str(e)}")
+
+            if attempt < max_retries:
+                state.retries += 1
+                time.sleep(self._backoff(attempt, retry_after, backoff_max))
+
+        state.failures += 1
+        state.breaker.record_failure()
+        return None
+
+    async def get_json_async(self, session, url: str, params: Optional[Dict] = None,
+                             priority: int = INTERACTIVE, timeout: Optional[float] = None) -> Optional[Any]:
+        """aiohttp variant of get_json using the caller's pooled session"""
+        state = self._host_state(url)
+        ticket = self._admit(state, url)
+        if ticket is None:
+            return None
+        try:
+            return await self._get_json_attempts_async(session, state, url, params, priority, timeout)
+        finally:
+            # Cancellation can land in any await below; always settle the trial
+            state.breaker.release(ticket)
+
+    async def _get_json_attempts_async(self, session, state: HostState, url: str, params: Optional[Dict],
+                                       priority: int, timeout: Optional[float]) -> Optional[Any]:
+        import aiohttp
+
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        queue_timeout, max_retries, backoff_max = self._budget(priority)
+        for attempt in range(max_retries + 1):
+            if not await state.bucket.acquire_async(priority, timeout=queue_timeout):
+                state.throttled += 1
+                return None
+            retry_after = None
+            try:
+                async with session.get(url, params=params, timeout=request_timeout) as response:
+                    if response.status == 200:
+                        state.breaker.record_success()
+                        return await response.json()
+                    if response.status not in RETRYABLE_STATUSES:
+                        state.breaker.record_success()
+                        return None
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if response.status == 429:
+                        state.bucket.block_for(retry_after if retry_after is not None else self._backoff(attempt, None, backoff_max))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error requesting {url}: {str(e) or type(e).__name__}")
+
+            if attempt < max_retries:
+                state.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after, backoff_max))
+
+        state.failures += 1
+        state.breaker.record_failure()
+        return None
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: {
+                'circuit': state.breaker.state,
+                'tokens': round(state.bucket.tokens, 2),
+                'requests': state.requests,
+                'retries': state.retries,
+                'throttled': state.throttled,
+                'failures': state.failures,
+                'rejected': state.rejected
+            }
+            for host, state in hosts.items()
+        }
+
+# Shared scheduler; the CoinGecko budget matches the public API tier by default
+upstream_scheduler = UpstreamScheduler()
+upstream_scheduler.configure_host(
+    "api.coingecko.com",
+    rate_per_minute=float(os.getenv("COINGECKO_RATE_PER_MINUTE", "30")),
+    burst=float(os.getenv("COINGECKO_BURST", "5"))
+)